@@ -1,35 +1,33 @@
-from datetime import datetime, timedelta
 import numpy as np
 import pandas as pd
-import pymongo
 import statsmodels.api as sm
-import statsmodels.tsa.stattools as ts
-from statsmodels.tsa.stattools import adfuller
-from statsmodels.regression.linear_model import OLS
 
-MONGO_URI = "mongodb://localhost:27017"
-DB_NAME = "gemscap"
-TICKS_COLL = "ticks"
+from analytics.bars import align_closes, pandas_freq, get_bars, timeframe_seconds
+from analytics.cache import bars_watermark, pair_cache
+from analytics.coint import adf, engle_granger
+from analytics.correlation import get_engine
+from analytics.db import timed
+from analytics.hedge import ols_beta, hedged_spread
+from analytics.signals import signal_positions
+from analytics.ticks import fetch_tick_arrays, arrays_to_frame
 
 
+@timed
 def fetch_ticks(symbol, since_minutes=60):
-    client = pymongo.MongoClient(MONGO_URI)
-    coll = client[DB_NAME][TICKS_COLL]
-    since = datetime.utcnow() - timedelta(minutes=since_minutes)
-    cursor = coll.find({"symbol": symbol.lower(), "ts": {"$gte": since}})
-    df = pd.DataFrame(list(cursor))
-    if df.empty:
-        return df
-    df['ts'] = pd.to_datetime(df['ts'])
-    df = df.set_index('ts').sort_index()
-    return df
+    """
+    Ticks since `since_minutes` ago as a ts-indexed DataFrame with price/qty columns.
+    Reads are projected, index-backed and decoded column-wise (see analytics/ticks.py).
+    """
+    return arrays_to_frame(fetch_tick_arrays(symbol, since_minutes=since_minutes))
 
 
+@timed
 def resample_ohlc(df, timeframe='1s'):
     if df.empty:
         return pd.DataFrame()
-    ohlc = df['price'].resample(timeframe).ohlc().dropna()
-    vol = df['qty'].resample(timeframe).sum().reindex(ohlc.index).fillna(0)
+    freq = pandas_freq(timeframe)
+    ohlc = df['price'].resample(freq).ohlc().dropna()
+    vol = df['qty'].resample(freq).sum().reindex(ohlc.index).fillna(0)
     ohlc['volume'] = vol
     return ohlc
 
@@ -45,43 +43,116 @@ def zscore(spread):
 
 
 def adf_test(series):
-    result = adfuller(series.dropna(), autolag='AIC')
-    return {'adf': result[0], 'pvalue': result[1]}
+    """ADF with lag search capped by COINT_MAXLAG (or fixed lags with COINT_AUTOLAG=none), see analytics/coint.py"""
+    result = adf(series.dropna().to_numpy())
+    return {'adf': result['adf'], 'pvalue': result['pvalue'], 'usedlag': result['usedlag']}
+
+
+@timed
+def compute_pair_analytics(sym_y, sym_x, timeframe='1m', window=60, source=None, hedge='static'):
+    dfy = get_bars(sym_y, timeframe, since_minutes=24 * 60, source=source)
+    dfx = get_bars(sym_x, timeframe, since_minutes=24 * 60, source=source)
+    return pair_analytics_from_bars(dfy, dfx, window, hedge)
 
 
-def compute_pair_analytics(sym_y, sym_x, timeframe='1m', window=60):
-    dfy = resample_ohlc(fetch_ticks(sym_y, since_minutes=24 * 60), timeframe)
-    dfx = resample_ohlc(fetch_ticks(sym_x, since_minutes=24 * 60), timeframe)
-    common_idx = dfy.index.intersection(dfx.index)
+@timed
+def pair_analytics_from_bars(dfy, dfx, window=60, hedge='static'):
+    """The CPU part of compute_pair_analytics, for callers that fetched the bars themselves."""
+    common_idx, closes = align_closes([dfy, dfx])
     if len(common_idx) < 10:
         return {'error': 'not enough data'}
-    py = dfy.loc[common_idx]['close']
-    px = dfx.loc[common_idx]['close']
-    beta, intercept, model = hedge_ratio_ols(py, px)
-    spread = py - beta * px - intercept
+    py = pd.Series(closes[:, 0], index=common_idx, name='close')
+    px = pd.Series(closes[:, 1], index=common_idx, name='close')
+    hs = hedged_spread(py, px, method=hedge, window=window)
+    spread = hs['spread'].dropna()
     z = zscore(spread)
     adf = adf_test(spread)
     corr = py.rolling(window=window).corr(px).iloc[-1]
-    return {
-        'beta': float(beta),
-        'intercept': float(intercept),
+    out = {
+        'beta': hs['beta'],
+        'intercept': hs['alpha'],
         'last_spread': float(spread.iloc[-1]),
         'last_z': float(z.iloc[-1]),
         'adf': adf,
         'rolling_corr': float(corr),
         'n': int(len(spread))
     }
+    if hedge != 'static':
+        out['hedge'] = hedge
+        out['beta_series'] = hs['beta_series'].dropna().tail(500).astype(float).to_list()
+    return out
+
+
+def pair_cointegration_stats(df_y, df_x, window=60, hedge='static'):
+    """
+    The fitted part of pair_cointegration: Engle-Granger test, hedge ratio,
+    half-life and the full spread/z-score (and beta) series, or {'error': ...}.
+    """
+    common, closes = align_closes([df_y, df_x])
+    if len(common) < 20:
+        return {'error': 'not enough overlapping data'}
+    series_y = pd.Series(closes[:, 0], index=common, name='close')
+    series_x = pd.Series(closes[:, 1], index=common, name='close')
+    coint = engle_granger_test(series_y, series_x)
+    # compute spread and z-score
+    sp = spread_and_zscore(series_y, series_x, window=window, hedge=hedge)
+    sp['cointegration'] = coint
+    sp['half_life'] = half_life(sp['spread'])
+    return sp
+
+
+@timed
+def pair_cointegration_from_bars(df_y, df_x, window=60, hedge='static', limit=500, since=None, columns=False,
+                                 cache_key=None):
+    """
+    Engle-Granger test, hedged spread, z-score and half-life for two bar frames (pair_cointegration).
+    The series are cut to bars after `since` and then to the last `limit`. With columns=True they
+    come back under 'series' as aligned arrays ({'ts': epoch ms, 'spread', 'zscore'[, 'beta']}, NaN
+    where the z-score window is not full yet) instead of the *_series lists.
+    With a cache_key (pair_cache.key(...)) the fit is reused until a new bar opens on either leg.
+    """
+    sp = pair_cache.get_or_compute(cache_key, bars_watermark(df_y, df_x),
+                                   lambda: pair_cointegration_stats(df_y, df_x, window, hedge))
+    if 'error' in sp:
+        return dict(sp)
+    out = {
+        'cointegration': sp['cointegration'],
+        'beta': sp['beta'],
+        'alpha': sp['alpha'],
+        'half_life': sp['half_life'],
+    }
+
+    def cut(series):
+        if since is not None:
+            series = series[series.index > since]
+        return series.tail(limit) if limit is not None else series
+
+    if columns:
+        spread = cut(sp['spread'])
+        series = {'ts': spread.index.asi8 // 1_000_000, 'spread': spread.to_numpy(np.float64),
+                  'zscore': sp['zscore'].reindex(spread.index).to_numpy(np.float64)}
+        if 'beta_series' in sp:
+            series['beta'] = sp['beta_series'].reindex(spread.index).to_numpy(np.float64)
+        out['series'] = series
+        return out
+    # prepare small serializable sample of zscore and spread
+    out['zscore_series'] = cut(sp['zscore'].dropna()).astype(float).to_list()
+    out['spread_series'] = cut(sp['spread'].dropna()).astype(float).to_list()
+    if 'beta_series' in sp:
+        out['beta_series'] = cut(sp['beta_series']).astype(float).to_list()
+    return out
 
 
 # --- ENGLE-GRANGER COINTEGRATION ---
+@timed
 def engle_granger_test(y: pd.Series, x: pd.Series):
     """
     Returns (coint_t, pvalue, critical_values)
     """
-    # statsmodels coint returns (t_stat, pvalue, crit_vals)
+    # same statistics as statsmodels coint, without one OLS fit per candidate lag
     try:
-        t_stat, pvalue, crit_vals = ts.coint(y.dropna(), x.dropna())
-        return {'t_stat': float(t_stat), 'pvalue': float(pvalue), 'crit_vals': [float(cv) for cv in crit_vals]}
+        res = engle_granger(y.dropna().to_numpy(), x.dropna().to_numpy())
+        return {'t_stat': res['t_stat'], 'pvalue': res['pvalue'], 'crit_vals': res['crit_vals']}
     except Exception as e:
         return {'error': str(e)}
 
@@ -98,9 +169,7 @@ def half_life(spread: pd.Series):
     s_lag = s.shift(1).dropna()
     delta_s = s.diff().dropna()
     s_lag = s_lag.loc[delta_s.index]
-    X = sm.add_constant(s_lag.values)
-    model = OLS(delta_s.values, X).fit()
-    b = model.params[1]
+    b, _ = ols_beta(delta_s.values, s_lag.values)
     try:
         halflife = -np.log(2) / b
         return {'half_life': float(abs(halflife)), 'b': float(b)}
@@ -109,21 +178,24 @@ def half_life(spread: pd.Series):
 
 
 # --- ROLLING Z-SCORE SPREAD ---
-def spread_and_zscore(y: pd.Series, x: pd.Series, window=60):
+def spread_and_zscore(y: pd.Series, x: pd.Series, window=60, hedge='static'):
     """
-    Fit simple OLS hedge ratio: y = alpha + beta * x
+    Fit hedge ratio y = alpha + beta * x (static OLS, rolling OLS over `window`
+    bars, or Kalman; see analytics/hedge.py)
     spread = y - beta*x - alpha
     return spread series and rolling z-score
     """
     df = pd.concat([y, x], axis=1).dropna()
     df.columns = ['y', 'x']
-    X = sm.add_constant(df['x'])
-    model = OLS(df['y'], X).fit()
-    alpha = float(model.params[0])
-    beta = float(model.params[1])
-    spread = df['y'] - beta * df['x'] - alpha
-    z = (spread - spread.rolling(window).mean()) / (spread.rolling(window).std(ddof=0) + 1e-12)
-    return {'alpha': alpha, 'beta': beta, 'spread': spread, 'zscore': z}
+    hs = hedged_spread(df['y'], df['x'], method=hedge, window=window)
+    spread = hs['spread'].dropna()
+    # a window must not mix the Kalman warm-up residuals with its forecast errors
+    tail = spread.iloc[hs['warmup']:]
+    z = ((tail - tail.rolling(window).mean()) / (tail.rolling(window).std(ddof=0) + 1e-12)).reindex(spread.index)
+    out = {'alpha': hs['alpha'], 'beta': hs['beta'], 'spread': spread, 'zscore': z}
+    if hedge != 'static':
+        out['beta_series'] = hs['beta_series'].dropna()
+    return out
 
 
 # --- Z-SCORE MEAN REVERSION SIGNALS ---
@@ -133,36 +205,32 @@ def zscore_signals(zseries: pd.Series, entry=2.0, exit=0.0):
     returns DataFrame with signals
     """
     s = zseries.dropna()
-    sig = pd.Series(0, index=s.index)
-    position = 0
-    for i in range(len(s)):
-        z = s.iloc[i]
-        if position == 0:
-            if z > entry:
-                position = -1  # short spread
-            elif z < -entry:
-                position = 1  # long spread
-        elif position == 1:
-            if z >= -exit:
-                position = 0
-        elif position == -1:
-            if z <= exit:
-                position = 0
-        sig.iloc[i] = position
-    return sig
-
-def correlation_matrix(symbols: list, timeframe='1m', since_minutes=6*60):
-    """
-    Returns correlation matrix of close prices for list of symbols
-    """
-    dfs = {}
-    for s in symbols:
-        df = resample_ohlc(fetch_ticks(s, since_minutes=since_minutes), timeframe=timeframe)
-        if df.empty:
-            continue
-        dfs[s] = df['close'].rename(s)
-    if not dfs:
+    return pd.Series(signal_positions(s.to_numpy(), entry, exit).astype(np.int64), index=s.index)
+
+@timed
+def correlation_matrix(symbols: list, timeframe='1m', since_minutes=6*60, source=None, mode='rolling', halflife=60):
+    """
+    Returns correlation matrix of close prices for list of symbols: over the
+    bars of the last `since_minutes` (mode='rolling') or exponentially weighted
+    with `halflife` bars (mode='ewm'). State is kept per symbol set and only
+    advanced by the bars closed since the previous call (analytics/correlation.py).
+    """
+    window = max(2, since_minutes * 60 // timeframe_seconds(timeframe))
+    engine = get_engine(symbols, timeframe, mode=mode, window=window, halflife=halflife, source=source).refresh()
+    corr = engine.corr()
+    if corr.empty:
         return {'error': 'no data'}
-    combined = pd.concat(dfs.values(), axis=1, join='inner')
-    corr = combined.corr()
-    return corr.fillna(0).to_dict()
\ No newline at end of file
+    return corr.fillna(0).to_dict()
+
+
+def correlation_top(symbols: list, k=10, symbol=None, timeframe='1m', since_minutes=6*60, source=None,
+                    mode='rolling', halflife=60):
+    """
+    The k most correlated pairs (by |corr|), optionally only those involving
+    `symbol`. A `symbol` without bars in the window has no pairs ([]).
+    """
+    window = max(2, since_minutes * 60 // timeframe_seconds(timeframe))
+    engine = get_engine(symbols, timeframe, mode=mode, window=window, halflife=halflife, source=source).refresh()
+    if symbol and symbol.lower() not in engine.used:
+        return []
+    return [{'a': a, 'b': b, 'corr': c} for a, b, c in engine.top(k, symbol.lower() if symbol else None)]
@@ -0,0 +1,162 @@
+# analytics/archive.py
+"""
+Cold tick storage: Arrow IPC files partitioned as <root>/<symbol>/<YYYY-MM-DD>.arrow.
+
+Each day file holds ts (int64 epoch ms), price and qty as one record batch
+per hour, compressed with ARCHIVE_COMPRESSION (zstd by default; "none"
+keeps the buffers uncompressed so reads are zero-copy views of the mapped
+file). The hour start of every batch is stored in the schema metadata, so a
+time-range read opens only the day files it spans, skips non-overlapping
+batches without decompressing them and cuts the rest with a binary search
+on the sorted ts column.
+
+<root>/<symbol>/_manifest.json records the watermark: every tick with
+ts < until_ms is in the archive and nothing at or above it is. Readers use
+it to split a request into a cold part (archive) and a hot part (Mongo).
+
+pyarrow is imported only when a symbol actually has archived data.
+"""
+import json
+import os
+from datetime import datetime, timedelta, timezone
+
+import numpy as np
+
+ARCHIVE_DIR = os.getenv("TICK_ARCHIVE_DIR", "data/archive")
+ARCHIVE_COMPRESSION = os.getenv("ARCHIVE_COMPRESSION", "zstd")  # zstd | lz4 | none
+HOUR_MS = 3600 * 1000
+DAY_MS = 24 * HOUR_MS
+
+COLUMNS = ("ts", "price", "qty")
+
+
+def _empty():
+    return {"ts": np.empty(0, np.int64), "price": np.empty(0, np.float64), "qty": np.empty(0, np.float64)}
+
+
+def _concat(parts):
+    if not parts:
+        return _empty()
+    if len(parts) == 1:
+        return parts[0]
+    return {k: np.concatenate([p[k] for p in parts]) for k in COLUMNS}
+
+
+def to_ms(dt):
+    if dt.tzinfo is None:
+        dt = dt.replace(tzinfo=timezone.utc)
+    return int(dt.timestamp() * 1000)
+
+
+def _day(ms):
+    return datetime.fromtimestamp(ms / 1000.0, tz=timezone.utc).strftime("%Y-%m-%d")
+
+
+def day_path(symbol, day, root=ARCHIVE_DIR):
+    return os.path.join(root, symbol.lower(), f"{day}.arrow")
+
+
+def _manifest_path(symbol, root):
+    return os.path.join(root, symbol.lower(), "_manifest.json")
+
+
+def watermark(symbol, root=ARCHIVE_DIR):
+    """Epoch ms below which the symbol's ticks live in the archive, or None."""
+    try:
+        with open(_manifest_path(symbol, root)) as f:
+            return int(json.load(f)["until_ms"])
+    except (OSError, ValueError, KeyError):
+        return None
+
+
+def set_watermark(symbol, until_ms, root=ARCHIVE_DIR):
+    path = _manifest_path(symbol, root)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = path + ".tmp"
+    with open(tmp, "w") as f:
+        json.dump({"until_ms": int(until_ms), "updated": datetime.utcnow().isoformat()}, f)
+    os.replace(tmp, path)
+
+
+def _read_file(path, lo_ms, hi_ms):
+    import pyarrow as pa
+    if not os.path.exists(path):
+        return None
+    reader = pa.ipc.open_file(pa.memory_map(path, "r"))
+    meta = reader.schema.metadata or {}
+    starts = json.loads(meta.get(b"batch_hours", b"[]"))
+    parts = []
+    for i in range(reader.num_record_batches):
+        if starts and (starts[i] >= hi_ms or starts[i] + HOUR_MS <= lo_ms):
+            continue
+        batch = reader.get_batch(i)
+        ts = batch.column(0).to_numpy()
+        a, b = np.searchsorted(ts, lo_ms, "left"), np.searchsorted(ts, hi_ms, "left")
+        if a < b:
+            parts.append({"ts": ts[a:b], "price": batch.column(1).to_numpy()[a:b],
+                          "qty": batch.column(2).to_numpy()[a:b]})
+    return _concat(parts)
+
+
+def read_archive(symbol, since, until=None, root=ARCHIVE_DIR):
+    """Archived ticks with since <= ts < until (capped at the watermark), same dict layout as fetch_tick_arrays."""
+    wm = watermark(symbol, root)
+    if wm is None:
+        return _empty()
+    lo = to_ms(since)
+    hi = min(to_ms(until), wm) if until is not None else wm
+    parts = []
+    day = lo - lo % DAY_MS
+    while day < hi:
+        part = _read_file(day_path(symbol, _day(day), root), lo, hi)
+        if part is not None and len(part["ts"]):
+            parts.append(part)
+        day += DAY_MS
+    return _concat(parts)
+
+
+def write_day(symbol, day_ms, arrs, keep_below_ms=None, root=ARCHIVE_DIR, compression=ARCHIVE_COMPRESSION):
+    """
+    Append sorted ticks to the day file of `day_ms`. Existing rows at or above
+    `keep_below_ms` (the previous watermark) are dropped first; with no
+    watermark (a symbol's first pass) nothing in the file is archived yet, so
+    all of it is dropped. Re-running an interrupted archive pass therefore
+    never duplicates ticks. Written atomically.
+    """
+    import pyarrow as pa
+    path = day_path(symbol, _day(day_ms), root)
+    parts = []
+    if keep_below_ms is not None and keep_below_ms > day_ms and os.path.exists(path):
+        old = _read_file(path, day_ms, keep_below_ms)
+        parts.append({k: np.array(v) for k, v in old.items()})
+    parts.append(arrs)
+    data = _concat(parts)
+    if len(data["ts"]) == 0:
+        return 0
+    schema = pa.schema([("ts", pa.int64()), ("price", pa.float64()), ("qty", pa.float64())])
+    hours = data["ts"] - data["ts"] % HOUR_MS
+    bounds = np.flatnonzero(np.diff(hours)) + 1
+    edges = np.concatenate(([0], bounds, [len(hours)]))
+    schema = schema.with_metadata({"batch_hours": json.dumps([int(hours[i]) for i in edges[:-1]])})
+    options = pa.ipc.IpcWriteOptions(compression=None if compression == "none" else compression)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = path + ".tmp"
+    with pa.OSFile(tmp, "wb") as sink, pa.ipc.new_file(sink, schema, options=options) as writer:
+        for a, b in zip(edges[:-1], edges[1:]):
+            writer.write_batch(pa.record_batch([pa.array(data[k][a:b]) for k in COLUMNS], schema=schema))
+    os.replace(tmp, path)
+    return int(len(data["ts"]))
+
+
+def day_range(lo_ms, hi_ms):
+    """(day_start_ms, start, end) slices of [lo_ms, hi_ms) cut at UTC midnights."""
+    out = []
+    day = lo_ms - lo_ms % DAY_MS
+    while day < hi_ms:
+        out.append((day, max(lo_ms, day), min(hi_ms, day + DAY_MS)))
+        day += DAY_MS
+    return out
+
+
+def from_ms(ms):
+    return datetime(1970, 1, 1) + timedelta(milliseconds=int(ms))
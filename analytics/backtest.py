@@ -0,0 +1,297 @@
+# analytics/backtest.py
+"""
+Vectorised pair backtests of the z-score strategy over stored bars or ticks.
+
+A pair is replayed from load_bar_cube (binned from raw ticks with the
+'pandas' source, or read from the bar sources). Every bar only uses data up
+to its own close: the hedge ratio is rolling OLS over `window` bars or the
+Kalman filter, and the z-score is the spread's trailing `window`-bar
+standardisation, as in spread_and_zscore. Positions come from
+signal_positions, the same state machine as zscore_signals. They are
+traded `delay` bars after the signal bar, at that bar's close:
+
+    units held   y: +pos        x: -pos * beta   (pos = +1 long spread, -1 short)
+    pnl[t]       held_y[t-1] * (y[t] - y[t-1]) + held_x[t-1] * (x[t] - x[t-1])
+    turnover[t]  |held_y[t] - held_y[t-1]| * y[t] + |held_x[t] - held_x[t-1]| * x[t]
+    fees[t]      turnover[t] * fee_bps / 1e4
+
+Everything is array math over (P, T) position matrices, one row per
+(entry, exit) pair, so a whole threshold sweep costs one pass per window.
+Grids run one window per task on the long-lived process pool of
+analytics/workers.py, with y and x in shared memory, and each (data, params)
+result is cached on disk under a hash of both (BACKTEST_CACHE_DIR).
+"""
+import hashlib
+import json
+import math
+import os
+import time
+from concurrent.futures.process import BrokenProcessPool
+from itertools import product, repeat
+
+import numpy as np
+import pandas as pd
+
+from analytics.bars import BAR_COLUMNS, load_bar_cube, timeframe_seconds
+from analytics.db import timed
+from analytics.hedge import kalman_hedge, rolling_ols
+from analytics.signals import signal_positions_batch
+from analytics.workers import SharedArrays, attach, discard_pool, get_pool
+
+BACKTEST_CACHE_DIR = os.getenv("BACKTEST_CACHE_DIR", "data/backtest_cache")
+BACKTEST_WORKERS = int(os.getenv("BACKTEST_WORKERS", str(os.cpu_count() or 1)))
+BACKTEST_MIN_PARALLEL = int(os.getenv("BACKTEST_MIN_PARALLEL", "4"))  # windows
+BACKTEST_HEDGES = ('rolling', 'kalman')
+RANK_KEYS = ('sharpe', 'pnl', 'max_drawdown')
+CACHE_VERSION = 1
+
+
+def load_pair(sym_y, sym_x, timeframe='1m', since_minutes=24 * 60, source=None):
+    """(ts epoch ms, y closes, x closes) on the bars both symbols have."""
+    ts, used, cube = load_bar_cube([sym_y, sym_x], timeframe, since_minutes, source)
+    if len(used) < 2:
+        return np.empty(0, np.int64), np.empty(0), np.empty(0)
+    c = BAR_COLUMNS.index('close')
+    return ts, np.ascontiguousarray(cube[:, 0, c]), np.ascontiguousarray(cube[:, 1, c])
+
+
+def pair_zscore(y, x, window=60, hedge='rolling'):
+    """Causal (beta, spread, z) arrays: bar t uses bars <= t only."""
+    if hedge not in BACKTEST_HEDGES:
+        raise ValueError(f"hedge must be one of {', '.join(BACKTEST_HEDGES)}")
+    if hedge == 'rolling':
+        beta, alpha = rolling_ols(y, x, window)
+        spread = y - beta * x - alpha
+    else:
+        k = kalman_hedge(y, x)
+        beta, spread = k['beta'], k['error'].copy()
+        # the warm-up errors are in-sample residuals: no signal until a full window of forecasts
+        spread[:k['warmup']] = np.nan
+    s = pd.Series(spread)
+    z = (s - s.rolling(window).mean()) / (s.rolling(window).std(ddof=0) + 1e-12)
+    return beta, spread, z.to_numpy()
+
+
+def simulate(y, x, beta, pos, fee_bps=1.0, delay=1):
+    """
+    PnL arrays for positions `pos` ((T,) or (P, T)) decided at each bar's close
+    and traded `delay` bars later. Returns dict of (P, T) arrays:
+    pnl (after fees), fees, turnover, equity, drawdown and held (units of y).
+    """
+    pos = np.atleast_2d(pos).astype(np.float64)
+    p, n = pos.shape
+    beta = np.nan_to_num(beta)
+    want_y = pos
+    want_x = -pos * beta
+    held_y = np.zeros((p, n))
+    held_x = np.zeros((p, n))
+    if delay < n:
+        held_y[:, delay:] = want_y[:, :n - delay]
+        held_x[:, delay:] = want_x[:, :n - delay]
+    pnl = np.zeros((p, n))
+    pnl[:, 1:] = held_y[:, :-1] * np.diff(y) + held_x[:, :-1] * np.diff(x)
+    turnover = np.abs(np.diff(held_y, axis=1, prepend=0.0)) * y + np.abs(np.diff(held_x, axis=1, prepend=0.0)) * x
+    fees = turnover * (fee_bps / 1e4)
+    pnl -= fees
+    equity = np.cumsum(pnl, axis=1)
+    drawdown = equity - np.maximum.accumulate(np.maximum(equity, 0.0), axis=1)
+    return {'pnl': pnl, 'fees': fees, 'turnover': turnover, 'equity': equity, 'drawdown': drawdown,
+            'held': held_y}
+
+
+def summarize(sim, bars_per_year):
+    """Per-row metrics of simulate() output: list of dicts."""
+    pnl, held = sim['pnl'], sim['held']
+    mean = pnl.mean(axis=1)
+    std = pnl.std(axis=1)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        sharpe = np.where(std > 0, mean / std * math.sqrt(bars_per_year), 0.0)
+    # a trade is every bar the held position moves to a new non-zero value
+    changed = np.diff(held, axis=1, prepend=0.0) != 0
+    trades = (changed & (held != 0)).sum(axis=1)
+    out = []
+    for k in range(pnl.shape[0]):
+        out.append({
+            'pnl': float(sim['equity'][k, -1]) if pnl.shape[1] else 0.0,
+            'fees': float(sim['fees'][k].sum()),
+            'turnover': float(sim['turnover'][k].sum()),
+            'max_drawdown': float(sim['drawdown'][k].min()) if pnl.shape[1] else 0.0,
+            'sharpe': float(sharpe[k]),
+            'trades': int(trades[k]),
+            'exposure': float((held[k] != 0).mean()) if pnl.shape[1] else 0.0,
+        })
+    return out
+
+
+def backtest(y, x, ts=None, window=60, entry=2.0, exit=0.0, hedge='rolling', fee_bps=1.0, delay=1,
+             bar_seconds=60):
+    """
+    One parameter set with its curves. Returns dict with 'metrics' and
+    ts-indexed arrays 'equity', 'drawdown', 'position', 'zscore'.
+    """
+    y = np.asarray(y, dtype=np.float64)
+    x = np.asarray(x, dtype=np.float64)
+    beta, spread, z = pair_zscore(y, x, window, hedge)
+    pos = signal_positions_batch(z, entry, exit)
+    sim = simulate(y, x, beta, pos, fee_bps, delay)
+    metrics = summarize(sim, 365 * 86400 / bar_seconds)[0]
+    return {
+        'params': {'window': window, 'entry': entry, 'exit': exit, 'hedge': hedge, 'fee_bps': fee_bps,
+                   'delay': delay},
+        'metrics': metrics,
+        'ts': ts,
+        'equity': sim['equity'][0],
+        'drawdown': sim['drawdown'][0],
+        'position': sim['held'][0],
+        'zscore': z,
+    }
+
+
+# --- grid search -----------------------------------------------------------
+
+def data_key(ts, y, x):
+    h = hashlib.sha1()
+    for a in (ts, y, x):
+        if a is not None:
+            h.update(np.ascontiguousarray(a).tobytes())
+    return h.hexdigest()
+
+
+def params_key(data, params):
+    blob = json.dumps({'v': CACHE_VERSION, 'data': data, **params}, sort_keys=True)
+    return hashlib.sha1(blob.encode()).hexdigest()
+
+
+def _cache_path(key, cache_dir):
+    return os.path.join(cache_dir, key[:2], f"{key}.json")
+
+
+def cache_get(key, cache_dir=BACKTEST_CACHE_DIR):
+    try:
+        with open(_cache_path(key, cache_dir)) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def cache_put(key, metrics, cache_dir=BACKTEST_CACHE_DIR):
+    path = _cache_path(key, cache_dir)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, "w") as f:
+        json.dump(metrics, f)
+    os.replace(tmp, path)
+
+
+def _run_window(window, thresholds, hedge, fee_bps, delay, bars_per_year, data):
+    """Metrics for every (entry, exit) in `thresholds` at one window."""
+    y, x = data
+    beta, spread, z = pair_zscore(y, x, window, hedge)
+    entries = [t[0] for t in thresholds]
+    exits = [t[1] for t in thresholds]
+    sim = simulate(y, x, beta, signal_positions_batch(z, entries, exits), fee_bps, delay)
+    return window, summarize(sim, bars_per_year)
+
+
+def _run_shared(spec, *args):
+    shared = attach(spec)
+    return _run_window(*args, data=(shared['y'], shared['x']))
+
+
+def rank_results(rows, rank_by='sharpe'):
+    """Best first: highest sharpe or pnl, or shallowest drawdown."""
+    if rank_by not in RANK_KEYS:
+        raise ValueError(f"rank_by must be one of {', '.join(RANK_KEYS)}")
+    return sorted(rows, key=lambda r: -r[rank_by])
+
+
+def grid_search(y, x, ts, windows, entries, exits, hedge='rolling', fee_bps=1.0, delay=1, bar_seconds=60,
+                workers=BACKTEST_WORKERS, cache=True, cache_dir=BACKTEST_CACHE_DIR):
+    """
+    Metrics for every (window, entry, exit) with entry > exit. Cached results
+    are read back by hash; the rest run one window per task on a process pool.
+    Returns (rows, stats) where stats counts cached/computed runs and timings.
+    """
+    y = np.ascontiguousarray(y, dtype=np.float64)
+    x = np.ascontiguousarray(x, dtype=np.float64)
+    if hedge not in BACKTEST_HEDGES:
+        raise ValueError(f"hedge must be one of {', '.join(BACKTEST_HEDGES)}")
+    t0 = time.perf_counter()
+    data = data_key(ts, y, x)
+    combos = [(int(w), float(en), float(ex)) for w, en, ex in product(windows, entries, exits) if en > ex]
+    rows, todo = {}, {}
+    for w, en, ex in combos:
+        params = {'window': w, 'entry': en, 'exit': ex, 'hedge': hedge, 'fee_bps': float(fee_bps),
+                  'delay': int(delay)}
+        key = params_key(data, params)
+        hit = cache_get(key, cache_dir) if cache else None
+        if hit is not None:
+            rows[(w, en, ex)] = dict(params, **hit)
+        else:
+            todo.setdefault(w, []).append((en, ex))
+    stats = {'cached': len(rows), 'computed': sum(len(v) for v in todo.values())}
+
+    bars_per_year = 365 * 86400 / bar_seconds
+    args = [(w, th, hedge, float(fee_bps), int(delay), bars_per_year) for w, th in todo.items()]
+    workers = max(1, min(workers, len(args)))
+    if workers == 1 or len(args) < BACKTEST_MIN_PARALLEL:
+        results = [_run_window(*a, data=(y, x)) for a in args]
+        workers = 1
+    else:
+        try:
+            with SharedArrays(y=y, x=x) as shared:
+                results = list(get_pool(workers).map(_run_shared, repeat(shared.spec), *zip(*args)))
+        except BrokenProcessPool:
+            # a worker died (OOM, killed); start a new pool next time and finish this grid here
+            discard_pool(workers)
+            results = [_run_window(*a, data=(y, x)) for a in args]
+    for w, metrics in results:
+        for (en, ex), m in zip(todo[w], metrics):
+            params = {'window': w, 'entry': en, 'exit': ex, 'hedge': hedge, 'fee_bps': float(fee_bps),
+                      'delay': int(delay)}
+            if cache:
+                cache_put(params_key(data, params), m, cache_dir)
+            rows[(w, en, ex)] = dict(params, **m)
+    stats['workers'] = workers
+    stats['total_ms'] = round((time.perf_counter() - t0) * 1000.0, 3)
+    return [rows[c] for c in combos], stats
+
+
+@timed
+def backtest_pair(sym_y, sym_x, timeframe='1m', since_minutes=24 * 60, source=None, windows=(60,),
+                  entries=(2.0,), exits=(0.0,), hedge='rolling', fee_bps=1.0, delay=1, rank_by='sharpe', top=None,
+                  workers=BACKTEST_WORKERS, cache=True):
+    """Grid backtest of one pair over stored data; returns ranked 'results', 'bars' and cache 'stats'."""
+    ts, y, x = load_pair(sym_y, sym_x, timeframe, since_minutes, source)
+    if len(ts) < 2 * max(windows):
+        return {'error': 'not enough overlapping data', 'bars': int(len(ts))}
+    rows, stats = grid_search(y, x, ts, windows, entries, exits, hedge, fee_bps, delay,
+                              timeframe_seconds(timeframe), workers, cache)
+    ranked = rank_results(rows, rank_by)
+    return {'y': sym_y.lower(), 'x': sym_x.lower(), 'bars': int(len(ts)), 'results': ranked[:top] if top else ranked,
+            'stats': stats}
+
+
+if __name__ == "__main__":
+    import argparse
+
+    def floats(s):
+        return [float(v) for v in s.split(',')]
+
+    ap = argparse.ArgumentParser(description="grid backtest of the z-score pair strategy")
+    ap.add_argument('--y', required=True)
+    ap.add_argument('--x', required=True)
+    ap.add_argument('--tf', default='1m')
+    ap.add_argument('--since-minutes', type=int, default=24 * 60)
+    ap.add_argument('--source', default=None)
+    ap.add_argument('--windows', default='30,60,120')
+    ap.add_argument('--entries', default='1.5,2,2.5')
+    ap.add_argument('--exits', default='0,0.5')
+    ap.add_argument('--hedge', default='rolling', choices=BACKTEST_HEDGES)
+    ap.add_argument('--fee-bps', type=float, default=1.0)
+    ap.add_argument('--top', type=int, default=10)
+    ap.add_argument('--no-cache', action='store_true')
+    a = ap.parse_args()
+    res = backtest_pair(a.y, a.x, a.tf, a.since_minutes, a.source, [int(w) for w in a.windows.split(',')],
+                        floats(a.entries), floats(a.exits), a.hedge, a.fee_bps, top=a.top, cache=not a.no_cache)
+    print(json.dumps(res, indent=2))
@@ -0,0 +1,350 @@
+# analytics/bars.py
+"""
+OHLCV bar sources.
+
+'pandas' pulls raw ticks and resamples them in-process (resample_ohlc).
+'mongo' groups ticks into time buckets inside MongoDB and only ships the
+finished bars; results match resample_ohlc bar for bar.
+'stored' reads the bars_<tf> collections the collector maintains
+(collector/bars.py, rebuilt by collector/backfill.py).
+'shared' reads the collector's memory-mapped bar rings (analytics/shared_bars.py)
+and falls back to 'stored' when the rings are missing or too short.
+
+load_bar_cube() returns many symbols at once as one aligned
+(time, symbol, OHLCV) array. From ticks, all symbols are binned in a single
+pass (bars_from_arrays_many); other sources are aligned on integer
+timestamps instead of joined as DataFrames.
+"""
+import os
+import re
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+import numpy as np
+import pandas as pd
+from pymongo.errors import OperationFailure
+
+from analytics.cache import series_cache, SERIES_CACHE_ENABLED
+from analytics.db import TICKS_COLL, get_collection, timed
+from analytics.shared_bars import open_ring
+from analytics.ticks import TICK_FETCH_WORKERS, arrays_to_frame, fetch_tick_arrays, fetch_tick_arrays_many
+
+BAR_SOURCE = os.getenv("BAR_SOURCE", "pandas")  # pandas | mongo | stored | shared
+BAR_SOURCES = ('pandas', 'mongo', 'stored', 'shared')
+BAR_COLUMNS = ['open', 'high', 'low', 'close', 'volume']
+STORED_TIMEFRAMES = [tf.strip() for tf in os.getenv("BAR_TIMEFRAMES", "1s,1m,5m,1h").split(',') if tf.strip()]
+
+_TF_RE = re.compile(r'^\s*(\d+)\s*(s|sec|m|min|t|h|d)\s*$', re.IGNORECASE)
+_UNIT_SECONDS = {'s': 1, 'sec': 1, 'm': 60, 'min': 60, 't': 60, 'h': 3600, 'd': 86400}
+_UNIT_NAMES = {1: 'second', 60: 'minute', 3600: 'hour', 86400: 'day'}
+
+
+def timeframe_seconds(timeframe):
+    """'1s', '5m'/'5min', '1h', '1d' -> bucket width in seconds. 'm' always means minutes."""
+    m = _TF_RE.match(str(timeframe))
+    if not m:
+        raise ValueError(f"unsupported timeframe: {timeframe}")
+    n = int(m.group(1)) * _UNIT_SECONDS[m.group(2).lower()]
+    if n <= 0:
+        raise ValueError(f"unsupported timeframe: {timeframe}")
+    return n
+
+
+def pandas_freq(timeframe):
+    """Pandas offset alias for a timeframe (pandas reads a bare 'm' as month end)."""
+    return f"{timeframe_seconds(timeframe)}s"
+
+
+def bar_collection(timeframe):
+    return f"bars_{timeframe_seconds(timeframe)}s"
+
+
+def _bucket_expr(seconds, method):
+    if method == 'dateTrunc':
+        for unit in (86400, 3600, 60, 1):
+            if seconds % unit == 0:
+                return {'$dateTrunc': {'date': '$ts', 'unit': _UNIT_NAMES[unit], 'binSize': seconds // unit}}
+    # epoch arithmetic works on servers without $dateTrunc (< 5.0)
+    ms = seconds * 1000
+    return {'$subtract': ['$ts', {'$mod': [{'$toLong': '$ts'}, ms]}]}
+
+
+def ohlc_pipeline(symbol, since, timeframe, method='dateTrunc'):
+    seconds = timeframe_seconds(timeframe)
+    return [
+        {'$match': {'symbol': symbol.lower(), 'ts': {'$gte': since}}},
+        {'$sort': {'ts': 1}},
+        {'$group': {
+            '_id': _bucket_expr(seconds, method),
+            'open': {'$first': '$price'},
+            'high': {'$max': '$price'},
+            'low': {'$min': '$price'},
+            'close': {'$last': '$price'},
+            'volume': {'$sum': '$qty'},
+        }},
+        {'$sort': {'_id': 1}},
+    ]
+
+
+def bars_from_docs(docs, ts_key='_id'):
+    if not docs:
+        return pd.DataFrame()
+    df = pd.DataFrame(docs).rename(columns={ts_key: 'ts'})
+    df['ts'] = pd.to_datetime(df['ts'])
+    return df.set_index('ts')[BAR_COLUMNS].astype('float64')
+
+
+@timed
+def aggregate_ohlc(symbol, timeframe='1m', since_minutes=60, since=None):
+    """
+    OHLCV bars computed by a $group pipeline on the server.
+    Buckets are aligned to the epoch, which is what pandas resample does for
+    any timeframe that divides a day evenly; other timeframes are rejected.
+    """
+    seconds = timeframe_seconds(timeframe)
+    if 86400 % seconds:
+        raise ValueError(f"timeframe {timeframe} does not divide a day; use the pandas source")
+    since = since or datetime.utcnow() - timedelta(minutes=since_minutes)
+    coll = get_collection(TICKS_COLL)
+    try:
+        docs = list(coll.aggregate(ohlc_pipeline(symbol, since, timeframe), allowDiskUse=True))
+    except OperationFailure:
+        docs = list(coll.aggregate(ohlc_pipeline(symbol, since, timeframe, method='epoch'), allowDiskUse=True))
+    return bars_from_docs(docs)
+
+
+def bars_from_arrays(ts_ms, price, qty, seconds):
+    """
+    Vectorised OHLCV for ticks sorted by ts: epoch-floored buckets. That equals
+    resample_ohlc only for timeframes that divide a day (pandas starts the
+    buckets at midnight of the first tick's day); for others, such as 7m, the
+    buckets differ. Returns a dict of arrays keyed by 'ts' (bucket start,
+    epoch ms), BAR_COLUMNS and 'trades'.
+    """
+    ms = seconds * 1000
+    bucket = ts_ms - ts_ms % ms
+    if len(bucket) == 0:
+        empty = np.empty(0)
+        return {'ts': np.empty(0, np.int64), 'open': empty, 'high': empty, 'low': empty, 'close': empty,
+                'volume': empty, 'trades': np.empty(0, np.int64)}
+    starts = np.flatnonzero(np.r_[True, bucket[1:] != bucket[:-1]])
+    ends = np.r_[starts[1:], len(bucket)]
+    return {
+        'ts': bucket[starts],
+        'open': price[starts],
+        'high': np.maximum.reduceat(price, starts),
+        'low': np.minimum.reduceat(price, starts),
+        'close': price[ends - 1],
+        'volume': np.add.reduceat(qty, starts),
+        'trades': (ends - starts).astype(np.int64),
+    }
+
+
+@timed
+def bars_from_arrays_many(ts_ms, price, qty, offsets, seconds, join='inner'):
+    """
+    bars_from_arrays for N symbols in one pass (epoch-floored buckets, like it).
+    Ticks are concatenated symbol by symbol, each sorted by ts, with symbol i owning rows offsets[i]:offsets[i+1].
+    Returns {'ts': (T,) bucket starts in epoch ms, 'bars': (T, N, 5) float64
+    in BAR_COLUMNS order, 'trades': (T, N) int64}. join='inner' keeps the
+    buckets every symbol traded in. 'outer' keeps all of them, with NaN bars
+    and 0 trades where a symbol did not trade.
+    """
+    offsets = np.asarray(offsets, dtype=np.int64)
+    n = len(offsets) - 1
+    ms = seconds * 1000
+    bucket = ts_ms - ts_ms % ms
+    if len(bucket) == 0:
+        return {'ts': np.empty(0, np.int64), 'bars': np.empty((0, n, len(BAR_COLUMNS))),
+                'trades': np.empty((0, n), np.int64)}
+    # a bar starts where the bucket changes or a new symbol's rows begin
+    edge = np.empty(len(bucket), dtype=bool)
+    edge[0] = True
+    np.not_equal(bucket[1:], bucket[:-1], out=edge[1:])
+    edge[offsets[:-1][np.diff(offsets) > 0]] = True
+    starts = np.flatnonzero(edge)
+    ends = np.r_[starts[1:], len(bucket)]
+    sym = np.searchsorted(offsets, starts, 'right') - 1
+    grid = np.unique(bucket[starts])
+    row = np.searchsorted(grid, bucket[starts])
+    out = np.full((len(grid), n, len(BAR_COLUMNS)), np.nan)
+    out[row, sym, 0] = price[starts]
+    out[row, sym, 1] = np.maximum.reduceat(price, starts)
+    out[row, sym, 2] = np.minimum.reduceat(price, starts)
+    out[row, sym, 3] = price[ends - 1]
+    out[row, sym, 4] = np.add.reduceat(qty, starts)
+    trades = np.zeros((len(grid), n), np.int64)
+    trades[row, sym] = ends - starts
+    if join == 'inner':
+        keep = (trades > 0).all(axis=1)
+        grid, out, trades = grid[keep], out[keep], trades[keep]
+    return {'ts': grid, 'bars': out, 'trades': trades}
+
+
+def _ts_ns(df):
+    return df.index.as_unit('ns').asi8 if len(df) else np.empty(0, np.int64)
+
+
+def align_arrays(stamps, columns, join='inner'):
+    """
+    Align per-symbol arrays on integer timestamps without building a joined
+    DataFrame. stamps[i] are symbol i's sorted, unique timestamps and
+    columns[i] its values (len(stamps[i]) rows, any trailing shape).
+    Returns (grid, (T, N, ...) array), NaN where a symbol has no row ('outer').
+    """
+    if not stamps:
+        return np.empty(0, np.int64), np.empty((0, 0))
+    if join == 'inner':
+        grid = stamps[0]
+        for ts in stamps[1:]:
+            grid = np.intersect1d(grid, ts, assume_unique=True)
+    else:
+        grid = np.unique(np.concatenate(stamps))
+    trailing = np.shape(columns[0])[1:]
+    out = np.full((len(grid), len(stamps)) + trailing, np.nan)
+    for i, (ts, values) in enumerate(zip(stamps, columns)):
+        pos = np.searchsorted(ts, grid)
+        hit = pos < len(ts)
+        hit[hit] = ts[pos[hit]] == grid[hit]
+        out[hit, i] = np.asarray(values)[pos[hit]]
+    return grid, out
+
+
+def align_closes(frames, column='close'):
+    """Inner-join one column of ts-indexed bar frames: (DatetimeIndex, (T, N) float64)."""
+    grid, out = align_arrays([_ts_ns(df) for df in frames],
+                             [df[column].to_numpy(np.float64) if len(df) else np.empty(0) for df in frames])
+    return pd.DatetimeIndex(grid.astype('datetime64[ns]'), name='ts'), out
+
+
+def _stored_source(timeframe):
+    """Largest stored timeframe the requested one is a whole multiple of, or None."""
+    seconds = timeframe_seconds(timeframe)
+    best = None
+    for tf in STORED_TIMEFRAMES:
+        s = timeframe_seconds(tf)
+        if seconds % s == 0 and 86400 % seconds == 0 and (best is None or s > timeframe_seconds(best)):
+            best = tf
+    return best
+
+
+@timed
+def read_bars(symbol, timeframe='1m', since_minutes=60, since=None):
+    """
+    Bars from the collector-maintained bars_<tf> collections. Timeframes that
+    are not stored are rolled up from the largest stored one that divides them.
+    """
+    base = _stored_source(timeframe)
+    if base is None:
+        raise ValueError(f"no stored bars can build timeframe {timeframe}")
+    since = since or datetime.utcnow() - timedelta(minutes=since_minutes)
+    coll = get_collection(bar_collection(base))
+    docs = list(coll.find({'symbol': symbol.lower(), 'ts': {'$gte': since}},
+                          {'_id': 0, 'ts': 1, 'open': 1, 'high': 1, 'low': 1, 'close': 1, 'volume': 1})
+                .sort('ts', 1))
+    df = bars_from_docs(docs, ts_key='ts')
+    if df.empty or timeframe_seconds(timeframe) == timeframe_seconds(base):
+        return df
+    return _rollup(df, timeframe)
+
+
+def _rollup(df, timeframe):
+    r = df.resample(pandas_freq(timeframe))
+    out = pd.DataFrame({'open': r['open'].first(), 'high': r['high'].max(), 'low': r['low'].min(),
+                        'close': r['close'].last(), 'volume': r['volume'].sum()}).dropna(subset=['open'])
+    return out[BAR_COLUMNS]
+
+
+def read_shared_bars(symbol, timeframe, since):
+    """
+    Bars since `since` from the collector's mapped ring of the best stored
+    timeframe (rolled up if needed), or None when there is no ring or it
+    does not reach back to `since`.
+    """
+    base = _stored_source(timeframe)
+    if base is None:
+        return None
+    base_seconds = timeframe_seconds(base)
+    ring = open_ring(symbol, base_seconds)
+    if ring is None or ring.count == 0:
+        return None
+    since_ms = int(pd.Timestamp(since).value // 1_000_000)
+    since_ms -= since_ms % (base_seconds * 1000)
+    # one copy of just the requested rows, taken under the ring's seqlock: the
+    # writer rewrites the open bar and recycles old slots, and this frame goes
+    # on to the rollup, the analytics and the response
+    df = ring.frame(since_ms=since_ms)
+    if ring.view()['ts'][0] > since_ms:
+        return None
+    if df.empty or timeframe_seconds(timeframe) == base_seconds:
+        return df
+    return _rollup(df, timeframe)
+
+
+def load_bars(symbol, timeframe, since, source):
+    """Bars for since <= ts from one source, bypassing the series cache."""
+    if source == 'shared':
+        df = read_shared_bars(symbol, timeframe, since)
+        if df is not None:
+            return df
+        source = 'stored'
+    if source == 'stored' and _stored_source(timeframe) is not None:
+        return read_bars(symbol, timeframe, since=since)
+    if source in ('mongo', 'stored') and 86400 % timeframe_seconds(timeframe) == 0:
+        return aggregate_ohlc(symbol, timeframe, since=since)
+    from analytics.analytics import resample_ohlc
+    return resample_ohlc(arrays_to_frame(fetch_tick_arrays(symbol, since=since)), timeframe)
+
+
+def get_bars(symbol, timeframe='1m', since_minutes=60, source=None, cached=SERIES_CACHE_ENABLED):
+    """
+    OHLCV bars for one symbol over the last `since_minutes` from the selected
+    source ('pandas', 'mongo', 'stored' or 'shared'), memoised in
+    analytics.cache.series_cache (except bars served from the shared rings).
+    """
+    source = source or BAR_SOURCE
+    if source not in BAR_SOURCES:
+        raise ValueError(f"unknown bar source: {source}")
+    seconds = timeframe_seconds(timeframe)
+    window = timedelta(minutes=since_minutes)
+    if source == 'shared':
+        # the rings are already in memory; only the fallback goes through the cache
+        df = read_shared_bars(symbol, timeframe, datetime.utcnow() - window)
+        if df is not None:
+            return df
+        source = 'stored'
+    if not cached:
+        return load_bars(symbol, timeframe, datetime.utcnow() - window, source)
+    key = (symbol.lower(), seconds, since_minutes, source)
+    return series_cache.get(key, seconds, window, lambda since: load_bars(symbol, timeframe, since, source))
+
+
+def load_bar_cube(symbols, timeframe='1m', since_minutes=60, source=None, join='inner',
+                  workers=TICK_FETCH_WORKERS):
+    """
+    Bars of many symbols as one array: (ts epoch ms (T,), symbols with data,
+    (T, N, 5) float64 in BAR_COLUMNS order). With the 'pandas' source and a
+    timeframe that divides a day, all ticks are read together and binned in
+    one pass (bars_from_arrays_many). Other sources and timeframes go through
+    get_bars per symbol, then align_arrays.
+    """
+    source = source or BAR_SOURCE
+    if source not in BAR_SOURCES:
+        raise ValueError(f"unknown bar source: {source}")
+    seconds = timeframe_seconds(timeframe)
+    symbols = list(dict.fromkeys(s.lower() for s in symbols))
+    if source == 'pandas' and 86400 % seconds == 0:
+        ticks = fetch_tick_arrays_many(symbols, since_minutes=since_minutes, workers=workers)
+        counts = np.diff(ticks['offsets'])
+        used = [s for s, c in zip(symbols, counts) if c]
+        offsets = np.concatenate([[0], np.cumsum(counts[counts > 0])])
+        cube = bars_from_arrays_many(ticks['ts'], ticks['price'], ticks['qty'], offsets, seconds, join)
+        return cube['ts'], used, cube['bars']
+    with ThreadPoolExecutor(max_workers=max(1, min(workers, len(symbols) or 1))) as pool:
+        frames = list(pool.map(lambda s: get_bars(s, timeframe, since_minutes=since_minutes, source=source),
+                               symbols))
+    used = [s for s, df in zip(symbols, frames) if not df.empty]
+    frames = [df for df in frames if not df.empty]
+    grid, cube = align_arrays([_ts_ns(df) for df in frames],
+                              [df[BAR_COLUMNS].to_numpy(np.float64) for df in frames], join)
+    return grid // 1_000_000, used, cube.reshape(len(grid), len(used), len(BAR_COLUMNS))
@@ -0,0 +1,326 @@
+# analytics/cache.py
+import json
+import os
+import re
+import shutil
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta
+
+import numpy as np
+import pandas as pd
+
+SERIES_CACHE_ENABLED = os.getenv("SERIES_CACHE", "1") == "1"
+SERIES_CACHE_SIZE = int(os.getenv("SERIES_CACHE_SIZE", "256"))
+SERIES_CACHE_MAX_TTL = float(os.getenv("SERIES_CACHE_MAX_TTL", "60"))
+
+_default_root = "/dev/shm" if os.path.isdir("/dev/shm") else tempfile.gettempdir()
+PAIR_CACHE_BACKEND = os.getenv("PAIR_CACHE", "file")  # file | memory | off
+PAIR_CACHE_DIR = os.getenv("PAIR_CACHE_DIR", os.path.join(_default_root, "gemscap_pair_cache"))
+PAIR_CACHE_SIZE = int(os.getenv("PAIR_CACHE_SIZE", "256"))
+PAIR_CACHE_VERSION = 2
+
+
+class _Entry:
+    __slots__ = ('df', 'refreshed')
+
+    def __init__(self, df, refreshed):
+        self.df = df
+        self.refreshed = refreshed
+
+
+class SeriesCache:
+    """
+    Size-bounded LRU of bar frames keyed by (symbol, timeframe, window, source).
+    An entry younger than its TTL (the bar width, capped at max_ttl) is returned
+    as is. An older entry is refreshed by loading only the bars from its last,
+    possibly still open, bar onwards and appending them; the window is then
+    trimmed from the left. Returned frames are shared and must not be modified.
+    """
+
+    def __init__(self, max_entries=SERIES_CACHE_SIZE, max_ttl=SERIES_CACHE_MAX_TTL):
+        self.max_entries = max_entries
+        self.max_ttl = max_ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.refreshes = 0
+        self.evictions = 0
+
+    def get(self, key, bar_seconds, window, load):
+        """
+        `load(since)` must return bars (ts-indexed DataFrame) from `since` to now.
+        `window` is a timedelta; `bar_seconds` the bar width.
+        """
+        ttl = min(bar_seconds, self.max_ttl)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                if time.monotonic() - entry.refreshed < ttl:
+                    self.hits += 1
+                    return entry.df
+        now = datetime.utcnow()
+        if entry is not None and not entry.df.empty:
+            last = entry.df.index[-1]
+            tail = load(last.to_pydatetime())
+            df = pd.concat([entry.df[entry.df.index < last], tail]) if not tail.empty else entry.df
+            counter = 'refreshes'
+        else:
+            df = load(now - window)
+            counter = 'misses'
+        if not df.empty:
+            # keep every bar whose bucket ends after the window start
+            df = df[df.index > now - window - timedelta(seconds=bar_seconds)]
+        with self._lock:
+            setattr(self, counter, getattr(self, counter) + 1)
+            self._entries[key] = _Entry(df, time.monotonic())
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+        return df
+
+    def invalidate(self, symbol=None):
+        """Drop all entries, or only those for one symbol (key[0])."""
+        with self._lock:
+            if symbol is None:
+                self._entries.clear()
+                return
+            for key in [k for k in self._entries if k[0] == symbol.lower()]:
+                del self._entries[key]
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses + self.refreshes
+            return {
+                'entries': len(self._entries),
+                'max_entries': self.max_entries,
+                'hits': self.hits,
+                'misses': self.misses,
+                'refreshes': self.refreshes,
+                'evictions': self.evictions,
+                'hit_ratio': round(self.hits / lookups, 4) if lookups else 0.0,
+            }
+
+
+series_cache = SeriesCache()
+
+
+def bars_watermark(*frames):
+    """Epoch ms of the last bar of each frame (None when empty): what a cached pair result covers."""
+    return tuple(int(df.index[-1].value // 1_000_000) if len(df) else None for df in frames)
+
+
+def _encode(watermark, result):
+    """
+    A pair result as npz members: each pd.Series becomes '<key>' (values) and
+    '<key>.ts' (int64 ns index); everything else must be JSON and goes to '_meta'.
+    """
+    arrays, scalars, series = {}, {}, {}
+    for k, v in result.items():
+        if isinstance(v, pd.Series):
+            arrays[k] = v.to_numpy(dtype='float64')
+            arrays[f'{k}.ts'] = v.index.asi8
+            series[k] = [v.name, v.index.name]
+        else:
+            scalars[k] = v
+    meta = {'version': PAIR_CACHE_VERSION, 'watermark': list(watermark), 'scalars': scalars, 'series': series}
+    arrays['_meta'] = np.frombuffer(json.dumps(meta, default=float).encode(), dtype=np.uint8)
+    return arrays
+
+
+def _decode(f):
+    """(version, watermark, result) from a file written with _encode; never unpickles."""
+    with np.load(f, allow_pickle=False) as z:
+        meta = json.loads(z['_meta'].tobytes())
+        result = dict(meta['scalars'])
+        for k, (name, index_name) in meta['series'].items():
+            index = pd.DatetimeIndex(z[f'{k}.ts'].view('datetime64[ns]'), name=index_name)
+            result[k] = pd.Series(z[k], index=index, name=name)
+    return meta['version'], tuple(meta['watermark']), result
+
+
+class PairResultCache:
+    """
+    Computed pair statistics keyed by (y, x, timeframe, window, hedge, source),
+    stored together with the watermark (bars_watermark) of the bars they were
+    fitted on. A lookup with the same watermark returns the stored result
+    without refitting. Once a new bar opens on either leg the watermark moves
+    and the entry is recomputed, so a result can lag the still-open bar by up
+    to one bar width, like SeriesCache.
+
+    backend='file' writes each entry atomically to <root>/<y>-<x>/<rest>.npz
+    (default under /dev/shm), so every worker process and the dashboard share
+    one fit per bar. Files hold data only: the series as plain arrays and the
+    scalars as JSON, loaded with allow_pickle=False, so a planted file can at
+    worst be a wrong result, never code. The root is created with mode 0700
+    and the file backend is refused (falling back to 'memory') when the root
+    is owned by another user or writable by group/others. The decoded result
+    is also kept in a small in-process LRU and reused as long as the file's
+    mtime and size have not changed.
+    backend='memory' keeps only the LRU; 'off' disables caching. Stats are
+    per process.
+    """
+
+    _SAFE = re.compile(r'^[a-z0-9_]+$')
+
+    def __init__(self, backend=PAIR_CACHE_BACKEND, root=PAIR_CACHE_DIR, max_entries=PAIR_CACHE_SIZE):
+        self.backend = backend
+        self.root = root
+        self.max_entries = max_entries
+        self._local = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.local_hits = 0
+        self.misses = 0
+        self.stale = 0
+        self.writes = 0
+        self.invalidations = 0
+        self.errors = 0
+        if backend == 'file' and not self._private_root():
+            self.backend = 'memory'
+
+    def _private_root(self):
+        """Create the root 0700, and accept it only if it is ours and closed to other users."""
+        try:
+            os.makedirs(self.root, mode=0o700, exist_ok=True)
+            st = os.lstat(self.root)
+        except OSError:
+            return False
+        return (os.path.isdir(self.root) and not os.path.islink(self.root)
+                and st.st_uid == os.getuid() and not st.st_mode & 0o022)
+
+    def key(self, sym_y, sym_x, timeframe, window, hedge, source):
+        """Cache key, or None when a part is not safe to use in a file name (the result is then not cached)."""
+        parts = [str(p).lower() for p in (sym_y, sym_x, timeframe, window, hedge, source)]
+        if self.backend == 'off' or not all(self._SAFE.match(p) for p in parts):
+            return None
+        return f"{parts[0]}-{parts[1]}", '-'.join(parts[2:])
+
+    def _path(self, key):
+        return os.path.join(self.root, key[0], key[1] + '.npz')
+
+    def _count(self, counter):
+        with self._lock:
+            setattr(self, counter, getattr(self, counter) + 1)
+
+    def get(self, key, watermark):
+        """The stored result for `key` if it was computed at exactly `watermark`, else None."""
+        with self._lock:
+            entry = self._local.get(key)
+            if entry is not None:
+                self._local.move_to_end(key)
+        stamp = None
+        if self.backend == 'file':
+            try:
+                st = os.stat(self._path(key))
+                stamp = (st.st_mtime_ns, st.st_size)
+            except OSError:
+                entry = None  # never written, or invalidated by another process
+        if entry is not None and entry[0] == watermark and entry[2] == stamp:
+            with self._lock:
+                self.hits += 1
+                self.local_hits += 1
+            return entry[1]
+        if self.backend == 'file' and stamp is not None:
+            try:
+                with open(self._path(key), 'rb') as f:
+                    version, stored, result = _decode(f)
+            except Exception:
+                self._count('errors')
+            else:
+                if version == PAIR_CACHE_VERSION and stored == watermark:
+                    self._remember(key, watermark, result, stamp)
+                    self._count('hits')
+                    return result
+                self._count('stale')
+                return None
+        self._count('misses' if entry is None else 'stale')
+        return None
+
+    def put(self, key, watermark, result):
+        stamp = None
+        if self.backend == 'file':
+            path = self._path(key)
+            tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            try:
+                os.makedirs(os.path.dirname(path), mode=0o700, exist_ok=True)
+                with open(tmp, 'wb') as f:
+                    np.savez(f, **_encode(watermark, result))
+                os.replace(tmp, path)
+                st = os.stat(path)
+                stamp = (st.st_mtime_ns, st.st_size)
+            except (OSError, TypeError, ValueError):
+                # unwritable, or not serialisable as data: the next lookup recomputes
+                self._count('errors')
+                try:
+                    os.unlink(tmp)
+                except OSError:
+                    pass
+                return
+        self._remember(key, watermark, result, stamp)
+        self._count('writes')
+
+    def _remember(self, key, watermark, result, stamp):
+        with self._lock:
+            self._local[key] = (watermark, result, stamp)
+            self._local.move_to_end(key)
+            while len(self._local) > self.max_entries:
+                self._local.popitem(last=False)
+
+    def get_or_compute(self, key, watermark, compute):
+        """compute() on a miss, stored under `watermark`; key=None just computes."""
+        if key is None:
+            return compute()
+        result = self.get(key, watermark)
+        if result is None:
+            result = compute()
+            self.put(key, watermark, result)
+        return result
+
+    def invalidate(self, symbol=None):
+        """Drop all entries, or those of every pair with `symbol` on either leg, in all processes (file backend)."""
+        symbol = symbol.lower() if symbol is not None else None
+
+        def hit(pair):
+            return symbol is None or symbol in pair.split('-')
+
+        with self._lock:
+            for key in [k for k in self._local if hit(k[0])]:
+                del self._local[key]
+            self.invalidations += 1
+        if self.backend == 'file' and os.path.isdir(self.root):
+            for pair in os.listdir(self.root):
+                if hit(pair):
+                    shutil.rmtree(os.path.join(self.root, pair), ignore_errors=True)
+
+    def _files(self):
+        if self.backend != 'file' or not os.path.isdir(self.root):
+            return 0
+        return sum(len([f for f in os.listdir(os.path.join(self.root, d)) if f.endswith('.npz')])
+                   for d in os.listdir(self.root) if os.path.isdir(os.path.join(self.root, d)))
+
+    def stats(self):
+        files = self._files()
+        with self._lock:
+            lookups = self.hits + self.misses + self.stale
+            return {
+                'backend': self.backend,
+                'entries': files if self.backend == 'file' else len(self._local),
+                'local_entries': len(self._local),
+                'hits': self.hits,
+                'local_hits': self.local_hits,
+                'misses': self.misses,
+                'stale': self.stale,
+                'writes': self.writes,
+                'invalidations': self.invalidations,
+                'errors': self.errors,
+                'hit_ratio': round(self.hits / lookups, 4) if lookups else 0.0,
+            }
+
+
+pair_cache = PairResultCache()
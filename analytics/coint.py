@@ -0,0 +1,149 @@
+# analytics/coint.py
+"""
+ADF and Engle-Granger tests in plain NumPy.
+
+Results match statsmodels' adfuller / coint (same lag search, same sample
+trimming, same MacKinnon approximations). The difference is the lag search.
+statsmodels fits one OLS model per candidate lag. Here a single QR
+decomposition of the widest design is shared by all candidates: the
+regressors are nested, so each candidate's residual sum of squares is read
+off the projected response. Lag selection is either by information
+criterion up to a cap (autolag='aic'|'bic', maxlag) or skipped entirely
+(autolag=None uses exactly maxlag lags).
+
+P-values and critical values come from statsmodels' public MacKinnon
+functions (mackinnonp, mackinnoncrit); critical values are cached per
+(N, regression, nobs).
+"""
+import math
+import os
+from functools import lru_cache
+
+import numpy as np
+from statsmodels.tsa.adfvalues import mackinnoncrit, mackinnonp
+
+from analytics.hedge import ols_beta
+
+COINT_AUTOLAG = os.getenv("COINT_AUTOLAG", "aic").lower()  # aic | bic | none
+COINT_AUTOLAG = None if COINT_AUTOLAG in ('', 'none') else COINT_AUTOLAG
+COINT_MAXLAG = int(os.getenv("COINT_MAXLAG")) if os.getenv("COINT_MAXLAG") else None
+
+_SQRTEPS = np.sqrt(np.finfo(np.float64).eps)
+
+
+def mackinnon_pvalue(stat, regression='c', n=1):
+    """MacKinnon (1994) approximate p-value of a (A)DF / Engle-Granger t statistic."""
+    return float(mackinnonp(stat, regression, n))
+
+
+@lru_cache(maxsize=1024)
+def mackinnon_crit(n=1, regression='c', nobs=None):
+    """1%, 5%, 10% critical values (MacKinnon 2010) for a sample of `nobs`; asymptotic when None."""
+    return tuple(float(v) for v in mackinnoncrit(n, regression, np.inf if nobs is None else nobs))
+
+
+def _trend(nobs, regression):
+    if regression == 'n':
+        return np.empty((nobs, 0))
+    cols = [np.ones(nobs)]
+    if regression in ('ct', 'ctt'):
+        t = np.arange(1, nobs + 1, dtype=np.float64)
+        cols.append(t)
+        if regression == 'ctt':
+            cols.append(t * t)
+    return np.column_stack(cols)
+
+
+def _design(x, xdiff, lags):
+    """Level x_{t-1} followed by lags 1..lags of the first difference, and the response dx_t."""
+    cols = [x[lags:-1]] + [xdiff[lags - k:len(xdiff) - k] for k in range(1, lags + 1)]
+    return np.column_stack(cols), xdiff[lags:]
+
+
+def _select_lag(x, xdiff, maxlag, regression, autolag):
+    """Best lag by AIC/BIC over 0..maxlag on the common maxlag-trimmed sample."""
+    lagged, y = _design(x, xdiff, maxlag)
+    nobs = len(y)
+    trend = _trend(nobs, regression)
+    full = np.hstack([trend, lagged])
+    q, r = np.linalg.qr(full)
+    qty = q.T @ y
+    ssr_full = float(np.dot(y - q @ qty, y - q @ qty))
+    # dropping trailing columns adds their projections back to the residual
+    tail = np.cumsum((qty ** 2)[::-1])[::-1]
+    start = trend.shape[1] + 1
+    ks = np.arange(start, full.shape[1] + 1)
+    ssr = ssr_full + np.append(tail, 0.0)[ks]
+    penalty = 2.0 * ks if autolag == 'aic' else ks * np.log(nobs)
+    ic = nobs * (np.log(2 * np.pi * ssr / nobs) + 1.0) + penalty
+    best = int(np.argmin(ic))
+    return best, float(ic[best])
+
+
+def adf(x, regression='c', maxlag=COINT_MAXLAG, autolag=COINT_AUTOLAG):
+    """
+    Augmented Dickey-Fuller test. Returns dict with 'adf' (t statistic), 'pvalue',
+    'usedlag', 'nobs', 'crit_vals' and 'icbest' (None without autolag).
+    """
+    x = np.asarray(x, dtype=np.float64)
+    if x.max() == x.min():
+        raise ValueError("Invalid input, x is constant")
+    n = len(x)
+    ntrend = len(regression) if regression != 'n' else 0
+    if maxlag is None:
+        maxlag = min(n // 2 - ntrend - 1, int(np.ceil(12.0 * np.power(n / 100.0, 1 / 4.0))))
+        if maxlag < 0:
+            raise ValueError("sample size is too short to use selected regression component")
+    elif maxlag > n // 2 - ntrend - 1:
+        raise ValueError("maxlag must be less than (nobs/2 - 1 - ntrend)")
+    xdiff = np.diff(x)
+    icbest = None
+    lags = maxlag
+    if autolag:
+        lags, icbest = _select_lag(x, xdiff, maxlag, regression, autolag)
+    lagged, y = _design(x, xdiff, lags)
+    nobs = len(y)
+    # level column last, so its t statistic falls out of the last row of R
+    design = np.hstack([_trend(nobs, regression), lagged[:, 1:], lagged[:, :1]])
+    q, r = np.linalg.qr(design)
+    qty = q.T @ y
+    resid = y - q @ qty
+    s = math.sqrt(float(np.dot(resid, resid)) / (nobs - design.shape[1]))
+    stat = float(np.sign(r[-1, -1]) * qty[-1] / s)
+    crit = mackinnon_crit(1, regression, nobs)
+    return {
+        'adf': stat,
+        'pvalue': mackinnon_pvalue(stat, regression, 1),
+        'usedlag': int(lags),
+        'nobs': int(nobs),
+        'crit_vals': {'1%': crit[0], '5%': crit[1], '10%': crit[2]},
+        'icbest': icbest,
+    }
+
+
+def engle_granger(y, x, maxlag=COINT_MAXLAG, autolag=COINT_AUTOLAG):
+    """
+    Two-step Engle-Granger test of y = alpha + beta * x + e (constant, no trend),
+    as statsmodels' coint. Returns dict with 't_stat', 'pvalue', 'crit_vals',
+    'beta', 'alpha' and 'usedlag'.
+    """
+    y = np.asarray(y, dtype=np.float64)
+    x = np.asarray(x, dtype=np.float64)
+    beta, alpha = ols_beta(y, x)
+    resid = y - beta * x - alpha
+    yc = y - y.mean()
+    rsq = 1.0 - float(np.dot(resid, resid)) / float(np.dot(yc, yc))
+    if rsq < 1 - 100 * _SQRTEPS:
+        res = adf(resid, regression='n', maxlag=maxlag, autolag=autolag)
+        stat, usedlag = res['adf'], res['usedlag']
+    else:
+        # (almost) perfectly collinear: the residual has no unit root to test
+        stat, usedlag = -np.inf, None
+    return {
+        't_stat': float(stat),
+        'pvalue': mackinnon_pvalue(stat, 'c', 2),
+        'crit_vals': list(mackinnon_crit(2, 'c', len(y) - 1)),
+        'beta': beta,
+        'alpha': alpha,
+        'usedlag': usedlag,
+    }
@@ -0,0 +1,249 @@
+# analytics/correlation.py
+"""
+Correlation matrices for large symbol sets, maintained incrementally.
+
+Close series are fetched concurrently and inner-joined into one (T, N)
+float64 matrix. RollingCorrelation keeps the window's column sums and
+cross-product matrix and updates them in O(N^2) per bar (re-anchored on
+the window contents every `window` bars to stop drift); EWCorrelation keeps
+an exponentially weighted mean and covariance. A CorrelationEngine owns one
+such state for a (symbols, timeframe, mode, window) combination and on
+refresh() only feeds the bars that closed since the previous call, so
+repeated /api/corr_heatmap requests do not rebuild the N x N matrix.
+"""
+import math
+import os
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from analytics.bars import align_arrays, get_bars, timeframe_seconds
+
+CORR_FETCH_WORKERS = int(os.getenv("CORR_FETCH_WORKERS", "8"))
+CORR_MAX_ENGINES = int(os.getenv("CORR_MAX_ENGINES", "16"))
+CORR_MODES = ('rolling', 'ewm')
+
+
+def fetch_closes(symbols, timeframe='1m', since_minutes=6 * 60, source=None, workers=CORR_FETCH_WORKERS):
+    """{symbol: close series}, fetched on a thread pool; symbols without bars are left out."""
+    if not symbols:
+        return {}
+
+    def one(s):
+        return get_bars(s, timeframe, since_minutes=since_minutes, source=source)
+
+    with ThreadPoolExecutor(max_workers=max(1, min(workers, len(symbols)))) as pool:
+        frames = list(pool.map(one, symbols))
+    return {s: df['close'] for s, df in zip(symbols, frames) if not df.empty}
+
+
+def align(closes):
+    """Inner-join close series on timestamp: (index, symbols, (T, N) float64 array)."""
+    if not closes:
+        return pd.DatetimeIndex([]), [], np.empty((0, 0))
+    # integer timestamps instead of pd.concat: no joined frame, one copy into the matrix
+    grid, matrix = align_arrays([s.index.as_unit('ns').asi8 for s in closes.values()],
+                                [s.to_numpy(np.float64) for s in closes.values()])
+    keep = ~np.isnan(matrix).any(axis=1)
+    return pd.DatetimeIndex(grid[keep].astype('datetime64[ns]'), name='ts'), list(closes), matrix[keep]
+
+
+def _to_corr(cov):
+    std = np.sqrt(np.clip(np.diag(cov), 0.0, None))
+    with np.errstate(divide='ignore', invalid='ignore'):
+        corr = cov / np.outer(std, std)
+    return np.clip(corr, -1.0, 1.0)
+
+
+def top_pairs(corr, symbols, k=10, symbol=None, absolute=True):
+    """
+    The k most correlated pairs as [(a, b, corr)], highest first (by |corr|
+    when `absolute`). With `symbol`, only that symbol's partners are ranked.
+    """
+    corr = np.nan_to_num(corr, nan=0.0)
+    if symbol is not None:
+        i = symbols.index(symbol)
+        others = np.array([j for j in range(len(symbols)) if j != i], dtype=np.intp)
+        rows, cols = np.full(len(others), i), others
+    else:
+        rows, cols = np.triu_indices(len(symbols), 1)
+    vals = corr[rows, cols]
+    key = np.abs(vals) if absolute else vals
+    k = min(k, len(vals))
+    if k <= 0:
+        return []
+    idx = np.argpartition(-key, k - 1)[:k]
+    idx = idx[np.argsort(-key[idx], kind='stable')]
+    return [(symbols[rows[j]], symbols[cols[j]], float(vals[j])) for j in idx]
+
+
+class RollingCorrelation:
+    """Correlation of the last `window` rows; push() is O(N^2)."""
+
+    def __init__(self, n, window):
+        self.n = n
+        self.window = int(window)
+        self.buf = np.empty((self.window, n))
+        self.count = 0
+        self.pos = 0
+        self.shift = np.zeros(n)
+        self.s1 = np.zeros(n)
+        self.s2 = np.zeros((n, n))
+        self.pushes = 0
+
+    def extend(self, rows):
+        rows = np.asarray(rows, dtype=np.float64)
+        if len(rows) >= self.window:
+            # the old contents fall out of the window entirely
+            self.buf[:] = rows[-self.window:]
+            self.count = self.window
+            self.pos = 0
+            self._reanchor()
+            return
+        for row in rows:
+            self.push(row)
+
+    def push(self, row):
+        if self.count == 0:
+            self.shift = row.copy()
+        if self.count == self.window:
+            old = self.buf[self.pos] - self.shift
+            self.s1 -= old
+            self.s2 -= np.outer(old, old)
+        else:
+            self.count += 1
+        self.buf[self.pos] = row
+        self.pos = (self.pos + 1) % self.window
+        d = row - self.shift
+        self.s1 += d
+        self.s2 += np.outer(d, d)
+        self.pushes += 1
+        if self.pushes >= self.window:
+            self._reanchor()
+
+    def _reanchor(self):
+        rows = self.buf[:self.count]
+        self.shift = rows.mean(axis=0)
+        d = rows - self.shift
+        self.s1 = d.sum(axis=0)
+        self.s2 = d.T @ d
+        self.pushes = 0
+
+    def cov(self):
+        if self.count < 2:
+            return np.full((self.n, self.n), np.nan)
+        m = self.s1 / self.count
+        return self.s2 / self.count - np.outer(m, m)
+
+    def corr(self):
+        return _to_corr(self.cov())
+
+
+class EWCorrelation:
+    """Exponentially weighted correlation (pandas ewm(halflife, adjust=False) weights); push() is O(N^2)."""
+
+    def __init__(self, n, halflife):
+        self.n = n
+        self.alpha = 1.0 - math.exp(math.log(0.5) / halflife)
+        self.mean = None
+        self.covm = np.zeros((n, n))
+        self.count = 0
+
+    def extend(self, rows):
+        for row in np.asarray(rows, dtype=np.float64):
+            self.push(row)
+
+    def push(self, row):
+        self.count += 1
+        if self.mean is None:
+            self.mean = row.copy()
+            return
+        a = self.alpha
+        d = row - self.mean
+        self.mean += a * d
+        self.covm = (1.0 - a) * (self.covm + a * np.outer(d, d))
+
+    def cov(self):
+        return self.covm if self.count >= 2 else np.full((self.n, self.n), np.nan)
+
+    def corr(self):
+        return _to_corr(self.cov())
+
+
+class CorrelationEngine:
+    """
+    Correlation state for one symbol set. refresh() reads the bars (through the
+    series cache), drops the still-open last bar and feeds only rows newer than
+    the last one seen. The state is rebuilt when the set of symbols with data
+    changes.
+    """
+
+    def __init__(self, symbols, timeframe='1m', mode='rolling', window=360, halflife=60, source=None):
+        if mode not in CORR_MODES:
+            raise ValueError(f"mode must be one of {', '.join(CORR_MODES)}")
+        self.symbols = list(symbols)
+        self.timeframe = timeframe
+        self.mode = mode
+        self.window = int(window)
+        self.halflife = float(halflife)
+        self.source = source
+        bar = timeframe_seconds(timeframe)
+        # ewm: 10 half-lives of history leave < 0.1% of the weight unread
+        bars_needed = self.window if mode == 'rolling' else int(10 * self.halflife)
+        self.since_minutes = math.ceil((bars_needed + 1) * bar / 60.0)
+        self.used = []
+        self.state = None
+        self.last_ts = None
+        self._lock = threading.Lock()
+
+    def _new_state(self, n):
+        return RollingCorrelation(n, self.window) if self.mode == 'rolling' else EWCorrelation(n, self.halflife)
+
+    def refresh(self):
+        with self._lock:
+            closes = fetch_closes(self.symbols, self.timeframe, self.since_minutes, self.source)
+            index, used, matrix = align(closes)
+            if len(index) < 2:
+                return self
+            index, matrix = index[:-1], matrix[:-1]
+            if used != self.used or self.state is None:
+                self.used = used
+                self.state = self._new_state(len(used))
+                self.last_ts = None
+            new = index > self.last_ts if self.last_ts is not None else np.ones(len(index), dtype=bool)
+            if new.any():
+                self.state.extend(matrix[new])
+                self.last_ts = index[-1]
+            return self
+
+    def corr(self):
+        """N x N correlation DataFrame over the symbols that have data."""
+        if self.state is None:
+            return pd.DataFrame()
+        return pd.DataFrame(self.state.corr(), index=self.used, columns=self.used)
+
+    def top(self, k=10, symbol=None, absolute=True):
+        if self.state is None:
+            return []
+        return top_pairs(self.state.corr(), self.used, k, symbol, absolute)
+
+
+_engines = OrderedDict()
+_engines_lock = threading.Lock()
+
+
+def get_engine(symbols, timeframe='1m', mode='rolling', window=360, halflife=60, source=None):
+    """Shared engine per (symbols, timeframe, mode, window/halflife, source); least recently used dropped."""
+    symbols = list(dict.fromkeys(s.lower() for s in symbols))
+    key = (tuple(sorted(symbols)), timeframe, mode, int(window) if mode == 'rolling' else float(halflife), source)
+    with _engines_lock:
+        engine = _engines.get(key)
+        if engine is None:
+            engine = _engines[key] = CorrelationEngine(sorted(symbols), timeframe, mode, window, halflife, source)
+            while len(_engines) > CORR_MAX_ENGINES:
+                _engines.popitem(last=False)
+        _engines.move_to_end(key)
+    return engine
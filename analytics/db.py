@@ -0,0 +1,109 @@
+# analytics/db.py
+import logging
+import os
+import threading
+import time
+from functools import wraps
+
+import pymongo
+
+from analytics.metrics import observe_call
+
+MONGO_URI = os.getenv("MONGO_URI", "mongodb://localhost:27017")
+DB_NAME = os.getenv("MONGO_DB", "gemscap")
+TICKS_COLL = "ticks"
+MAX_POOL_SIZE = int(os.getenv("MONGO_MAX_POOL_SIZE", "50"))
+MIN_POOL_SIZE = int(os.getenv("MONGO_MIN_POOL_SIZE", "0"))
+SERVER_SELECTION_TIMEOUT_MS = int(os.getenv("MONGO_SERVER_SELECTION_TIMEOUT_MS", "5000"))
+
+logger = logging.getLogger(__name__)
+
+_client = None
+_client_pid = None
+_lock = threading.Lock()
+
+
+def get_client():
+    """
+    Process-wide MongoClient, created on first use.
+    A client inherited across fork() is never reused: the child builds its own
+    pool the first time it asks for one.
+    """
+    global _client, _client_pid
+    pid = os.getpid()
+    if _client is not None and _client_pid == pid:
+        return _client
+    with _lock:
+        if _client is None or _client_pid != pid:
+            _client = pymongo.MongoClient(
+                MONGO_URI,
+                maxPoolSize=MAX_POOL_SIZE,
+                minPoolSize=MIN_POOL_SIZE,
+                serverSelectionTimeoutMS=SERVER_SELECTION_TIMEOUT_MS,
+            )
+            _client_pid = pid
+    return _client
+
+
+def get_collection(name=TICKS_COLL):
+    return get_client()[DB_NAME][name]
+
+
+def close_client():
+    global _client, _client_pid
+    with _lock:
+        if _client is not None and _client_pid == os.getpid():
+            _client.close()
+        _client = None
+        _client_pid = None
+
+
+def _forget_client():
+    # after fork the parent's sockets must not be touched, only dropped
+    global _client, _client_pid
+    _client = None
+    _client_pid = None
+
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_forget_client)
+
+
+# --- PER-CALL TIMING ---
+_timings = {}
+_timings_lock = threading.Lock()
+
+
+def record_timing(name, elapsed_ms, rows=None):
+    with _timings_lock:
+        t = _timings.get(name)
+        if t is None:
+            t = _timings[name] = {'calls': 0, 'total_ms': 0.0, 'max_ms': 0.0, 'last_ms': 0.0, 'rows': 0}
+        t['calls'] += 1
+        t['total_ms'] += elapsed_ms
+        t['last_ms'] = elapsed_ms
+        t['max_ms'] = max(t['max_ms'], elapsed_ms)
+        if rows is not None:
+            t['rows'] += rows
+    observe_call(name, elapsed_ms / 1000.0, rows)
+    logger.debug("%s took %.2f ms (rows=%s)", name, elapsed_ms, rows)
+
+
+def timed(fn):
+    """Record wall time of each call under the function name; len() of the result is kept as rows."""
+    @wraps(fn)
+    def wrapper(*args, **kwargs):
+        t0 = time.perf_counter()
+        out = fn(*args, **kwargs)
+        rows = None if isinstance(out, dict) or not hasattr(out, '__len__') else len(out)
+        record_timing(fn.__name__, (time.perf_counter() - t0) * 1000.0, rows)
+        return out
+    return wrapper
+
+
+def timing_stats(reset=False):
+    with _timings_lock:
+        out = {k: dict(v, avg_ms=v['total_ms'] / v['calls']) for k, v in _timings.items()}
+        if reset:
+            _timings.clear()
+    return out
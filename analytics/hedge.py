@@ -0,0 +1,182 @@
+# analytics/hedge.py
+"""
+Hedge ratio estimators in plain NumPy (no statsmodels model construction).
+
+ols_beta      closed-form static OLS y = alpha + beta * x
+rolling_ols   windowed OLS for every bar in O(n) from cumulative sums
+KalmanHedge   recursive (random-walk coefficient) estimate updated per bar;
+              delta -> 0 gives recursive least squares over all history
+"""
+import math
+
+import numpy as np
+import pandas as pd
+
+HEDGE_METHODS = ('static', 'rolling', 'kalman')
+KALMAN_WARMUP = 30
+
+
+def ols_beta(y, x):
+    """(beta, alpha) of y = alpha + beta * x."""
+    y = np.asarray(y, dtype=np.float64)
+    x = np.asarray(x, dtype=np.float64)
+    xm, ym = x.mean(), y.mean()
+    xc = x - xm
+    beta = float(np.dot(xc, y - ym) / np.dot(xc, xc))
+    return beta, float(ym - beta * xm)
+
+
+def rolling_ols(y, x, window):
+    """
+    Per-bar (beta, alpha) arrays over trailing windows, NaN until `window` bars.
+    Inputs are centred on their full-sample means before the cumulative sums
+    to keep cancellation small.
+    """
+    y = np.asarray(y, dtype=np.float64)
+    x = np.asarray(x, dtype=np.float64)
+    n = len(y)
+    beta = np.full(n, np.nan)
+    alpha = np.full(n, np.nan)
+    if n < window or window < 2:
+        return beta, alpha
+    xm, ym = x.mean(), y.mean()
+    xc, yc = x - xm, y - ym
+
+    def wsum(a):
+        c = np.concatenate(([0.0], np.cumsum(a)))
+        return c[window:] - c[:-window]
+
+    sx, sy = wsum(xc), wsum(yc)
+    sxx, sxy = wsum(xc * xc), wsum(xc * yc)
+    var = sxx - sx * sx / window
+    cov = sxy - sx * sy / window
+    with np.errstate(divide='ignore', invalid='ignore'):
+        b = np.where(var > 0, cov / var, np.nan)
+    beta[window - 1:] = b
+    alpha[window - 1:] = (sy - b * sx) / window + ym - b * xm
+    return beta, alpha
+
+
+class KalmanHedge:
+    """
+    Time-varying (beta, alpha) with a random-walk state and observation
+    y_t = beta_t * x_t + alpha_t + e_t. update() is O(1) per bar and returns
+    (beta, alpha, forecast_error, forecast_std); forecast_error / forecast_std
+    is a ready-made spread z-score.
+    """
+
+    def __init__(self, delta=1e-3, ve=1.0, beta=0.0, alpha=0.0, p=None, x_sq=1.0):
+        # state noise relative to the observation noise; beta's share is scaled
+        # by E[x^2] so delta is unit-free whatever the price levels are
+        w = delta / (1.0 - delta)
+        self.vw_b = w * ve / (x_sq or 1.0)
+        self.vw_a = w * ve
+        self.ve = ve
+        self.beta = beta
+        self.alpha = alpha
+        # state covariance [[p00, p01], [p01, p11]]
+        self.p00, self.p01, self.p11 = p if p is not None else (0.0, 0.0, 0.0)
+
+    @classmethod
+    def from_history(cls, y, x, delta=1e-3):
+        """
+        Warm start from a static OLS fit on the given bars: ve from its residual
+        variance, P from its coefficient covariance ve * (X'X)^-1, so later bars
+        refine the fit as recursive least squares would.
+        """
+        y = np.asarray(y, dtype=np.float64)
+        x = np.asarray(x, dtype=np.float64)
+        beta, alpha = ols_beta(y, x)
+        resid = y - beta * x - alpha
+        ve = float(resid.var()) or 1e-12
+        sxx, sx, n = float(np.dot(x, x)), float(x.sum()), len(x)
+        det = sxx * n - sx * sx
+        p = (ve * n / det, -ve * sx / det, ve * sxx / det) if det > 0 else None
+        return cls(delta=delta, ve=ve, beta=beta, alpha=alpha, p=p, x_sq=float(np.mean(np.square(x))) or 1.0)
+
+    def update(self, y, x):
+        # predict: R = P + diag(vw_b, vw_a)
+        r00 = self.p00 + self.vw_b
+        r01 = self.p01
+        r11 = self.p11 + self.vw_a
+        e = y - (self.beta * x + self.alpha)
+        # F R F' with F = [x, 1]
+        rf0 = r00 * x + r01
+        rf1 = r01 * x + r11
+        q = x * rf0 + rf1 + self.ve
+        k0, k1 = rf0 / q, rf1 / q
+        self.beta += k0 * e
+        self.alpha += k1 * e
+        self.p00 = r00 - k0 * rf0
+        self.p01 = r01 - k0 * rf1
+        self.p11 = r11 - k1 * rf1
+        return self.beta, self.alpha, e, math.sqrt(q)
+
+    def snapshot(self):
+        return {'vw_b': self.vw_b, 'vw_a': self.vw_a, 've': self.ve, 'beta': self.beta, 'alpha': self.alpha,
+                'p': [self.p00, self.p01, self.p11]}
+
+    @classmethod
+    def restore(cls, state):
+        obj = cls(ve=state['ve'], beta=state['beta'], alpha=state['alpha'], p=state['p'])
+        obj.vw_b, obj.vw_a = state['vw_b'], state['vw_a']
+        return obj
+
+
+def kalman_hedge(y, x, delta=1e-3, warmup=KALMAN_WARMUP):
+    """
+    Run KalmanHedge over arrays. The first `warmup` bars seed the state with a
+    static OLS fit and carry that fit's coefficients. Returns dict of arrays
+    beta, alpha, error, std and the number of warm-up bars; their error is an
+    in-sample residual, not a forecast error, and their std is NaN.
+    """
+    y = np.asarray(y, dtype=np.float64)
+    x = np.asarray(x, dtype=np.float64)
+    n = len(y)
+    warmup = max(2, min(warmup, n))
+    kf = KalmanHedge.from_history(y[:warmup], x[:warmup], delta=delta)
+    beta = np.empty(n)
+    alpha = np.empty(n)
+    err = np.empty(n)
+    std = np.empty(n)
+    beta[:warmup], alpha[:warmup] = kf.beta, kf.alpha
+    err[:warmup] = y[:warmup] - kf.beta * x[:warmup] - kf.alpha
+    std[:warmup] = np.nan
+    for i in range(warmup, n):
+        beta[i], alpha[i], err[i], std[i] = kf.update(y[i], x[i])
+    return {'beta': beta, 'alpha': alpha, 'error': err, 'std': std, 'warmup': warmup}
+
+
+def hedged_spread(y: pd.Series, x: pd.Series, method='static', window=60, delta=1e-3):
+    """
+    Spread y - beta * x - alpha for aligned series with the chosen estimator.
+    Returns dict with scalar 'beta'/'alpha' (latest), 'beta_series', 'spread'
+    and 'warmup'. The Kalman spread is the one-step forecast error, i.e. it
+    only uses coefficients estimated before each bar, except for the first
+    'warmup' bars, which are residuals of the OLS fit that seeds the filter
+    (warmup is 0 for the other methods).
+    """
+    if method not in HEDGE_METHODS:
+        raise ValueError(f"unknown hedge method: {method}")
+    yv, xv = y.to_numpy(np.float64), x.to_numpy(np.float64)
+    if method == 'static':
+        b, a = ols_beta(yv, xv)
+        beta = np.full(len(yv), b)
+        alpha = np.full(len(yv), a)
+        raw = yv - b * xv - a
+        warmup = 0
+    elif method == 'rolling':
+        beta, alpha = rolling_ols(yv, xv, window)
+        raw = yv - beta * xv - alpha
+        warmup = 0
+    else:
+        k = kalman_hedge(yv, xv, delta=delta)
+        beta, alpha, raw, warmup = k['beta'], k['alpha'], k['error'], k['warmup']
+    spread = pd.Series(raw, index=y.index)
+    return {
+        'beta': float(beta[-1]),
+        'alpha': float(alpha[-1]),
+        'beta_series': pd.Series(beta, index=y.index),
+        'spread': spread,
+        'warmup': warmup,
+    }
@@ -0,0 +1,251 @@
+# analytics/metrics.py
+"""
+In-process counters, gauges and histograms in the Prometheus text format.
+
+Used by the collector (collector/collector.py, served on its own small HTTP
+listener), by analytics (every @timed function, tick reads) and by the API
+(per-route latency middleware, GET /api/metrics). There are no
+dependencies. An update is one dict lookup, a lock and an add, or a bisect
+for histograms, so the metrics can stay on in production. Counters that
+already exist elsewhere, such as the tick writer's stats, are exported with
+callbacks at scrape time instead of being counted twice.
+
+Each process has its own registry. Collector shards listen on
+COLLECTOR_METRICS_PORT + shard. Multi-worker API servers report per worker.
+"""
+import asyncio
+import math
+import os
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+
+METRICS_ENABLED = os.getenv("METRICS", "1") == "1"
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# seconds, 0.5 ms .. 60 s
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+
+def _fmt(v):
+    if v == math.inf:
+        return "+Inf"
+    if isinstance(v, float) and v.is_integer() and abs(v) < 1e15:
+        return str(int(v))
+    return repr(float(v)) if isinstance(v, float) else str(v)
+
+
+def _labels(names, values, extra=()):
+    pairs = list(zip(names, values)) + list(extra)
+    if not pairs:
+        return ""
+    esc = (str(v).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"') for _, v in pairs)
+    return "{" + ",".join(f'{k}="{v}"' for (k, _), v in zip(pairs, esc)) + "}"
+
+
+class _Metric:
+    kind = "untyped"
+
+    def __init__(self, name, help, labelnames=(), registry=None):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._children = {}
+        self._lock = threading.Lock()
+        (registry if registry is not None else REGISTRY).register(self)
+
+    def labels(self, *values, **kw):
+        key = tuple(str(v) for v in values) if values else tuple(str(kw[n]) for n in self.labelnames)
+        child = self._children.get(key)
+        if child is None:
+            with self._lock:
+                child = self._children.setdefault(key, self._child())
+        return child
+
+    def collect(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+        for key, child in list(self._children.items()):
+            lines.extend(child.lines(self.name, self.labelnames, key))
+        return lines
+
+
+class _Value:
+    __slots__ = ('value', '_lock')
+
+    def __init__(self):
+        self.value = 0.0
+        self._lock = threading.Lock()
+
+    def inc(self, n=1.0):
+        with self._lock:
+            self.value += n
+
+    def set(self, v):
+        self.value = v
+
+    def lines(self, name, names, key):
+        return [f"{name}{_labels(names, key)} {_fmt(self.value)}"]
+
+
+class Counter(_Metric):
+    kind = "counter"
+    _child = _Value
+
+    def inc(self, n=1.0):
+        self.labels().inc(n)
+
+
+class Gauge(_Metric):
+    kind = "gauge"
+    _child = _Value
+
+    def set(self, v):
+        self.labels().set(v)
+
+    def inc(self, n=1.0):
+        self.labels().inc(n)
+
+
+class _HistogramValue:
+    __slots__ = ('bounds', 'counts', 'sum', 'count', '_lock')
+
+    def __init__(self, bounds):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)
+        self.sum = 0.0
+        self.count = 0
+        self._lock = threading.Lock()
+
+    def observe(self, v):
+        i = bisect_left(self.bounds, v)
+        with self._lock:
+            self.counts[i] += 1
+            self.sum += v
+            self.count += 1
+
+    @contextmanager
+    def time(self):
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - t0)
+
+    def lines(self, name, names, key):
+        out = []
+        total = 0
+        for bound, c in zip(self.bounds + (math.inf,), self.counts):
+            total += c
+            out.append(f"{name}_bucket{_labels(names, key, [('le', _fmt(float(bound)))])} {total}")
+        out.append(f"{name}_sum{_labels(names, key)} {_fmt(self.sum)}")
+        out.append(f"{name}_count{_labels(names, key)} {self.count}")
+        return out
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name, help, labelnames=(), buckets=DEFAULT_BUCKETS, registry=None):
+        self.bounds = tuple(sorted(float(b) for b in buckets))
+        super().__init__(name, help, labelnames, registry)
+
+    def _child(self):
+        return _HistogramValue(self.bounds)
+
+    def observe(self, v):
+        self.labels().observe(v)
+
+    def time(self):
+        return self.labels().time()
+
+
+class Callback:
+    """Samples produced at scrape time: fn() -> iterable of (label values tuple, value)."""
+
+    def __init__(self, name, help, kind, fn, labelnames=(), registry=None):
+        self.name = name
+        self.help = help
+        self.kind = kind
+        self.fn = fn
+        self.labelnames = tuple(labelnames)
+        (registry if registry is not None else REGISTRY).register(self)
+
+    def collect(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+        for key, value in self.fn():
+            lines.append(f"{self.name}{_labels(self.labelnames, key)} {_fmt(value)}")
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+    def register(self, metric):
+        with self._lock:
+            # re-registering a name (module reload, a second writer) replaces the old metric
+            self._metrics[metric.name] = metric
+
+    def get(self, name):
+        return self._metrics.get(name)
+
+    def render(self):
+        lines = []
+        for metric in list(self._metrics.values()):
+            try:
+                lines.extend(metric.collect())
+            except Exception:
+                # a failing callback must not take the whole scrape down
+                continue
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+
+def get_or_create(cls, name, help, labelnames=(), **kw):
+    """The registered metric called `name`, created on first use (safe across re-imports)."""
+    metric = REGISTRY.get(name)
+    if metric is None or not isinstance(metric, cls):
+        metric = cls(name, help, labelnames, **kw)
+    return metric
+
+
+# shared by every @timed function (analytics/db.py)
+CALL_SECONDS = get_or_create(Histogram, "gemscap_call_duration_seconds",
+                             "Wall time of instrumented analytics calls", ("fn",))
+CALL_ROWS = get_or_create(Counter, "gemscap_call_rows_total", "Rows returned by instrumented analytics calls", ("fn",))
+
+
+def observe_call(name, seconds, rows=None):
+    if not METRICS_ENABLED:
+        return
+    CALL_SECONDS.labels(name).observe(seconds)
+    if rows is not None:
+        CALL_ROWS.labels(name).inc(rows)
+
+
+async def serve(port, host="0.0.0.0", registry=None):
+    """Minimal asyncio HTTP listener answering every GET with the registry (for the collector)."""
+    registry = registry or REGISTRY
+
+    async def handle(reader, writer):
+        try:
+            request = await reader.readline()
+            while (await reader.readline()) not in (b"\r\n", b"\n", b""):
+                pass
+            if request.split(b" ")[1:2] in ([b"/metrics"], [b"/"]):
+                body, status = registry.render().encode(), b"200 OK"
+            else:
+                body, status = b"not found\n", b"404 Not Found"
+            writer.write(b"HTTP/1.1 " + status + b"\r\nContent-Type: " + CONTENT_TYPE.encode() +
+                         b"\r\nContent-Length: " + str(len(body)).encode() + b"\r\nConnection: close\r\n\r\n" + body)
+            await writer.drain()
+        except (ConnectionError, IndexError):
+            pass
+        finally:
+            writer.close()
+
+    return await asyncio.start_server(handle, host, port)
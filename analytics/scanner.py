@@ -0,0 +1,139 @@
+# analytics/scanner.py
+"""
+Screen every pair of a symbol universe in one pass.
+
+Bars for the whole universe are loaded in one batch (analytics/bars.py
+load_bar_cube; from ticks, all symbols are binned in a single pass) into a
+(T, N) close matrix; the correlation matrix comes from one np.corrcoef call. The
+per-pair work (OLS beta, Engle-Granger p-value, half-life) is split into
+chunks and run on the long-lived process pool of analytics/workers.py. The
+matrix is placed in shared memory once per scan, so each task carries only
+its pair indices.
+
+    scan_pairs(['btcusdt', 'ethusdt', 'solusdt'], timeframe='1m')
+"""
+import os
+import time
+from concurrent.futures.process import BrokenProcessPool
+from itertools import combinations, repeat
+
+import numpy as np
+import pandas as pd
+
+from analytics.coint import engle_granger
+from analytics.bars import BAR_COLUMNS, load_bar_cube
+from analytics.db import timed
+from analytics.hedge import ols_beta
+from analytics.workers import SharedArrays, attach, discard_pool, get_pool
+
+SCANNER_WORKERS = int(os.getenv("SCANNER_WORKERS", str(os.cpu_count() or 1)))
+# below this many pairs shipping chunks to the pool costs more than it saves
+SCANNER_MIN_PARALLEL = int(os.getenv("SCANNER_MIN_PARALLEL", "64"))
+RANK_KEYS = ('pvalue', 'half_life', 'corr')
+
+
+def load_matrix(symbols, timeframe='1m', since_minutes=24 * 60, source=None):
+    """Close prices of all symbols on their common bar timestamps: (index, symbols, (T, N) array)."""
+    ts, used, cube = load_bar_cube(symbols, timeframe, since_minutes, source)
+    index = pd.DatetimeIndex(ts.astype('datetime64[ms]').astype('datetime64[ns]'), name='ts')
+    return index, used, np.ascontiguousarray(cube[:, :, BAR_COLUMNS.index('close')])
+
+
+def _pair_stats(y, x):
+    try:
+        eg = engle_granger(y, x)
+        out = {'beta': eg['beta'], 'alpha': eg['alpha'], 't_stat': eg['t_stat'], 'pvalue': eg['pvalue']}
+    except ValueError as e:
+        beta, alpha = ols_beta(y, x)
+        out = {'beta': beta, 'alpha': alpha, 't_stat': None, 'pvalue': None, 'error': str(e)}
+    spread = y - out['beta'] * x - out['alpha']
+    b, _ = ols_beta(np.diff(spread), spread[:-1])
+    out['half_life'] = float(abs(np.log(2) / b)) if b != 0 else None
+    out['last_z'] = float((spread[-1] - spread.mean()) / (spread.std() + 1e-12))
+    return out
+
+
+def _scan_chunk(pairs, matrix):
+    return [(i, j, _pair_stats(matrix[:, i], matrix[:, j])) for i, j in pairs]
+
+
+def _scan_shared(spec, pairs):
+    return _scan_chunk(pairs, attach(spec)['matrix'])
+
+
+def scan_matrix(matrix, symbols, min_corr=0.0, workers=SCANNER_WORKERS):
+    """
+    Statistics for every (y, x) = (symbols[i], symbols[j]), i < j, of an aligned
+    close matrix. Pairs with |corr| below `min_corr` are skipped before the
+    regression and cointegration tests. Returns (rows, timings_ms).
+    """
+    timings = {}
+    t0 = time.perf_counter()
+    corr = np.corrcoef(matrix, rowvar=False) if matrix.shape[1] > 1 else np.ones((1, 1))
+    pairs = [(i, j) for i, j in combinations(range(len(symbols)), 2) if abs(corr[i, j]) >= min_corr]
+    timings['corr_ms'] = (time.perf_counter() - t0) * 1000.0
+
+    t0 = time.perf_counter()
+    workers = max(1, min(workers, len(pairs)))
+    if workers == 1 or len(pairs) < SCANNER_MIN_PARALLEL:
+        results = _scan_chunk(pairs, matrix)
+        workers = 1
+    else:
+        # a few chunks per worker so a slow chunk does not hold up the tail
+        size = -(-len(pairs) // (workers * 4))
+        chunks = [pairs[k:k + size] for k in range(0, len(pairs), size)]
+        try:
+            with SharedArrays(matrix=matrix) as shared:
+                results = [r for part in get_pool(workers).map(_scan_shared, repeat(shared.spec), chunks)
+                           for r in part]
+        except BrokenProcessPool:
+            # a worker died (OOM, killed); start a new pool next time and finish this scan here
+            discard_pool(workers)
+            results = _scan_chunk(pairs, matrix)
+    timings['pairs_ms'] = (time.perf_counter() - t0) * 1000.0
+    timings['workers'] = workers
+
+    rows = []
+    for i, j, stats in results:
+        stats.update(y=symbols[i], x=symbols[j], corr=float(corr[i, j]))
+        rows.append(stats)
+    return rows, timings
+
+
+def rank_pairs(rows, rank_by='pvalue'):
+    """Best first: lowest p-value or half-life, or highest |corr|. Missing values sort last."""
+    if rank_by not in RANK_KEYS:
+        raise ValueError(f"rank_by must be one of {', '.join(RANK_KEYS)}")
+    if rank_by == 'corr':
+        return sorted(rows, key=lambda r: -abs(r['corr']))
+    return sorted(rows, key=lambda r: (r[rank_by] is None, r[rank_by] if r[rank_by] is not None else 0.0))
+
+
+@timed
+def scan_pairs(symbols, timeframe='1m', since_minutes=24 * 60, source=None, min_corr=0.0, rank_by='pvalue',
+               top=None, workers=SCANNER_WORKERS):
+    """
+    Rank all pairs of `symbols`. Returns dict with 'pairs' (ranked, cut to `top`),
+    'symbols' actually used, 'bars' per series and per-stage 'timings' in ms.
+    """
+    t_start = time.perf_counter()
+    t0 = time.perf_counter()
+    symbols = list(dict.fromkeys(s.lower() for s in symbols))
+    index, used, matrix = load_matrix(symbols, timeframe, since_minutes, source)
+    timings = {'load_ms': (time.perf_counter() - t0) * 1000.0}
+    if len(used) < 2 or len(index) < 20:
+        return {'error': 'not enough overlapping data', 'symbols': used, 'bars': int(len(index))}
+    rows, t = scan_matrix(matrix, used, min_corr=min_corr, workers=workers)
+    timings.update(t)
+    t0 = time.perf_counter()
+    ranked = rank_pairs(rows, rank_by)
+    timings['rank_ms'] = (time.perf_counter() - t0) * 1000.0
+    timings['total_ms'] = (time.perf_counter() - t_start) * 1000.0
+    return {
+        'symbols': used,
+        'missing': [s for s in symbols if s not in used],
+        'bars': int(len(index)),
+        'pairs_scanned': len(rows),
+        'pairs': ranked[:top] if top else ranked,
+        'timings': {k: round(v, 3) if isinstance(v, float) else v for k, v in timings.items()},
+    }
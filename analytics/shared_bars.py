@@ -0,0 +1,220 @@
+# analytics/shared_bars.py
+"""
+Recent bars in memory-mapped ring files, one per (symbol, timeframe).
+
+The collector's bar aggregator is the only writer; any number of processes
+(API workers, the dashboard, analytics jobs) map the same file read-only,
+so memory stays flat however many readers there are and no read touches
+Mongo.
+
+File layout, all little-endian 8-byte fields:
+
+    header   int64[8]   magic, version, capacity, bar_ms, count, seq, last_ts, writer pid
+    columns  ts int64, open, high, low, close, volume float64, trades int64,
+             each 2 * capacity long
+
+Every bar is written at slot i and slot i + capacity (a mirrored ring), so
+the latest n <= capacity bars are always one contiguous slice and can be
+handed out as NumPy views without copying. `count` is the number of bars
+ever appended; the newest one is rewritten in place while it is still
+open. The writer bumps `seq` to odd before and back to even after every
+change, and snapshot() retries until it copies between two equal, even
+values.
+"""
+import mmap
+import os
+import tempfile
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+
+_default_root = "/dev/shm" if os.path.isdir("/dev/shm") else tempfile.gettempdir()
+SHARED_BARS_DIR = os.getenv("SHARED_BARS_DIR", os.path.join(_default_root, "gemscap_bars"))
+# longest lookback served from the rings (the 24h pair endpoints). A 1m ring needs one
+# bar per minute of it plus the open bar; the rest of the margin covers a lagging writer.
+SHARED_BARS_WINDOW_MINUTES = 24 * 60
+SHARED_BARS_CAPACITY = int(os.getenv("SHARED_BARS_CAPACITY", str(SHARED_BARS_WINDOW_MINUTES + 60)))
+
+MAGIC = int.from_bytes(b"GCBARS\0\0", "little")
+VERSION = 1
+HEADER = 8
+H_CAPACITY, H_BAR_MS, H_COUNT, H_SEQ, H_LAST_TS, H_PID = 2, 3, 4, 5, 6, 7
+COLUMNS = (("ts", np.int64), ("open", np.float64), ("high", np.float64), ("low", np.float64),
+           ("close", np.float64), ("volume", np.float64), ("trades", np.int64))
+
+
+def ring_path(symbol, bar_seconds, root=SHARED_BARS_DIR):
+    return os.path.join(root, f"{int(bar_seconds)}s", f"{symbol.lower()}.ring")
+
+
+def _file_size(capacity):
+    return 8 * (HEADER + len(COLUMNS) * 2 * capacity)
+
+
+class BarRing:
+    """A mapped ring file. Use BarRing.create() in the writer and BarRing.open() in readers."""
+
+    def __init__(self, path, writable):
+        self.path = path
+        self.writable = writable
+        with open(path, "r+b" if writable else "rb") as f:
+            self.inode = os.fstat(f.fileno()).st_ino
+            self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_WRITE if writable else mmap.ACCESS_READ)
+        self.header = np.frombuffer(self._mm, dtype=np.int64, count=HEADER)
+        if self.header[0] != MAGIC or self.header[1] != VERSION:
+            raise ValueError(f"{path} is not a bar ring file")
+        self.capacity = int(self.header[H_CAPACITY])
+        self.bar_ms = int(self.header[H_BAR_MS])
+        self.cols = {}
+        offset = 8 * HEADER
+        for name, dtype in COLUMNS:
+            self.cols[name] = np.frombuffer(self._mm, dtype=dtype, count=2 * self.capacity, offset=offset)
+            offset += 16 * self.capacity
+
+    @classmethod
+    def create(cls, symbol, bar_seconds, capacity=SHARED_BARS_CAPACITY, root=SHARED_BARS_DIR):
+        """Open the ring for writing, keeping its contents if an identical layout already exists."""
+        path = ring_path(symbol, bar_seconds, root)
+        try:
+            ring = cls(path, writable=True)
+            if ring.capacity == capacity and ring.bar_ms == bar_seconds * 1000:
+                ring.header[H_PID] = os.getpid()
+                return ring
+        except (OSError, ValueError):
+            pass
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp = f"{path}.{os.getpid()}.tmp"
+        with open(tmp, "wb") as f:
+            f.truncate(_file_size(capacity))
+            f.write(np.array([MAGIC, VERSION, capacity, bar_seconds * 1000, 0, 0, -1, os.getpid()],
+                             dtype=np.int64).tobytes())
+        # readers holding the old mapping notice the new inode on their next open()
+        os.replace(tmp, path)
+        return cls(path, writable=True)
+
+    @classmethod
+    def open(cls, symbol, bar_seconds, root=SHARED_BARS_DIR):
+        return cls(ring_path(symbol, bar_seconds, root), writable=False)
+
+    @property
+    def count(self):
+        return int(self.header[H_COUNT])
+
+    def write(self, ts, o, h, l, c, v, n):
+        """Append a bar, or rewrite the newest one if `ts` is its start. Older bars are ignored."""
+        hdr = self.header
+        last = hdr[H_LAST_TS]
+        if ts < last:
+            return False
+        count = int(hdr[H_COUNT])
+        if ts > last:
+            count += 1
+        i = (count - 1) % self.capacity
+        hdr[H_SEQ] += 1
+        for name, value in zip(("ts", "open", "high", "low", "close", "volume", "trades"), (ts, o, h, l, c, v, n)):
+            col = self.cols[name]
+            col[i] = value
+            col[i + self.capacity] = value
+        hdr[H_COUNT] = count
+        hdr[H_LAST_TS] = ts
+        hdr[H_SEQ] += 1
+        return True
+
+    def _bounds(self, n, count):
+        n = min(count, self.capacity) if n is None else min(n, count, self.capacity)
+        end = (count - 1) % self.capacity + self.capacity + 1
+        return end - n, end
+
+    def view(self, n=None):
+        """Zero-copy views of the latest n bars (all held when None), oldest first.
+        The newest row changes while its bar is open; rows are overwritten after
+        capacity - n further bars."""
+        a, b = self._bounds(n, self.count)
+        return {name: col[a:b] for name, col in self.cols.items()}
+
+    def snapshot(self, n=None, since_ms=None, retries=1000):
+        """Consistent copy of the latest n bars (and ts >= since_ms); only those rows are copied."""
+        hdr = self.header
+        ts = self.cols["ts"]
+        for _ in range(retries):
+            seq = int(hdr[H_SEQ])
+            if seq % 2:
+                time.sleep(0)
+                continue
+            a, b = self._bounds(n, int(hdr[H_COUNT]))
+            if since_ms is not None:
+                a += int(np.searchsorted(ts[a:b], since_ms, "left"))
+            out = {name: col[a:b].copy() for name, col in self.cols.items()}
+            if int(hdr[H_SEQ]) == seq:
+                return out
+        raise RuntimeError(f"{self.path}: writer kept the ring busy")
+
+    def frame(self, n=None, since_ms=None, copy=True):
+        """
+        ts-indexed OHLCV DataFrame of the latest n bars (and ts >= since_ms).
+        copy=False builds the frame on the mapped memory itself.
+        """
+        if copy:
+            arrs = self.snapshot(n, since_ms)
+        else:
+            arrs = self.view(n)
+            if since_ms is not None:
+                k = int(np.searchsorted(arrs["ts"], since_ms, "left"))
+                arrs = {name: a[k:] for name, a in arrs.items()}
+        idx = pd.DatetimeIndex(arrs["ts"].astype("datetime64[ms]").astype("datetime64[ns]"), name="ts")
+        return pd.DataFrame({name: arrs[name] for name in ("open", "high", "low", "close", "volume")},
+                            index=idx, copy=False)
+
+    def close(self):
+        self.header = None
+        self.cols = {}
+        try:
+            self._mm.close()
+        except BufferError:
+            # views handed out are still alive; the mapping goes when they do
+            pass
+
+
+_readers = {}
+_readers_lock = threading.Lock()
+
+
+def open_ring(symbol, bar_seconds, root=SHARED_BARS_DIR):
+    """Cached read-only ring for this process, reopened if the writer replaced the file; None if absent."""
+    path = ring_path(symbol, bar_seconds, root)
+    try:
+        inode = os.stat(path).st_ino
+    except OSError:
+        return None
+    key = (path, os.getpid())
+    with _readers_lock:
+        ring = _readers.get(key)
+        if ring is None or ring.inode != inode:
+            try:
+                ring = _readers[key] = BarRing(path, writable=False)
+            except (OSError, ValueError):
+                return None
+    return ring
+
+
+class SharedBarWriter:
+    """Writer side used by the collector: one ring per (timeframe seconds, symbol), created on first bar."""
+
+    def __init__(self, capacity=SHARED_BARS_CAPACITY, root=SHARED_BARS_DIR):
+        self.capacity = capacity
+        self.root = root
+        self._rings = {}
+
+    def write(self, bar_seconds, symbol, bar):
+        key = (bar_seconds, symbol)
+        ring = self._rings.get(key)
+        if ring is None:
+            ring = self._rings[key] = BarRing.create(symbol, bar_seconds, self.capacity, self.root)
+        return ring.write(*bar)
+
+    def close(self):
+        for ring in self._rings.values():
+            ring.close()
+        self._rings = {}
@@ -0,0 +1,113 @@
+# analytics/signals.py
+"""
+Z-score entry/exit state machine without per-row pandas indexing.
+
+Semantics are those of analytics.zscore_signals: flat goes short (-1) when
+z > entry, else long (+1) when z < -entry; a long exits when z >= -exit and a
+short when z <= exit. Entry and exit never happen on the same bar. NaNs
+trigger nothing, so the current position is carried across them.
+
+The NumPy engine precomputes "next bar where condition holds" for every
+event type with a reversed minimum.accumulate and then jumps from trade to
+trade, so the Python loop runs once per trade rather than once per bar. A
+Numba kernel is used instead when numba is installed.
+"""
+import os
+
+import numpy as np
+
+ENGINE = os.getenv("SIGNALS_ENGINE", "auto")  # auto | numba | numpy
+
+try:
+    import numba
+except ImportError:
+    numba = None
+
+
+def _next_true(mask):
+    n = len(mask)
+    nxt = np.where(mask, np.arange(n), n)
+    return np.minimum.accumulate(nxt[::-1])[::-1]
+
+
+def _positions_numpy(z, entry, exit):
+    n = len(z)
+    out = np.zeros(n, dtype=np.int8)
+    with np.errstate(invalid='ignore'):
+        nxt_short = _next_true(z > entry)
+        nxt_long = _next_true(z < -entry)
+        nxt_long_exit = np.append(_next_true(z >= -exit), n)
+        nxt_short_exit = np.append(_next_true(z <= exit), n)
+    i = 0
+    while i < n:
+        s, l = nxt_short[i], nxt_long[i]
+        j = s if s <= l else l
+        if j >= n:
+            break
+        if s <= l:
+            k = nxt_short_exit[j + 1]
+            out[j:k] = -1
+        else:
+            k = nxt_long_exit[j + 1]
+            out[j:k] = 1
+        i = k + 1
+    return out
+
+
+if numba is not None:
+    @numba.njit(cache=True)
+    def _positions_numba(z, entry, exit):
+        n = z.shape[0]
+        out = np.zeros(n, dtype=np.int8)
+        position = 0
+        for i in range(n):
+            v = z[i]
+            if position == 0:
+                if v > entry:
+                    position = -1
+                elif v < -entry:
+                    position = 1
+            elif position == 1:
+                if v >= -exit:
+                    position = 0
+            elif v <= exit:
+                position = 0
+            out[i] = position
+        return out
+else:
+    _positions_numba = None
+
+
+def _kernel(engine):
+    engine = ENGINE if engine is None else engine
+    if engine == 'numba' or (engine == 'auto' and _positions_numba is not None):
+        if _positions_numba is None:
+            raise ImportError("numba is not installed")
+        return _positions_numba
+    return _positions_numpy
+
+
+def signal_positions(z, entry=2.0, exit=0.0, engine=None):
+    """Positions (-1/0/+1, int8) for one 1D z array."""
+    z = np.ascontiguousarray(z, dtype=np.float64)
+    return _kernel(engine)(z, float(entry), float(exit))
+
+
+def signal_positions_batch(z, entry=2.0, exit=0.0, engine=None):
+    """
+    Parameter sweep in one call. `z` is (T,) or (T, K) with one z-series per
+    column; `entry` and `exit` are scalars or equal-length sequences of P
+    threshold pairs. Returns int8 positions shaped (P, T, K), or (P, T) for 1D z.
+    """
+    z = np.asarray(z, dtype=np.float64)
+    squeeze = z.ndim == 1
+    z2 = z[:, None] if squeeze else z
+    entries, exits = np.broadcast_arrays(np.atleast_1d(np.asarray(entry, dtype=np.float64)),
+                                         np.atleast_1d(np.asarray(exit, dtype=np.float64)))
+    kernel = _kernel(engine)
+    cols = [np.ascontiguousarray(z2[:, k]) for k in range(z2.shape[1])]
+    out = np.empty((len(entries), z2.shape[0], z2.shape[1]), dtype=np.int8)
+    for p, (en, ex) in enumerate(zip(entries, exits)):
+        for k, col in enumerate(cols):
+            out[p, :, k] = kernel(col, float(en), float(ex))
+    return out[:, :, 0] if squeeze else out
@@ -0,0 +1,275 @@
+# analytics/streaming.py
+"""
+Incremental versions of analytics/indicators.py.
+
+Each indicator is fed one bar at a time with update() in O(1) and returns
+the value the batch function would produce for that row (NaN while warming
+up). snapshot() gives a plain, JSON-serialisable dict and restore() rebuilds
+the indicator from it, so state can be persisted or handed to another
+process without replaying history.
+"""
+import math
+from collections import deque
+
+NAN = float('nan')
+
+_REGISTRY = {}
+
+
+def _register(cls):
+    _REGISTRY[cls.__name__] = cls
+    return cls
+
+
+def restore(state):
+    """Rebuild any streaming indicator (or IndicatorSet) from its snapshot()."""
+    cls = _REGISTRY[state['type']]
+    obj = cls.__new__(cls)
+    obj._load(state)
+    return obj
+
+
+class _Streaming:
+    _fields = ()
+
+    def snapshot(self):
+        state = {'type': type(self).__name__}
+        for f in self._fields:
+            v = getattr(self, f)
+            if isinstance(v, deque):
+                v = list(v)
+            elif isinstance(v, _Streaming):
+                v = v.snapshot()
+            state[f] = v
+        return state
+
+    def _load(self, state):
+        for f in self._fields:
+            v = state[f]
+            if isinstance(v, dict) and 'type' in v:
+                v = restore(v)
+            elif isinstance(v, list):
+                v = deque(v)
+            setattr(self, f, v)
+
+
+@_register
+class _Window(_Streaming):
+    """
+    Rolling count/mean/variance (ddof=0) over the last `window` values.
+    Sums are kept relative to a shift near the data and re-anchored on the
+    window contents every `window` pushes (amortised O(1)) to limit
+    cancellation and drift.
+    """
+
+    _fields = ('window', 'values', 'shift', 's1', 's2', 'pushes')
+
+    def __init__(self, window):
+        self.window = int(window)
+        self.values = deque()
+        self.shift = None
+        self.s1 = 0.0
+        self.s2 = 0.0
+        self.pushes = 0
+
+    def push(self, x):
+        if self.shift is None:
+            self.shift = x
+        d = x - self.shift
+        self.values.append(x)
+        self.s1 += d
+        self.s2 += d * d
+        if len(self.values) > self.window:
+            old = self.values.popleft() - self.shift
+            self.s1 -= old
+            self.s2 -= old * old
+        self.pushes += 1
+        if self.pushes >= self.window:
+            self._reanchor()
+
+    def _reanchor(self):
+        self.pushes = 0
+        self.shift = self.values[-1]
+        self.s1 = 0.0
+        self.s2 = 0.0
+        for v in self.values:
+            d = v - self.shift
+            self.s1 += d
+            self.s2 += d * d
+
+    @property
+    def full(self):
+        return len(self.values) == self.window
+
+    def mean(self):
+        return self.shift + self.s1 / self.window if self.full else NAN
+
+    def std(self):
+        if not self.full:
+            return NAN
+        m = self.s1 / self.window
+        return math.sqrt(max(self.s2 / self.window - m * m, 0.0))
+
+
+@_register
+class SMA(_Streaming):
+    _fields = ('win',)
+
+    def __init__(self, window):
+        self.win = _Window(window)
+
+    def update(self, x):
+        self.win.push(x)
+        return self.win.mean()
+
+
+@_register
+class EMA(_Streaming):
+    """ewm(span=span, adjust=False).mean(); alpha overrides span when given."""
+
+    _fields = ('alpha', 'value')
+
+    def __init__(self, span=None, alpha=None):
+        self.alpha = alpha if alpha is not None else 2.0 / (span + 1.0)
+        self.value = None
+
+    def update(self, x):
+        if self.value is None:
+            self.value = x
+        else:
+            self.value += self.alpha * (x - self.value)
+        return self.value
+
+
+@_register
+class RSI(_Streaming):
+    _fields = ('prev', 'up', 'down')
+
+    def __init__(self, period=14):
+        self.prev = None
+        self.up = EMA(alpha=1.0 / period)
+        self.down = EMA(alpha=1.0 / period)
+
+    def update(self, x):
+        if self.prev is None:
+            self.prev = x
+            return NAN
+        delta = x - self.prev
+        self.prev = x
+        ma_up = self.up.update(max(delta, 0.0))
+        ma_down = self.down.update(max(-delta, 0.0))
+        rs = ma_up / (ma_down + 1e-12)
+        return 100 - (100 / (1 + rs))
+
+
+@_register
+class MACD(_Streaming):
+    """update() returns (macd_line, signal_line, hist)."""
+
+    _fields = ('fast', 'slow', 'signal')
+
+    def __init__(self, fast=12, slow=26, signal=9):
+        self.fast = EMA(fast)
+        self.slow = EMA(slow)
+        self.signal = EMA(signal)
+
+    def update(self, x):
+        line = self.fast.update(x) - self.slow.update(x)
+        sig = self.signal.update(line)
+        return line, sig, line - sig
+
+
+@_register
+class BollingerBands(_Streaming):
+    """update() returns (ma, upper, lower)."""
+
+    _fields = ('win', 'n_std')
+
+    def __init__(self, window=20, n_std=2):
+        self.win = _Window(window)
+        self.n_std = n_std
+
+    def update(self, x):
+        self.win.push(x)
+        ma = self.win.mean()
+        std = self.win.std()
+        return ma, ma + self.n_std * std, ma - self.n_std * std
+
+
+@_register
+class ATR(_Streaming):
+    _fields = ('prev_close', 'ema')
+
+    def __init__(self, n=14):
+        self.prev_close = None
+        self.ema = EMA(alpha=1.0 / n)
+
+    def update(self, high, low, close):
+        tr = high - low
+        if self.prev_close is not None:
+            tr = max(tr, abs(high - self.prev_close), abs(low - self.prev_close))
+        self.prev_close = close
+        return self.ema.update(tr)
+
+
+@_register
+class VWAP(_Streaming):
+    _fields = ('cum_pv', 'cum_vol')
+
+    def __init__(self):
+        self.cum_pv = 0.0
+        self.cum_vol = 0.0
+
+    def update(self, price, volume):
+        self.cum_pv += price * volume
+        self.cum_vol += volume
+        return self.cum_pv / (self.cum_vol + 1e-12)
+
+
+@_register
+class RollingZScore(_Streaming):
+    _fields = ('win',)
+
+    def __init__(self, window):
+        self.win = _Window(window)
+
+    def update(self, x):
+        self.win.push(x)
+        return (x - self.win.mean()) / (self.win.std() + 1e-12)
+
+
+@_register
+class IndicatorSet(_Streaming):
+    """
+    The full indicator bundle for one symbol, fed whole bars.
+    update() returns a flat dict of the latest values.
+    """
+
+    _fields = ('sma_fast', 'sma_slow', 'ema_fast', 'ema_slow', 'rsi', 'macd', 'bb', 'atr', 'vwap', 'z')
+
+    def __init__(self, sma_windows=(20, 50), ema_spans=(12, 26), rsi_period=14, bb_window=20, atr_n=14,
+                 z_window=60):
+        self.sma_fast, self.sma_slow = SMA(sma_windows[0]), SMA(sma_windows[1])
+        self.ema_fast, self.ema_slow = EMA(ema_spans[0]), EMA(ema_spans[1])
+        self.rsi = RSI(rsi_period)
+        self.macd = MACD()
+        self.bb = BollingerBands(bb_window)
+        self.atr = ATR(atr_n)
+        self.vwap = VWAP()
+        self.z = RollingZScore(z_window)
+
+    def update(self, high, low, close, volume):
+        macd, signal, hist = self.macd.update(close)
+        ma, upper, lower = self.bb.update(close)
+        return {
+            'sma_fast': self.sma_fast.update(close),
+            'sma_slow': self.sma_slow.update(close),
+            'ema_fast': self.ema_fast.update(close),
+            'ema_slow': self.ema_slow.update(close),
+            'rsi': self.rsi.update(close),
+            'macd': macd, 'macd_signal': signal, 'macd_hist': hist,
+            'bb_ma': ma, 'bb_upper': upper, 'bb_lower': lower,
+            'atr': self.atr.update(high, low, close),
+            'vwap': self.vwap.update(close, volume),
+            'zscore': self.z.update(close),
+        }
@@ -0,0 +1,215 @@
+# analytics/ticks.py
+"""
+Columnar tick reads.
+
+Queries are projected to ts/price/qty, sorted on the (symbol, ts) index and
+pulled with find_raw_batches(). Raw BSON batches whose documents all share
+the collector's fixed layout are viewed straight into NumPy arrays; anything
+else falls back to bson.decode_all for that batch only. PyMongoArrow is used
+instead when it is installed.
+
+Ticks below a symbol's archive watermark are read from the Arrow archive
+(analytics/archive.py) and only the rest from Mongo.
+
+fetch_tick_arrays_many() reads several symbols into one set of arrays,
+concatenated symbol by symbol with row offsets, for the batched resampler
+(analytics/bars.py bars_from_arrays_many).
+"""
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+import bson
+from bson.codec_options import CodecOptions, DatetimeConversion
+import numpy as np
+import pandas as pd
+
+from analytics.archive import from_ms, read_archive, to_ms, watermark
+from analytics.db import TICKS_COLL, get_collection
+from analytics.metrics import METRICS_ENABLED, Counter, Histogram, get_or_create
+
+READ_PATH = os.getenv("TICKS_READ_PATH", "auto")  # auto | arrow | raw | cursor
+TICK_FETCH_WORKERS = int(os.getenv("TICK_FETCH_WORKERS", "8"))
+TICK_INDEX = [("symbol", 1), ("ts", 1)]
+PROJECTION = {"_id": 0, "ts": 1, "price": 1, "qty": 1}
+
+FETCH_SECONDS = get_or_create(Histogram, "gemscap_tick_fetch_seconds", "Tick read time by source", ("source",))
+FETCH_ROWS = get_or_create(Counter, "gemscap_tick_fetch_rows_total", "Ticks read by source", ("source",))
+
+_indexed = set()
+_index_lock = threading.Lock()
+
+
+def ensure_tick_indexes(coll=None):
+    """Create the (symbol, ts) index once per process and collection."""
+    coll = coll if coll is not None else get_collection(TICKS_COLL)
+    key = (os.getpid(), coll.full_name)
+    if key in _indexed:
+        return
+    with _index_lock:
+        if key not in _indexed:
+            coll.create_index(TICK_INDEX, name="symbol_ts")
+            _indexed.add(key)
+
+
+def _raw_layout():
+    """Byte template of one projected tick document and the offsets of its values."""
+    sample = bson.encode({"ts": datetime(2000, 1, 1), "price": 1.0, "qty": 1.0})
+    size = len(sample)
+    template = np.frombuffer(sample, dtype=np.uint8)
+    offsets = {}
+    pos = 4
+    for name in ("ts", "price", "qty"):
+        pos += 1 + len(name) + 1  # type byte + cstring key
+        offsets[name] = pos
+        pos += 8
+    fixed = np.ones(size, dtype=bool)
+    for off in offsets.values():
+        fixed[off:off + 8] = False
+    return size, template, fixed, offsets
+
+
+_DOC_SIZE, _TEMPLATE, _FIXED, _OFFSETS = _raw_layout()
+_MS_OPTIONS = CodecOptions(datetime_conversion=DatetimeConversion.DATETIME_MS)
+
+
+def _decode_fixed(buf):
+    """View a raw batch of fixed-layout documents as arrays, or None if the layout differs."""
+    if len(buf) % _DOC_SIZE:
+        return None
+    rows = np.frombuffer(buf, dtype=np.uint8).reshape(-1, _DOC_SIZE)
+    if not (rows[:, _FIXED] == _TEMPLATE[_FIXED]).all():
+        return None
+    out = {}
+    for name, off, dtype in (("ts", _OFFSETS["ts"], "<i8"),
+                             ("price", _OFFSETS["price"], "<f8"),
+                             ("qty", _OFFSETS["qty"], "<f8")):
+        out[name] = np.ascontiguousarray(rows[:, off:off + 8]).view(dtype).ravel()
+    return out
+
+
+def _decode_generic(buf):
+    docs = bson.decode_all(buf, _MS_OPTIONS)
+    return {
+        "ts": np.array([int(d["ts"]) for d in docs], dtype=np.int64),
+        "price": np.array([d["price"] for d in docs], dtype=np.float64),
+        "qty": np.array([d.get("qty", 0.0) for d in docs], dtype=np.float64),
+    }
+
+
+def _empty():
+    return {"ts": np.empty(0, np.int64), "price": np.empty(0, np.float64), "qty": np.empty(0, np.float64)}
+
+
+def _concat(parts):
+    if not parts:
+        return _empty()
+    return {k: np.concatenate([p[k] for p in parts]) for k in ("ts", "price", "qty")}
+
+
+def _query(symbol, since, until=None):
+    ts = {"$gte": since}
+    if until is not None:
+        ts["$lt"] = until
+    return {"symbol": symbol.lower(), "ts": ts}
+
+
+def _read_raw(coll, symbol, since, until=None):
+    cursor = coll.find_raw_batches(_query(symbol, since, until), PROJECTION, sort=TICK_INDEX[1:]).hint(TICK_INDEX)
+    parts = []
+    for buf in cursor:
+        part = _decode_fixed(buf)
+        parts.append(part if part is not None else _decode_generic(buf))
+    return _concat(parts)
+
+
+def _read_arrow(coll, symbol, since, until=None):
+    from pymongoarrow.api import Schema, find_numpy_all
+    schema = Schema({"ts": datetime, "price": float, "qty": float})
+    arrs = find_numpy_all(coll, _query(symbol, since, until), schema=schema, sort=TICK_INDEX[1:])
+    return {"ts": arrs["ts"].astype("datetime64[ms]").astype(np.int64),
+            "price": arrs["price"].astype(np.float64), "qty": arrs["qty"].astype(np.float64)}
+
+
+def _read_cursor(coll, symbol, since, until=None):
+    docs = list(coll.find(_query(symbol, since, until), PROJECTION).sort(TICK_INDEX[1:]))
+    if not docs:
+        return _empty()
+    df = pd.DataFrame(docs)
+    return {"ts": pd.to_datetime(df["ts"]).values.astype("datetime64[ms]").astype(np.int64),
+            "price": df["price"].to_numpy(np.float64), "qty": df["qty"].to_numpy(np.float64)}
+
+
+def _read_hot(symbol, since, until, read_path):
+    coll = get_collection(TICKS_COLL)
+    ensure_tick_indexes(coll)
+    if read_path in ("auto", "arrow"):
+        try:
+            return _read_arrow(coll, symbol, since, until)
+        except ImportError:
+            if read_path == "arrow":
+                raise
+    if read_path == "cursor":
+        return _read_cursor(coll, symbol, since, until)
+    return _read_raw(coll, symbol, since, until)
+
+
+def _observed(source, read, *args):
+    if not METRICS_ENABLED:
+        return read(*args)
+    t0 = time.perf_counter()
+    out = read(*args)
+    FETCH_SECONDS.labels(source).observe(time.perf_counter() - t0)
+    FETCH_ROWS.labels(source).inc(len(out["ts"]))
+    return out
+
+
+def fetch_tick_arrays(symbol, since_minutes=60, since=None, until=None, read_path=READ_PATH, archive=True):
+    """
+    Ticks for one symbol as {'ts': int64 epoch ms, 'price': float64, 'qty': float64},
+    sorted by ts, for since <= ts < until (until open-ended by default).
+    With archive=False only Mongo is read.
+    """
+    since = since or datetime.utcnow() - timedelta(minutes=since_minutes)
+    wm = watermark(symbol) if archive else None
+    if wm is None or to_ms(since) >= wm:
+        return _observed("mongo", _read_hot, symbol, since, until, read_path)
+    cold = _observed("archive", read_archive, symbol, since, until)
+    if until is not None and to_ms(until) <= wm:
+        return cold
+    return _concat([cold, _observed("mongo", _read_hot, symbol, from_ms(wm), until, read_path)])
+
+
+def fetch_tick_arrays_many(symbols, since_minutes=60, since=None, until=None, read_path=READ_PATH,
+                           workers=TICK_FETCH_WORKERS):
+    """
+    Ticks for several symbols as one {'ts', 'price', 'qty'} set of arrays,
+    concatenated in `symbols` order, plus 'offsets' (len(symbols) + 1):
+    symbol i owns rows offsets[i]:offsets[i + 1], sorted by ts.
+
+    Each symbol is its own (symbol, ts) index range scan, run on a thread
+    pool. A single $in query would have to project the symbol as well,
+    which breaks the fixed-layout raw decode.
+    """
+    since = since or datetime.utcnow() - timedelta(minutes=since_minutes)
+    if not symbols:
+        return dict(_empty(), offsets=np.zeros(1, np.int64))
+
+    def one(symbol):
+        return fetch_tick_arrays(symbol, since=since, until=until, read_path=read_path)
+
+    with ThreadPoolExecutor(max_workers=max(1, min(workers, len(symbols)))) as pool:
+        parts = list(pool.map(one, symbols))
+    out = _concat(parts)
+    out["offsets"] = np.concatenate([[0], np.cumsum([len(p["ts"]) for p in parts])]).astype(np.int64)
+    return out
+
+
+def arrays_to_frame(arrs):
+    """DataFrame indexed by ts (datetime64[ns]) with price/qty columns, as fetch_ticks returns."""
+    if len(arrs["ts"]) == 0:
+        return pd.DataFrame()
+    idx = pd.DatetimeIndex(pd.to_datetime(arrs["ts"], unit="ms"), name="ts")
+    return pd.DataFrame({"price": arrs["price"], "qty": arrs["qty"]}, index=idx)
@@ -0,0 +1,116 @@
+# analytics/workers.py
+"""
+Long-lived process pools for the CPU-bound fan-outs (pair scanner, backtest grid).
+
+One pool per worker count is started on first use and kept for the life of
+the process, so a request pays for task dispatch only, not for starting
+workers. Pools use the spawn start method (POOL_START_METHOD=forkserver also
+works): forking a threaded server would copy its locks, sockets and Mongo
+clients into the workers. A process forked from an owner of pools (e.g. a
+pre-forking server) starts its own on first use.
+
+Per-request arrays reach the workers through shared memory. SharedArrays
+copies them into one segment for the duration of a request; tasks carry only
+its small picklable spec, and attach(spec) maps the segment once per worker.
+
+    with SharedArrays(matrix=m) as shared:
+        list(get_pool(4).map(task, repeat(shared.spec), chunks))
+"""
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing.shared_memory import SharedMemory
+
+import numpy as np
+
+POOL_START_METHOD = os.getenv("POOL_START_METHOD", "spawn")  # spawn | forkserver
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+def get_pool(workers):
+    """The process-wide pool with `workers` processes, started on first use."""
+    with _pools_lock:
+        pool = _pools.get(workers)
+        if pool is None:
+            pool = _pools[workers] = ProcessPoolExecutor(
+                max_workers=workers, mp_context=multiprocessing.get_context(POOL_START_METHOD))
+        return pool
+
+
+def discard_pool(workers):
+    """Drop a (broken) pool; the next get_pool starts a fresh one."""
+    with _pools_lock:
+        pool = _pools.pop(workers, None)
+    if pool is not None:
+        pool.shutdown(wait=False, cancel_futures=True)
+
+
+def shutdown_pools():
+    with _pools_lock:
+        pools = list(_pools.values())
+        _pools.clear()
+    for pool in pools:
+        pool.shutdown(wait=True)
+
+
+def _forget_pools():
+    # the child of a fork does not own its parent's workers
+    _pools.clear()
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_forget_pools)
+
+
+class SharedArrays:
+    """
+    Named arrays copied into one shared memory segment, unlinked on exit.
+    `spec` (segment name and layout) is what tasks receive instead of the data.
+    """
+
+    def __init__(self, **arrays):
+        layout, offset = [], 0
+        for name, a in arrays.items():
+            a = np.ascontiguousarray(a)
+            layout.append((name, a.dtype.str, a.shape, offset))
+            offset += -(-a.nbytes // 8) * 8
+        self._shm = SharedMemory(create=True, size=max(offset, 1))
+        for (name, dtype, shape, off), a in zip(layout, arrays.values()):
+            np.ndarray(shape, dtype, buffer=self._shm.buf, offset=off)[...] = a
+        self.spec = (self._shm.name, tuple(layout))
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self._shm.close()
+        self._shm.unlink()
+
+
+_attached = {}
+
+
+def attach(spec):
+    """Read-only views of the arrays of a SharedArrays spec; in a worker, the segment is mapped once."""
+    name, layout = spec
+    hit = _attached.get(name)
+    if hit is None:
+        # keep only the latest segment mapped; a task of an older request maps its own again
+        for old in list(_attached):
+            shm, arrays = _attached.pop(old)
+            del arrays
+            try:
+                shm.close()
+            except BufferError:
+                pass
+        shm = SharedMemory(name=name)
+        arrays = {}
+        for key, dtype, shape, off in layout:
+            a = np.ndarray(shape, dtype, buffer=shm.buf, offset=off)
+            a.flags.writeable = False
+            arrays[key] = a
+        hit = _attached[name] = (shm, arrays)
+    return hit[1]
@@ -0,0 +1,219 @@
+# api/async_views.py
+"""
+Async versions of the main endpoints, for ASGI deployments
+(uvicorn backend_django.asgi:application).
+
+Mongo reads are blocking pymongo calls, so they run on a bounded I/O thread
+pool, with both legs of a pair fetched concurrently. The fitting (OLS,
+ADF, Engle-Granger, correlation) runs on a separate bounded pool, so a
+burst of heavy requests cannot take all the threads the fetches need. The
+event loop itself only parses parameters and serialises responses.
+Parameters and response bodies are the same as the DRF views in api/views.py.
+
+stream_bars and stream_pair are Server-Sent Events streams fed by the
+push hub in api/push.py.
+"""
+import asyncio
+import json
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+from django.http import HttpResponse, JsonResponse, StreamingHttpResponse
+from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import require_GET, require_POST
+
+from analytics.analytics import (correlation_matrix, correlation_top, pair_analytics_from_bars,
+                                 pair_cointegration_from_bars)
+from analytics.bars import BAR_SOURCE, BAR_SOURCES, get_bars, timeframe_seconds
+from analytics.cache import pair_cache
+from analytics.hedge import HEDGE_METHODS
+
+from .push import BarTopic, PairTopic, hub
+from .renderers import corr_params, encode, frame_payload, negotiate, series_params, since_minutes, trim
+
+API_IO_WORKERS = int(os.getenv("API_IO_WORKERS", "32"))
+API_CPU_WORKERS = int(os.getenv("API_CPU_WORKERS", str(os.cpu_count() or 1)))
+PUSH_HEARTBEAT = float(os.getenv("PUSH_HEARTBEAT", "15"))
+
+_io_pool = ThreadPoolExecutor(max_workers=API_IO_WORKERS, thread_name_prefix="api-io")
+_cpu_pool = ThreadPoolExecutor(max_workers=API_CPU_WORKERS, thread_name_prefix="api-cpu")
+
+
+async def _io(fn, *args, **kwargs):
+    return await asyncio.get_running_loop().run_in_executor(_io_pool, lambda: fn(*args, **kwargs))
+
+
+async def _cpu(fn, *args, **kwargs):
+    return await asyncio.get_running_loop().run_in_executor(_cpu_pool, lambda: fn(*args, **kwargs))
+
+
+def _error(msg, status=400):
+    return JsonResponse({"error": msg}, status=status)
+
+
+def _not_acceptable(request):
+    return JsonResponse({"detail": f"format {request.GET.get('format')!r} is not available"}, status=406)
+
+
+def _encoded(data, fmt, status=200):
+    body, content_type = encode(data, fmt)
+    return HttpResponse(body, content_type=content_type, status=status)
+
+
+async def _pair_bars(sy, sx, tf, source):
+    return await asyncio.gather(_io(get_bars, sy, tf, since_minutes=24 * 60, source=source),
+                                _io(get_bars, sx, tf, since_minutes=24 * 60, source=source))
+
+
+@require_GET
+async def pair_analytics(request):
+    sy = request.GET.get('y')
+    sx = request.GET.get('x')
+    tf = request.GET.get('tf', '1m')
+    source = request.GET.get('source', BAR_SOURCE)
+    hedge = request.GET.get('hedge', 'static')
+    if not sy or not sx:
+        return _error("provide y and x symbol params")
+    if hedge not in HEDGE_METHODS:
+        return _error(f"hedge must be one of {', '.join(HEDGE_METHODS)}")
+    fmt = negotiate(request)
+    if fmt is None:
+        return _not_acceptable(request)
+    try:
+        window = int(request.GET.get('window', 60))
+        dfy, dfx = await _pair_bars(sy, sx, tf, source)
+        out = await _cpu(pair_analytics_from_bars, dfy, dfx, window, hedge)
+    except ValueError as e:
+        return _error(str(e))
+    return _encoded(out, fmt)
+
+
+@require_GET
+async def get_ohlc(request):
+    s = request.GET.get('symbol')
+    tf = request.GET.get('tf', '1m')
+    source = request.GET.get('source', BAR_SOURCE)
+    fmt = negotiate(request)
+    if not s:
+        return _error("symbol missing")
+    if fmt is None:
+        return _not_acceptable(request)
+    try:
+        columns, since, limit = series_params(request.GET, fmt)
+        df = await _io(get_bars, s, timeframe=tf, since_minutes=since_minutes(since, 6 * 60), source=source)
+    except ValueError as e:
+        return _error(str(e))
+    return _encoded(frame_payload(trim(df, since, limit), columns), fmt)
+
+
+@require_GET
+async def pair_cointegration(request):
+    x = request.GET.get('x')
+    y = request.GET.get('y')
+    tf = request.GET.get('tf', '1m')
+    source = request.GET.get('source', BAR_SOURCE)
+    hedge = request.GET.get('hedge', 'static')
+    if not x or not y:
+        return _error("provide x and y")
+    if hedge not in HEDGE_METHODS:
+        return _error(f"hedge must be one of {', '.join(HEDGE_METHODS)}")
+    fmt = negotiate(request)
+    if fmt is None:
+        return _not_acceptable(request)
+    try:
+        columns, since, limit = series_params(request.GET, fmt)
+        window = int(request.GET.get('window', 60))
+        df_y, df_x = await _pair_bars(y, x, tf, source)
+    except ValueError as e:
+        return _error(str(e))
+    out = await _cpu(pair_cointegration_from_bars, df_y, df_x, window, hedge, limit=limit, since=since,
+                     columns=columns, cache_key=pair_cache.key(y, x, tf, window, hedge, source))
+    return _encoded(out, fmt, status=400 if 'error' in out else 200)
+
+
+@csrf_exempt
+@require_POST
+async def correlation_heatmap(request):
+    try:
+        body = json.loads(request.body or b'{}')
+    except ValueError:
+        return _error("invalid JSON body")
+    try:
+        symbols, kwargs, top, symbol = corr_params(body)
+        out = {}
+        # the correlation engine fetches its symbols on its own thread pool
+        if body.get('matrix', True):
+            out['corr'] = await _io(correlation_matrix, symbols, **kwargs)
+        if top:
+            out['top'] = await _io(correlation_top, symbols, k=top, symbol=symbol, **kwargs)
+    except ValueError as e:
+        return _error(str(e))
+    return _encoded(out, 'json')
+
+
+async def _events(topic, max_pending):
+    sub = hub.subscribe(topic, max_pending)
+    try:
+        yield "retry: 3000\n\n"
+        while True:
+            item = await sub.get(timeout=PUSH_HEARTBEAT)
+            if item is None:
+                # comment line: keeps proxies from closing an idle connection
+                yield ": ping\n\n"
+                continue
+            event, data = item
+            yield f"event: {event}\ndata: {json.dumps(data, separators=(',', ':'))}\n\n"
+    finally:
+        # runs when Django cancels the stream on client disconnect
+        hub.unsubscribe(sub)
+
+
+def _stream(request, topic):
+    try:
+        max_pending = max(1, int(request.GET.get('max_pending', 8)))
+    except ValueError:
+        return _error("max_pending must be an integer")
+    response = StreamingHttpResponse(_events(topic, max_pending), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'
+    return response
+
+
+def _stream_params(request):
+    tf = request.GET.get('tf', '1m')
+    source = request.GET.get('source', BAR_SOURCE)
+    timeframe_seconds(tf)
+    if source not in BAR_SOURCES:
+        raise ValueError(f"source must be one of {', '.join(BAR_SOURCES)}")
+    return tf, source
+
+
+@require_GET
+async def stream_bars(request):
+    s = request.GET.get('symbol')
+    if not s:
+        return _error("symbol missing")
+    try:
+        tf, source = _stream_params(request)
+    except ValueError as e:
+        return _error(str(e))
+    return _stream(request, BarTopic(s.lower(), tf, source))
+
+
+@require_GET
+async def stream_pair(request):
+    sy = request.GET.get('y')
+    sx = request.GET.get('x')
+    if not sy or not sx:
+        return _error("provide y and x symbol params")
+    try:
+        tf, source = _stream_params(request)
+        window = int(request.GET.get('window', 60))
+    except ValueError as e:
+        return _error(str(e))
+    return _stream(request, PairTopic(sy.lower(), sx.lower(), tf, window, source))
+
+
+@require_GET
+async def stream_stats(request):
+    return JsonResponse(hub.stats())
@@ -0,0 +1,52 @@
+# api/middleware.py
+"""
+Per-route request latency for GET /api/metrics.
+
+Routes are labelled by their URL pattern (resolver_match.route), so the
+label count stays bounded; unresolved paths share one "unmatched" label.
+For streaming responses only the time to the response headers is measured.
+Works in both the WSGI (sync) and ASGI (async) stacks.
+"""
+import time
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+
+from analytics.metrics import METRICS_ENABLED, Histogram, get_or_create
+
+REQUEST_SECONDS = get_or_create(Histogram, "gemscap_http_request_duration_seconds",
+                                "API request latency by route", ("route", "method", "status"))
+
+
+def _observe(request, response, t0):
+    match = getattr(request, 'resolver_match', None)
+    route = match.route if match is not None else 'unmatched'
+    REQUEST_SECONDS.labels(route, request.method, response.status_code).observe(time.perf_counter() - t0)
+
+
+class MetricsMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        if not METRICS_ENABLED:
+            return self.get_response(request)
+        t0 = time.perf_counter()
+        response = self.get_response(request)
+        _observe(request, response, t0)
+        return response
+
+    async def __acall__(self, request):
+        if not METRICS_ENABLED:
+            return await self.get_response(request)
+        t0 = time.perf_counter()
+        response = await self.get_response(request)
+        _observe(request, response, t0)
+        return response
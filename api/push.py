@@ -0,0 +1,292 @@
+# api/push.py
+"""
+Fan-out of live bar and pair updates to streaming clients.
+
+A Topic is one computation, for example the closed 1m bars of btcusdt or
+the Kalman spread/z-score of (ethusdt, btcusdt, 1m, 60). It runs as one
+asyncio task per worker process while at least one client is subscribed,
+however many clients there are, and stops when the last one leaves.
+
+Every subscriber has a bounded mailbox. The topic never waits for a client:
+when a mailbox is full, the new update is merged into the newest pending
+one (bar lists are concatenated and capped, pair updates keep the latest
+value), so a slow consumer gets fewer, larger messages and never stalls
+the others.
+"""
+import asyncio
+import math
+import os
+import time
+from collections import deque
+
+import numpy as np
+
+from analytics.bars import align_closes, get_bars, timeframe_seconds
+from analytics.hedge import KALMAN_WARMUP, KalmanHedge
+from analytics.streaming import RollingZScore
+
+PUSH_POLL_INTERVAL = float(os.getenv("PUSH_POLL_INTERVAL", "1.0"))
+PUSH_MAX_PENDING = int(os.getenv("PUSH_MAX_PENDING", "8"))
+PUSH_HISTORY = int(os.getenv("PUSH_HISTORY", "100"))
+PUSH_LINGER = float(os.getenv("PUSH_LINGER", "5.0"))
+
+
+def _num(v):
+    v = float(v)
+    return v if math.isfinite(v) else None
+
+
+def _bar_dict(ts, row):
+    return {'ts': ts.isoformat(), 'open': float(row['open']), 'high': float(row['high']),
+            'low': float(row['low']), 'close': float(row['close']), 'volume': float(row['volume'])}
+
+
+class Subscriber:
+    def __init__(self, topic, max_pending=PUSH_MAX_PENDING):
+        self.topic = topic
+        self.max_pending = max_pending
+        self.pending = deque()
+        self.coalesced = 0
+        self.delivered = 0
+        self._ready = asyncio.Event()
+
+    def offer(self, event, data):
+        if len(self.pending) >= self.max_pending:
+            # a pending snapshot stays a snapshot with the update folded in
+            prev_event, prev = self.pending[-1]
+            self.pending[-1] = (prev_event, self.topic.merge(prev, data))
+            self.coalesced += 1
+        else:
+            self.pending.append((event, data))
+        self._ready.set()
+
+    async def get(self, timeout=None):
+        """Next (event, data), or None after `timeout` seconds without updates."""
+        if not self.pending:
+            self._ready.clear()
+            try:
+                await asyncio.wait_for(self._ready.wait(), timeout)
+            except asyncio.TimeoutError:
+                return None
+        self.delivered += 1
+        return self.pending.popleft()
+
+
+class Topic:
+    """
+    Base class. Subclasses implement start(), which loads history and
+    returns the snapshot new subscribers get first, and poll(), which
+    returns (new updates, snapshot after them). Both run on a worker
+    thread; subscribers, the snapshot and the mailboxes are only touched on
+    the event loop, so a client never gets an update its snapshot already
+    contains.
+    """
+
+    event = 'update'
+
+    def __init__(self, key):
+        self.key = key
+        self.subscribers = set()
+        self.snapshot = None
+        self.ready = False
+        self.task = None
+        self.polls = 0
+        self.published = 0
+        self.errors = 0
+        self.last_error = None
+
+    def merge(self, prev, new):
+        return dict(new, coalesced=prev.get('coalesced', 0) + 1)
+
+    def add(self, sub):
+        self.subscribers.add(sub)
+        if self.ready and self.snapshot is not None:
+            sub.offer('snapshot', self.snapshot)
+
+    def publish(self, data):
+        self.published += 1
+        for sub in list(self.subscribers):
+            sub.offer(self.event, data)
+
+    def _failed(self, e):
+        self.errors += 1
+        self.last_error = str(e)
+
+    async def run(self, interval):
+        loop = asyncio.get_running_loop()
+        try:
+            self.snapshot = await loop.run_in_executor(None, self.start)
+        except Exception as e:
+            self._failed(e)
+        self.ready = True
+        if self.snapshot is not None:
+            for sub in list(self.subscribers):
+                sub.offer('snapshot', self.snapshot)
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                updates, snapshot = await loop.run_in_executor(None, self.poll)
+            except Exception as e:
+                self._failed(e)
+                continue
+            self.polls += 1
+            first = self.snapshot is None
+            self.snapshot = snapshot
+            if first and snapshot is not None:
+                # history only became available now (e.g. the collector just started)
+                for sub in list(self.subscribers):
+                    sub.offer('snapshot', snapshot)
+                continue
+            for data in updates:
+                self.publish(data)
+
+    def stats(self):
+        return {'subscribers': len(self.subscribers), 'polls': self.polls, 'published': self.published,
+                'errors': self.errors, 'last_error': self.last_error,
+                'coalesced': sum(s.coalesced for s in self.subscribers)}
+
+
+class BarTopic(Topic):
+    """Newly closed bars of one symbol/timeframe."""
+
+    event = 'bars'
+
+    def __init__(self, symbol, timeframe='1m', source=None):
+        super().__init__(('bars', symbol, timeframe, source))
+        self.symbol, self.timeframe, self.source = symbol, timeframe, source
+        self.bar_seconds = timeframe_seconds(timeframe)
+        self.recent = deque(maxlen=PUSH_HISTORY)
+        self.last_ts = None
+
+    def _closed_bars(self, since_minutes):
+        df = get_bars(self.symbol, self.timeframe, since_minutes=since_minutes, source=self.source)
+        return df.iloc[:-1] if len(df) else df
+
+    def start(self):
+        minutes = max(1, math.ceil(PUSH_HISTORY * self.bar_seconds / 60))
+        df = self._closed_bars(minutes)
+        for ts, row in df.iterrows():
+            self.recent.append(_bar_dict(ts, row))
+        self.last_ts = df.index[-1] if len(df) else None
+        return self._snapshot() if self.last_ts is not None else None
+
+    def _snapshot(self):
+        return {'symbol': self.symbol, 'tf': self.timeframe, 'bars': list(self.recent)}
+
+    def poll(self):
+        minutes = max(1, math.ceil(10 * self.bar_seconds / 60))
+        df = self._closed_bars(minutes)
+        if self.last_ts is not None:
+            df = df[df.index > self.last_ts]
+        if df.empty:
+            return [], self._snapshot() if self.last_ts is not None else None
+        bars = [_bar_dict(ts, row) for ts, row in df.iterrows()]
+        self.recent.extend(bars)
+        self.last_ts = df.index[-1]
+        return [{'symbol': self.symbol, 'tf': self.timeframe, 'bars': bars}], self._snapshot()
+
+    def merge(self, prev, new):
+        return dict(new, bars=(prev['bars'] + new['bars'])[-PUSH_HISTORY:],
+                    coalesced=prev.get('coalesced', 0) + 1)
+
+
+class PairTopic(Topic):
+    """
+    Per-bar Kalman hedge ratio, spread (one-step forecast error) and its
+    rolling z-score for (y, x), advanced in O(1) per closed bar.
+    """
+
+    event = 'pair'
+
+    def __init__(self, y, x, timeframe='1m', window=60, source=None, history_bars=None):
+        super().__init__(('pair', y, x, timeframe, window, source))
+        self.y, self.x, self.timeframe, self.window, self.source = y, x, timeframe, window, source
+        self.bar_seconds = timeframe_seconds(timeframe)
+        # enough bars to settle the filter and fill the z-score window
+        history_bars = history_bars or max(10 * window, 500)
+        self.history_minutes = max(1, math.ceil(history_bars * self.bar_seconds / 60))
+        self.kf = None
+        self.z = RollingZScore(window)
+        self.last_ts = None
+        self.latest = None
+
+    def _aligned(self, since_minutes):
+        dfy = get_bars(self.y, self.timeframe, since_minutes=since_minutes, source=self.source)
+        dfx = get_bars(self.x, self.timeframe, since_minutes=since_minutes, source=self.source)
+        common, closes = align_closes([dfy, dfx])
+        if len(common) < 2:
+            return common[:0], np.empty(0), np.empty(0)
+        # the newest common bar may still be open on either side
+        return common[:-1], closes[:-1, 0], closes[:-1, 1]
+
+    def _update(self, ts, yv, xv):
+        beta, alpha, e, std = self.kf.update(yv, xv)
+        return {'y': self.y, 'x': self.x, 'tf': self.timeframe, 'ts': ts.isoformat(), 'beta': _num(beta),
+                'alpha': _num(alpha), 'spread': _num(e), 'z': _num(self.z.update(e))}
+
+    def start(self):
+        idx, yv, xv = self._aligned(self.history_minutes)
+        if len(idx) < 10:
+            return None
+        warm = min(KALMAN_WARMUP, len(idx))
+        self.kf = KalmanHedge.from_history(yv[:warm], xv[:warm])
+        for i in range(warm, len(idx)):
+            self.latest = self._update(idx[i], yv[i], xv[i])
+        self.last_ts = idx[-1]
+        return self.latest
+
+    def poll(self):
+        if self.kf is None:
+            return [], self.start()
+        idx, yv, xv = self._aligned(max(1, math.ceil(10 * self.bar_seconds / 60)))
+        out = [self._update(idx[i], yv[i], xv[i]) for i in np.flatnonzero(idx > self.last_ts)]
+        if out:
+            self.last_ts = idx[-1]
+            self.latest = out[-1]
+        return out, self.latest
+
+    def merge(self, prev, new):
+        # the state is cumulative, so the latest update supersedes the rest
+        return dict(new, coalesced=prev.get('coalesced', 0) + 1)
+
+
+class Hub:
+    """Topics by key; each runs while it has subscribers (plus PUSH_LINGER seconds)."""
+
+    def __init__(self, interval=PUSH_POLL_INTERVAL):
+        self.interval = interval
+        self.topics = {}
+        self.started = time.time()
+
+    def subscribe(self, topic, max_pending=PUSH_MAX_PENDING):
+        existing = self.topics.get(topic.key)
+        if existing is None:
+            existing = self.topics[topic.key] = topic
+        topic = existing
+        if topic.task is None or topic.task.done():
+            interval = min(self.interval, topic.bar_seconds)
+            topic.task = asyncio.get_running_loop().create_task(topic.run(interval))
+        sub = Subscriber(topic, max_pending)
+        topic.add(sub)
+        return sub
+
+    def unsubscribe(self, sub):
+        topic = sub.topic
+        topic.subscribers.discard(sub)
+        if not topic.subscribers:
+            asyncio.get_running_loop().call_later(PUSH_LINGER, self._reap, topic.key)
+
+    def _reap(self, key):
+        topic = self.topics.get(key)
+        if topic is not None and not topic.subscribers:
+            if topic.task is not None:
+                topic.task.cancel()
+            del self.topics[key]
+
+    def stats(self):
+        return {'topics': {'/'.join(str(k) for k in key if k is not None): t.stats()
+                           for key, t in self.topics.items()},
+                'subscribers': sum(len(t.subscribers) for t in self.topics.values())}
+
+
+hub = Hub()
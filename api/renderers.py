@@ -0,0 +1,248 @@
+# api/renderers.py
+"""
+Response encodings for the API, picked by ?format= or the Accept header.
+
+    json     application/json (default). Uses orjson when it is installed:
+             numpy arrays are written natively and NaN becomes null.
+             Otherwise falls back to DRF's encoder.
+    msgpack  application/x-msgpack, via msgspec
+    arrow    application/vnd.apache.arrow.stream (Arrow IPC stream), via pyarrow
+
+Bar and series endpoints also take layout=records|columns. records is the
+original row-wise shape. columns sends one array per field, with ts as
+epoch milliseconds. Binary formats are always columnar. An Arrow response
+is one record batch of the columns; the remaining scalar fields go, as
+JSON, into the schema metadata under b'meta'.
+
+msgspec and pyarrow are in requirements.txt, but a deployment without one
+of them still serves JSON: asking for its format explicitly is a 406.
+"""
+import math
+from datetime import date, datetime
+from importlib.util import find_spec
+
+import numpy as np
+import pandas as pd
+from rest_framework.exceptions import NotAcceptable
+from rest_framework.negotiation import DefaultContentNegotiation
+from rest_framework.renderers import BaseRenderer, JSONRenderer
+
+from analytics.bars import BAR_SOURCE, BAR_SOURCES, timeframe_seconds
+from analytics.correlation import CORR_MODES
+
+LAYOUTS = ('records', 'columns')
+SERIES_LIMIT = 500
+SINCE_MAX_MINUTES = 7 * 24 * 60
+ARROW_MEDIA_TYPE = 'application/vnd.apache.arrow.stream'
+MSGPACK_MEDIA_TYPE = 'application/x-msgpack'
+# library each binary format is encoded with
+FORMAT_LIBRARIES = {'msgpack': 'msgspec', 'arrow': 'pyarrow'}
+
+
+def parse_since(value):
+    """?since= as epoch milliseconds or an ISO timestamp (UTC when naive) -> naive UTC Timestamp, or None."""
+    if value in (None, ''):
+        return None
+    try:
+        ts = pd.Timestamp(int(value), unit='ms')
+    except ValueError:
+        ts = pd.Timestamp(value)
+    if ts.tzinfo is not None:
+        ts = ts.tz_convert('UTC').tz_localize(None)
+    return ts
+
+
+def series_params(params, fmt='json'):
+    """(columns, since, limit) from the query of a bar/series endpoint; ValueError on bad values."""
+    layout = params.get('layout', 'records')
+    if layout not in LAYOUTS:
+        raise ValueError(f"layout must be one of {', '.join(LAYOUTS)}")
+    limit = int(params.get('limit', SERIES_LIMIT))
+    if limit <= 0:
+        raise ValueError("limit must be positive")
+    return layout == 'columns' or fmt != 'json', parse_since(params.get('since')), limit
+
+
+def corr_params(body):
+    """
+    (symbols, kwargs for correlation_matrix/correlation_top, top, symbol) from
+    a correlation request body; ValueError on bad values.
+    """
+    symbols = body.get('symbols', [])
+    if not symbols:
+        raise ValueError("symbols required")
+    if not isinstance(symbols, list) or not all(isinstance(s, str) for s in symbols):
+        raise ValueError("symbols must be a list of strings")
+    mode = body.get('mode', 'rolling')
+    if mode not in CORR_MODES:
+        raise ValueError(f"mode must be one of {', '.join(CORR_MODES)}")
+    tf = body.get('tf', '1m')
+    timeframe_seconds(tf)
+    source = body.get('source', BAR_SOURCE)
+    if source not in BAR_SOURCES:
+        raise ValueError(f"source must be one of {', '.join(BAR_SOURCES)}")
+    minutes = int(body.get('since_minutes', 6 * 60))
+    if not 0 < minutes <= SINCE_MAX_MINUTES:
+        raise ValueError(f"since_minutes must be in 1..{SINCE_MAX_MINUTES}")
+    halflife = float(body.get('halflife', 60))
+    if not halflife > 0:
+        raise ValueError("halflife must be positive")
+    top = int(body['top']) if body.get('top') else None
+    if top is not None and top <= 0:
+        raise ValueError("top must be positive")
+    symbol = body.get('symbol')
+    if top and symbol and symbol.lower() not in [s.lower() for s in symbols]:
+        raise ValueError("symbol must be one of symbols")
+    kwargs = dict(timeframe=tf, since_minutes=minutes, source=source, mode=mode, halflife=halflife)
+    return symbols, kwargs, top, symbol
+
+
+def since_minutes(since, default):
+    """Fetch window (minutes) that reaches back to `since`, at least `default`, at most SINCE_MAX_MINUTES."""
+    if since is None:
+        return default
+    age = (pd.Timestamp.utcnow().tz_localize(None) - since).total_seconds() / 60
+    return int(min(max(default, math.ceil(age) + 1), SINCE_MAX_MINUTES))
+
+
+def trim(df, since=None, limit=None):
+    """Rows with ts strictly after `since`, then the last `limit` of them."""
+    if since is not None:
+        df = df[df.index > since]
+    return df.tail(limit) if limit is not None else df
+
+
+def frame_columns(df):
+    """ts-indexed frame -> {'ts': epoch ms int64, column: float64 array, ...}"""
+    out = {'ts': df.index.asi8 // 1_000_000 if len(df) else np.empty(0, np.int64)}
+    for c in df.columns:
+        out[str(c)] = df[c].to_numpy(np.float64)
+    return out
+
+
+def frame_payload(df, columns=False):
+    if columns:
+        return frame_columns(df)
+    return df.reset_index().to_dict(orient='records')
+
+
+def _plain(obj):
+    if isinstance(obj, np.ndarray):
+        return obj.tolist()
+    if isinstance(obj, np.generic):
+        return obj.item()
+    if isinstance(obj, (datetime, date)):
+        return obj.isoformat()
+    if isinstance(obj, pd.Series):
+        return obj.tolist()
+    raise TypeError(f"{type(obj).__name__} is not serializable")
+
+
+def dumps_json(data):
+    try:
+        import orjson
+    except ImportError:
+        return JSONRenderer().render(data)
+    return orjson.dumps(data, default=_plain, option=orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS)
+
+
+def dumps_msgpack(data):
+    import msgspec
+    return msgspec.msgpack.encode(data, enc_hook=_plain)
+
+
+def _split(data):
+    """(columns, scalars): the payload itself when it is all arrays, else its 'series' entry."""
+    if isinstance(data, dict) and data and all(isinstance(v, np.ndarray) for v in data.values()):
+        return data, {}
+    if isinstance(data, dict) and isinstance(data.get('series'), dict):
+        return data['series'], {k: v for k, v in data.items() if k != 'series'}
+    return {}, data
+
+
+def dumps_arrow(data):
+    import pyarrow as pa
+    columns, meta = _split(data)
+    arrays = {}
+    for k, v in columns.items():
+        v = np.asarray(v)
+        arrays[k] = pa.array(v, type=pa.timestamp('ms')) if k == 'ts' else pa.array(v, from_pandas=True)
+    table = pa.table(arrays)
+    if meta:
+        table = table.replace_schema_metadata({b'meta': dumps_json(meta)})
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table)
+    return sink.getvalue().to_pybytes()
+
+
+FORMATS = {
+    'json': ('application/json', dumps_json),
+    'msgpack': (MSGPACK_MEDIA_TYPE, dumps_msgpack),
+    'arrow': (ARROW_MEDIA_TYPE, dumps_arrow),
+}
+
+
+def format_available(fmt):
+    lib = FORMAT_LIBRARIES.get(fmt)
+    return lib is None or find_spec(lib) is not None
+
+
+def negotiate(request):
+    """
+    Format name for a plain Django request: ?format=, then the first known
+    Accept type whose library is installed, then json. None when ?format=
+    names a format that is unknown or cannot be produced here (answer 406).
+    """
+    fmt = request.GET.get('format')
+    if fmt:
+        return fmt if fmt in FORMATS and format_available(fmt) else None
+    for part in request.headers.get('Accept', '').split(','):
+        media = part.split(';')[0].strip()
+        for name, (media_type, _) in FORMATS.items():
+            if media == media_type and format_available(name):
+                return name
+    return 'json'
+
+
+def encode(data, fmt='json'):
+    """(body bytes, content type) of `data` in one of FORMATS."""
+    media_type, dumps = FORMATS[fmt]
+    return dumps(data), media_type
+
+
+class SeriesNegotiation(DefaultContentNegotiation):
+    """DRF negotiation that answers a ?format= none of the renderers can produce with 406 instead of 404."""
+
+    def filter_renderers(self, renderers, format):
+        renderers = [r for r in renderers if r.format == format]
+        if not renderers:
+            raise NotAcceptable(f"format {format!r} is not available")
+        return renderers
+
+
+class FastJSONRenderer(JSONRenderer):
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        return dumps_json(data)
+
+
+class MsgpackRenderer(BaseRenderer):
+    media_type = MSGPACK_MEDIA_TYPE
+    format = 'msgpack'
+    charset = None
+    render_style = 'binary'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        return dumps_msgpack(data)
+
+
+class ArrowRenderer(BaseRenderer):
+    media_type = ARROW_MEDIA_TYPE
+    format = 'arrow'
+    charset = None
+    render_style = 'binary'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        return dumps_arrow(data)
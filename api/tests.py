@@ -1,3 +1,1311 @@
-from django.test import TestCase
+import json
+import os
+import pickle
+import shutil
+import tempfile
+import unittest
+from importlib.util import find_spec
+from unittest import mock, skipUnless
 
-# Create your tests here.
+import numpy as np
+from django.test import SimpleTestCase
+
+from analytics import archive
+
+HAS_PYARROW = find_spec('pyarrow') is not None
+
+
+@skipUnless(HAS_PYARROW, "pyarrow is not installed")
+class ArchiveWriteTests(SimpleTestCase):
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.root, ignore_errors=True)
+        self.day = 1_735_689_600_000  # 2025-01-01
+        self.ticks = {'ts': self.day + np.arange(5, dtype=np.int64) * 1000, 'price': np.arange(5.0) + 100,
+                      'qty': np.ones(5)}
+
+    def read_day(self):
+        return archive._read_file(archive.day_path('btcusdt', archive._day(self.day), self.root),
+                                  self.day, self.day + archive.DAY_MS)
+
+    def test_rerun_without_watermark_does_not_duplicate(self):
+        for _ in range(2):
+            archive.write_day('btcusdt', self.day, self.ticks, keep_below_ms=None, root=self.root)
+        out = self.read_day()
+        np.testing.assert_array_equal(out['ts'], self.ticks['ts'])
+
+    def test_rerun_keeps_rows_below_watermark_only(self):
+        archive.write_day('btcusdt', self.day, self.ticks, root=self.root)
+        wm = int(self.ticks['ts'][3])
+        tail = {k: v[3:] for k, v in self.ticks.items()}
+        for _ in range(2):
+            archive.write_day('btcusdt', self.day, tail, keep_below_ms=wm, root=self.root)
+        out = self.read_day()
+        np.testing.assert_array_equal(out['ts'], self.ticks['ts'])
+        np.testing.assert_array_equal(out['price'], self.ticks['price'])
+
+
+def _mongo_test_collection():
+    """A scratch collection on MONGO_URI, or None when no mongod answers."""
+    try:
+        import pymongo
+        from pymongo.errors import PyMongoError
+    except ImportError:
+        return None
+    from analytics.db import MONGO_URI
+    client = pymongo.MongoClient(MONGO_URI, serverSelectionTimeoutMS=500)
+    try:
+        client.admin.command('ping')
+    except PyMongoError:
+        client.close()
+        return None
+    return client[os.getenv("MONGO_TEST_DB", "gemscap_test")]['ticks']
+
+
+class OhlcPipelineParityTests(SimpleTestCase):
+    """Server-side bars ($dateTrunc and the epoch fallback) against resample_ohlc on the same ticks."""
+    TIMEFRAMES = ['1s', '5s', '1m', '5m', '15m', '1h']
+    SYMBOL = 'paritytestusdt'
+    N = 40_000
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.coll = _mongo_test_collection()
+        if cls.coll is None:
+            raise unittest.SkipTest("no mongod at MONGO_URI")
+        import pandas as pd
+        rng = np.random.default_rng(7)
+        n = cls.N
+        # irregular gaps ending at 13:07:11.xxx, so every timeframe has a partial trailing bar
+        end_ms = int(pd.Timestamp('2025-01-01 13:07:11.437').value // 1_000_000)
+        ts = end_ms - np.cumsum(rng.integers(1, 500, n))[::-1] + 1
+        price = np.round(100 + np.cumsum(rng.normal(0, 0.01, n)), 4)
+        qty = np.round(rng.uniform(0.001, 2, n), 6)
+        cls.coll.delete_many({'symbol': cls.SYMBOL})
+        stamps = pd.to_datetime(ts, unit='ms').to_pydatetime()
+        cls.coll.insert_many([{'symbol': cls.SYMBOL, 'ts': t, 'price': float(p), 'qty': float(q)}
+                              for t, p, q in zip(stamps, price, qty)])
+        cls.since = pd.Timestamp(int(ts[0]), unit='ms').to_pydatetime()
+        cls.ticks = pd.DataFrame({'price': price, 'qty': qty},
+                                 index=pd.DatetimeIndex(pd.to_datetime(ts, unit='ms'), name='ts'))
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.coll.delete_many({'symbol': cls.SYMBOL})
+        cls.coll.database.client.close()
+        super().tearDownClass()
+
+    def assertBarsEqual(self, expected, got, tf):
+        self.assertEqual(list(expected.index), list(got.index), f"{tf}: bar timestamps differ")
+        for col in ('open', 'high', 'low', 'close'):
+            np.testing.assert_array_equal(expected[col].to_numpy(), got[col].to_numpy(), err_msg=f"{tf}: {col}")
+        np.testing.assert_allclose(expected['volume'].to_numpy(), got['volume'].to_numpy(), rtol=1e-12, atol=1e-9,
+                                   err_msg=f"{tf}: volume")
+
+    def test_pipeline_methods_match_resample(self):
+        from pymongo.errors import OperationFailure
+        from analytics.analytics import resample_ohlc
+        from analytics.bars import ohlc_pipeline, bars_from_docs, pandas_freq
+        for method in ('dateTrunc', 'epoch'):
+            for tf in self.TIMEFRAMES:
+                with self.subTest(method=method, tf=tf):
+                    try:
+                        docs = list(self.coll.aggregate(ohlc_pipeline(self.SYMBOL, self.since, tf, method=method)))
+                    except OperationFailure:
+                        self.skipTest("server has no $dateTrunc")
+                    expected = resample_ohlc(self.ticks, tf)
+                    got = bars_from_docs(docs)
+                    self.assertBarsEqual(expected, got, tf)
+                    # the trailing bar is partial: it holds the last tick and ends after it
+                    self.assertEqual(got.index[-1], self.ticks.index[-1].floor(pandas_freq(tf)))
+
+    def test_aggregate_ohlc_matches_resample(self):
+        from analytics import bars
+        from analytics.analytics import resample_ohlc
+        with mock.patch.object(bars, 'get_collection', lambda name=None: self.coll):
+            for tf in self.TIMEFRAMES:
+                with self.subTest(tf=tf):
+                    self.assertBarsEqual(resample_ohlc(self.ticks, tf),
+                                         bars.aggregate_ohlc(self.SYMBOL, tf, since=self.since), tf)
+
+
+class PairResultCacheTests(SimpleTestCase):
+    def setUp(self):
+        import pandas as pd
+        tmp = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, tmp, ignore_errors=True)
+        self.root = os.path.join(tmp, 'pair_cache')
+        idx = pd.date_range('2025-01-01', periods=5, freq='1min', name='ts')
+        self.result = {'alpha': 0.5, 'beta': 1.25, 'half_life': {'half_life': 3.0, 'b': -0.2},
+                       'cointegration': {'t_stat': -4.1, 'pvalue': 0.01, 'crit_vals': {'5%': -3.3}},
+                       'spread': pd.Series([0.1, np.nan, 0.3, 0.2, 0.0], index=idx),
+                       'zscore': pd.Series(np.arange(5.0), index=idx, name='z')}
+
+    def test_file_round_trip_is_data_only(self):
+        import pandas as pd
+        from analytics.cache import PairResultCache
+        key = PairResultCache(root=self.root).key('aaa', 'bbb', '1m', 60, 'static', 'pandas')
+        PairResultCache(root=self.root).put(key, (1, 2), self.result)
+        self.assertEqual(os.stat(self.root).st_mode & 0o777, 0o700)
+        other = PairResultCache(root=self.root)
+        got = other.get(key, (1, 2))
+        self.assertEqual(other.stats()['hits'], 1)
+        for k, v in self.result.items():
+            if isinstance(v, pd.Series):
+                pd.testing.assert_series_equal(got[k], v, check_freq=False)
+            else:
+                self.assertEqual(got[k], v)
+        self.assertIsNone(other.get(key, (1, 3)))
+        # a pickle planted under the same name is not loaded
+        with open(other._path(key), 'wb') as f:
+            pickle.dump((2, (1, 2), self.result), f)
+        self.assertIsNone(PairResultCache(root=self.root).get(key, (1, 2)))
+
+    def test_shared_root_is_refused(self):
+        from analytics.cache import PairResultCache
+        os.makedirs(self.root)
+        os.chmod(self.root, 0o777)
+        self.assertEqual(PairResultCache(root=self.root).backend, 'memory')
+
+
+class PairParamValidationTests(SimpleTestCase):
+    """Bad source/tf/window is a client error on every pair route, never a 500."""
+    ROUTES = ['/api/pair_analytics', '/api/pair_cointegration',
+              '/api/async/pair_analytics', '/api/async/pair_cointegration']
+    BAD = [{'source': 'nope'}, {'tf': '3x'}, {'tf': '0m'}, {'window': 'ten'}]
+
+    def test_bad_params_are_400(self):
+        for route in self.ROUTES:
+            for bad in self.BAD:
+                with self.subTest(route=route, **bad):
+                    resp = self.client.get(route, {'y': 'ethusdt', 'x': 'btcusdt', **bad})
+                    self.assertEqual(resp.status_code, 400)
+                    self.assertIn('error', resp.json())
+
+
+class StreamingIndicatorTests(SimpleTestCase):
+    """
+    Streamed indicators (analytics/streaming.py) equal the batch ones for random
+    paths, lengths and windows, with a snapshot -> JSON -> restore at a random
+    bar. The rolling z-score divides by a std that can be tiny, where pandas'
+    online std drifts, so it is checked against an exact two-pass reference.
+    """
+    CASES = 60
+    RTOL = 1e-9
+    ATOL = 1e-7
+
+    @staticmethod
+    def random_bars(rng, n):
+        import pandas as pd
+        close = np.abs(rng.choice([1.0, 100.0, 60000.0]) * np.exp(np.cumsum(rng.normal(0, 0.002, n))))
+        spread = np.abs(rng.normal(0, 0.001, n)) * close
+        return pd.DataFrame({'high': close + spread, 'low': close - spread, 'close': close,
+                             'volume': rng.uniform(0, 5, n)})
+
+    @staticmethod
+    def stream(make, feed, df, restore_at):
+        from analytics import streaming as st
+        obj = make()
+        out = []
+        for i, row in enumerate(df.itertuples(index=False)):
+            if i == restore_at:
+                obj = st.restore(json.loads(json.dumps(obj.snapshot())))
+            out.append(feed(obj, row))
+        return np.array(out, dtype=float)
+
+    @staticmethod
+    def exact_rolling_zscore(x, w):
+        out = np.full(len(x), np.nan)
+        for i in range(w - 1, len(x)):
+            win = x[i - w + 1:i + 1]
+            out[i] = (x[i] - win.mean()) / (win.std() + 1e-12)
+        return out
+
+    def assertClose(self, name, batch, streamed):
+        np.testing.assert_allclose(streamed, np.asarray(batch, dtype=float), rtol=self.RTOL, atol=self.ATOL,
+                                   equal_nan=True, err_msg=name)
+
+    def test_streaming_matches_batch(self):
+        from analytics import indicators as ind
+        from analytics import streaming as st
+        rng = np.random.default_rng(0)
+        for case in range(self.CASES):
+            n, w, span = int(rng.integers(5, 800)), int(rng.integers(2, 60)), int(rng.integers(2, 40))
+            df = self.random_bars(rng, n)
+            c = df['close']
+            at = int(rng.integers(0, n))
+            with self.subTest(case=case, n=n, window=w, span=span, restore_at=at):
+                def on_close(make):
+                    return self.stream(make, lambda o, r: o.update(r.close), df, at)
+
+                self.assertClose('sma', ind.sma(c, w), on_close(lambda: st.SMA(w)))
+                self.assertClose('ema', ind.ema(c, span), on_close(lambda: st.EMA(span)))
+                self.assertClose('rsi', ind.rsi(c, span), on_close(lambda: st.RSI(span)))
+                m = on_close(lambda: st.MACD())
+                for k, series in enumerate(ind.macd(c)):
+                    self.assertClose(f'macd[{k}]', series, m[:, k])
+                b = on_close(lambda: st.BollingerBands(w))
+                for k, series in enumerate(ind.bollinger_bands(c, w)):
+                    self.assertClose(f'bollinger[{k}]', series, b[:, k])
+                self.assertClose('atr', ind.atr(df, span),
+                                 self.stream(lambda: st.ATR(span), lambda o, r: o.update(r.high, r.low, r.close),
+                                             df, at))
+                self.assertClose('vwap', ind.vwap(df),
+                                 self.stream(lambda: st.VWAP(), lambda o, r: o.update(r.close, r.volume), df, at))
+                self.assertClose('rolling_zscore', self.exact_rolling_zscore(c.to_numpy(), w),
+                                 on_close(lambda: st.RollingZScore(w)))
+
+
+def loop_positions(z, entry, exit):
+    """The original per-row state machine of zscore_signals, with NaNs carrying the position."""
+    out = np.zeros(len(z), dtype=np.int8)
+    position = 0
+    for i, v in enumerate(z):
+        if position == 0:
+            if v > entry:
+                position = -1
+            elif v < -entry:
+                position = 1
+        elif position == 1:
+            if v >= -exit:
+                position = 0
+        elif v <= exit:
+            position = 0
+        out[i] = position
+    return out
+
+
+class SignalEngineTests(SimpleTestCase):
+    """analytics.signals (NumPy and, when installed, Numba) against the per-row loop."""
+    # (z, entry, exit, expected positions)
+    CASES = {
+        'entry is strict, exit is inclusive': ([2.0, 2.0 + 1e-12, 0.0, -2.0, -2.0 - 1e-12, -0.0], 2.0, 0.0,
+                                               [0, -1, 0, 0, 1, 0]),
+        'exit exactly on the boundary': ([2.5, 0.5, 0.5 + 1e-12, -2.5, -0.5, -0.5 - 1e-12], 2.0, 0.5,
+                                         [-1, 0, 0, 1, 0, 0]),
+        'nan carries the position': ([np.nan, 2.5, np.nan, np.nan, 0.1, -0.1, np.nan], 2.0, 0.0,
+                                     [0, -1, -1, -1, -1, 0, 0]),
+        'nan never triggers an entry': ([np.nan] * 4, -1.0, 0.0, [0, 0, 0, 0]),
+        'flip exits on one bar and enters on the next': ([2.5, -2.5, -2.5, 2.5, 2.5, 0.0], 2.0, 0.0,
+                                                         [-1, 0, 1, 0, -1, 0]),
+        'exit beyond the opposite entry': ([2.5, -1.0, -3.0, -3.0, 1.0, 2.5], 2.0, -2.5, [-1, -1, 0, 1, 1, 0]),
+    }
+
+    def engines(self):
+        from analytics import signals
+        return ['numpy'] + (['numba'] if signals.numba is not None else [])
+
+    def assertPositions(self, expected, z, entry, exit):
+        from analytics.signals import signal_positions, signal_positions_batch
+        np.testing.assert_array_equal(loop_positions(z, entry, exit), expected, err_msg='loop')
+        for engine in self.engines():
+            np.testing.assert_array_equal(signal_positions(z, entry, exit, engine=engine), expected,
+                                          err_msg=engine)
+            np.testing.assert_array_equal(signal_positions_batch(z, [entry], [exit], engine=engine)[0], expected,
+                                          err_msg=f'{engine} batch')
+
+    def test_edge_cases(self):
+        for name, (z, entry, exit, expected) in self.CASES.items():
+            with self.subTest(name):
+                self.assertPositions(np.array(expected, dtype=np.int8), np.array(z, dtype=float), entry, exit)
+
+    def test_random_paths(self):
+        import pandas as pd
+        from analytics.analytics import zscore_signals
+        rng = np.random.default_rng(0)
+        for case in range(200):
+            n = int(rng.integers(1, 2000))
+            z = np.cumsum(rng.normal(0, rng.uniform(0.1, 1.0), n))
+            z = (z - z.mean()) / (z.std() + 1e-12) * rng.uniform(0.5, 3)
+            z[rng.random(n) < 0.02] = np.nan
+            # snap some values onto the thresholds so the boundaries are exercised
+            entry = float(rng.choice([0.5, 1.0, 2.0, 2.5, -0.5]))
+            exit = float(rng.choice([0.0, 0.5, -0.5, 1.0, 3.0]))
+            snap = rng.random(n) < 0.05
+            z[snap] = rng.choice([entry, -entry, exit, -exit], snap.sum())
+            with self.subTest(case=case, n=n, entry=entry, exit=exit):
+                expected = loop_positions(z, entry, exit)
+                self.assertPositions(expected, z, entry, exit)
+                s = pd.Series(z, index=pd.date_range('2025-01-01', periods=n, freq='1s'))
+                got = zscore_signals(s, entry, exit)
+                valid = ~np.isnan(z)
+                self.assertTrue(got.index.equals(s.index[valid]))
+                np.testing.assert_array_equal(got.to_numpy(), loop_positions(z[valid], entry, exit))
+
+    def test_batch_grid(self):
+        from analytics.signals import signal_positions_batch
+        rng = np.random.default_rng(1)
+        zz = rng.normal(0, 1.5, (500, 4))
+        zz[rng.random(zz.shape) < 0.02] = np.nan
+        params = [(1.5, 0.0), (2.0, 0.5), (1.0, -1.0)]
+        for engine in self.engines():
+            grid = signal_positions_batch(zz, [p[0] for p in params], [p[1] for p in params], engine=engine)
+            self.assertEqual(grid.shape, (3, 500, 4))
+            for p, (entry, exit) in enumerate(params):
+                for k in range(zz.shape[1]):
+                    np.testing.assert_array_equal(grid[p, :, k], loop_positions(zz[:, k], entry, exit))
+
+
+class SharedBarRingTests(SimpleTestCase):
+    def test_default_ring_serves_a_full_day_of_minute_bars(self):
+        import pandas as pd
+        from analytics import bars
+        from analytics.shared_bars import SHARED_BARS_WINDOW_MINUTES, SharedBarWriter, open_ring
+        root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, root, ignore_errors=True)
+        now = pd.Timestamp.utcnow().tz_localize(None)
+        open_ms = int(now.value // 1_000_000) // 60_000 * 60_000
+        writer = SharedBarWriter(root=root)
+        self.addCleanup(writer.close)
+        # the whole window plus the still open bar
+        for k in range(SHARED_BARS_WINDOW_MINUTES, -1, -1):
+            writer.write(60, 'ringtestusdt', (open_ms - k * 60_000, 1.0, 1.0, 1.0, 1.0, 1.0, 1))
+        since = now.to_pydatetime() - pd.Timedelta(minutes=SHARED_BARS_WINDOW_MINUTES)
+        with mock.patch.object(bars, 'open_ring', lambda s, b: open_ring(s, b, root)):
+            df = bars.read_shared_bars('ringtestusdt', '1m', since)
+        self.assertIsNotNone(df, "the ring does not reach back over the whole window")
+        self.assertEqual(len(df), SHARED_BARS_WINDOW_MINUTES + 1)
+
+    def test_snapshot_since_copies_only_the_requested_rows(self):
+        from analytics.shared_bars import BarRing
+        root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, root, ignore_errors=True)
+        ring = BarRing.create('ringtestusdt', 60, capacity=100, root=root)
+        self.addCleanup(ring.close)
+        for k in range(150):  # wraps the ring
+            ring.write(k * 60_000, k, k + 1, k - 1, k + 0.5, 1.0, 1)
+        snap = ring.snapshot(since_ms=120 * 60_000)
+        np.testing.assert_array_equal(snap['ts'], np.arange(120, 150) * 60_000)
+        self.assertTrue(snap['close'].flags.owndata)
+        df = ring.frame(since_ms=120 * 60_000 + 1)
+        view = ring.frame(since_ms=120 * 60_000 + 1, copy=False)
+        self.assertEqual(df.index[0].value, 121 * 60_000 * 1_000_000)
+        self.assertTrue(df.equals(view))
+        ring.write(149 * 60_000, 149, 200, 149, 199, 2.0, 2)  # the open bar changes
+        self.assertEqual(df['close'].iloc[-1], 149.5)
+        self.assertEqual(view['close'].iloc[-1], 199)
+
+
+class ScannerPoolTests(SimpleTestCase):
+    def test_pool_matches_in_process_and_is_reused(self):
+        from analytics import scanner, workers
+        rng = np.random.default_rng(3)
+        base = np.cumsum(rng.normal(0, 1, 400))
+        matrix = np.column_stack([100 + k + (k % 3 + 1) * base + rng.normal(0, 1, 400) for k in range(12)])
+        symbols = [f's{k}' for k in range(12)]
+        expected, _ = scanner.scan_matrix(matrix, symbols, workers=1)
+        with mock.patch.object(scanner, 'SCANNER_MIN_PARALLEL', 1):
+            got, timings = scanner.scan_matrix(matrix, symbols, workers=2)
+            pool = workers.get_pool(2)
+            again, _ = scanner.scan_matrix(matrix * 2, symbols, workers=2)
+        self.assertEqual(timings['workers'], 2)
+        self.assertIs(workers.get_pool(2), pool)
+        self.assertEqual(got, expected)
+        self.assertEqual(len(again), len(expected))
+        self.assertAlmostEqual(again[0]['alpha'], 2 * expected[0]['alpha'])
+
+
+class BacktestPoolTests(SimpleTestCase):
+    def test_pool_matches_in_process(self):
+        from analytics import backtest, workers
+        rng = np.random.default_rng(4)
+        x = 100 + np.cumsum(rng.normal(0, 0.1, 1500))
+        y = 5 + 1.5 * x + np.cumsum(rng.normal(0, 0.05, 1500)) * 0.1
+        ts = 1_735_689_600_000 + np.arange(1500, dtype=np.int64) * 60_000
+        grid = dict(windows=[30, 60, 90, 120], entries=[1.5, 2.0], exits=[0.0, 0.5], cache=False)
+        expected, _ = backtest.grid_search(y, x, ts, workers=1, **grid)
+        with mock.patch.object(backtest, 'BACKTEST_MIN_PARALLEL', 1):
+            got, stats = backtest.grid_search(y, x, ts, workers=2, **grid)
+            pool = workers.get_pool(2)
+            backtest.grid_search(y[::-1].copy(), x[::-1].copy(), ts, workers=2, **grid)
+        self.assertEqual(stats['workers'], 2)
+        self.assertIs(workers.get_pool(2), pool)
+        self.assertEqual(got, expected)
+
+
+class TickStoreTests(SimpleTestCase):
+    def test_interface_is_abstract(self):
+        from collector.storage import MemoryTickStore, TickStore
+        with self.assertRaises(TypeError):
+            TickStore()
+
+        class Partial(TickStore):
+            async def insert_many(self, docs):
+                pass
+
+        with self.assertRaises(TypeError):
+            Partial()
+        self.assertIsInstance(MemoryTickStore(), TickStore)
+
+
+class BarsFromArraysTests(SimpleTestCase):
+    def setUp(self):
+        import pandas as pd
+        rng = np.random.default_rng(5)
+        self.ts = 1_735_700_000_123 + np.cumsum(rng.integers(1, 2000, 20_000))
+        self.price = np.round(100 + np.cumsum(rng.normal(0, 0.01, len(self.ts))), 4)
+        self.qty = rng.uniform(0.001, 2, len(self.ts))
+        self.ticks = pd.DataFrame({'price': self.price, 'qty': self.qty},
+                                  index=pd.DatetimeIndex(pd.to_datetime(self.ts, unit='ms'), name='ts'))
+
+    def test_matches_resample_for_timeframes_that_divide_a_day(self):
+        from analytics.analytics import resample_ohlc
+        from analytics.bars import BAR_COLUMNS, bars_from_arrays, timeframe_seconds
+        for tf in ['1s', '5s', '1m', '5m', '15m', '1h']:
+            with self.subTest(tf=tf):
+                got = bars_from_arrays(self.ts, self.price, self.qty, timeframe_seconds(tf))
+                expected = resample_ohlc(self.ticks, tf)
+                np.testing.assert_array_equal(got['ts'], expected.index.asi8 // 1_000_000)
+                for col in BAR_COLUMNS:
+                    np.testing.assert_allclose(got[col], expected[col].to_numpy(), rtol=1e-12, err_msg=col)
+
+    def test_other_timeframes_are_epoch_aligned(self):
+        from analytics.bars import bars_from_arrays
+        got = bars_from_arrays(self.ts, self.price, self.qty, 7 * 60)
+        self.assertTrue((got['ts'] % 420_000 == 0).all())
+
+
+class CorrelationParamTests(SimpleTestCase):
+    """Bad correlation bodies are a 400 with a message on both stacks."""
+    ROUTES = ['/api/corr_heatmap', '/api/async/corr_heatmap']
+    BAD = [{'since_minutes': 'x'}, {'since_minutes': 0}, {'halflife': 'y'}, {'tf': '3x'}, {'source': 'bogus'},
+           {'mode': 'nope'}, {'top': 'k'}, {'top': 3, 'symbol': 'dogeusdt'}, {'symbols': []}]
+
+    def test_bad_bodies_are_400(self):
+        for route in self.ROUTES:
+            for bad in self.BAD:
+                with self.subTest(route=route, **{k: str(v) for k, v in bad.items()}):
+                    body = {'symbols': ['btcusdt', 'ethusdt'], **bad}
+                    resp = self.client.post(route, json.dumps(body), content_type='application/json')
+                    self.assertEqual(resp.status_code, 400)
+                    self.assertIn('error', resp.json())
+
+    def test_top_for_a_symbol_without_data_is_empty(self):
+        from analytics import analytics
+
+        class Engine:
+            used = ['btcusdt', 'ethusdt']
+
+            def refresh(self):
+                return self
+
+            def top(self, k, symbol):
+                raise AssertionError("not reached")
+
+        with mock.patch.object(analytics, 'get_engine', lambda *a, **kw: Engine()):
+            self.assertEqual(analytics.correlation_top(['btcusdt', 'ethusdt', 'solusdt'], symbol='solusdt'), [])
+
+
+class SyncAsyncParityTests(SimpleTestCase):
+    """The DRF views and their async twins return the same status and body for the same bars."""
+
+    @staticmethod
+    def bars(close):
+        import pandas as pd
+        idx = pd.date_range('2025-01-01', periods=len(close), freq='1min', name='ts')
+        return pd.DataFrame({'open': close, 'high': close, 'low': close, 'close': close,
+                             'volume': np.ones(len(close))}, index=idx)
+
+    def get_both(self, route, frames, **params):
+        from analytics import analytics
+        from analytics.cache import pair_cache
+        from api import async_views, views
+
+        def get_bars(symbol, timeframe='1m', since_minutes=60, source=None):
+            return frames[symbol]
+
+        with mock.patch.object(views, 'get_bars', get_bars), mock.patch.object(async_views, 'get_bars', get_bars), \
+                mock.patch.object(analytics, 'get_bars', get_bars), mock.patch.object(pair_cache, 'backend', 'off'):
+            return [self.client.get(f'/api/{prefix}{route}', {'y': 'yyy', 'x': 'xxx', **params})
+                    for prefix in ('', 'async/')]
+
+    def assertSame(self, sync, async_):
+        self.assertEqual(sync.status_code, async_.status_code)
+        self.assertEqual(json.loads(sync.content), json.loads(async_.content))
+
+    def test_pair_routes_match(self):
+        rng = np.random.default_rng(6)
+        x = 100 + np.cumsum(rng.normal(0, 0.1, 300))
+        y = 3 + 1.5 * x + rng.normal(0, 0.05, 300)
+        frames = {'yyy': self.bars(y), 'xxx': self.bars(x)}
+        for route, params in [('pair_analytics', {}), ('pair_analytics', {'hedge': 'rolling', 'window': 30}),
+                              ('pair_cointegration', {'layout': 'columns', 'limit': 50}),
+                              ('pair_cointegration', {'hedge': 'kalman'})]:
+            with self.subTest(route=route, **params):
+                sync, async_ = self.get_both(route, frames, **params)
+                self.assertEqual(sync.status_code, 200)
+                self.assertSame(sync, async_)
+
+    def test_constant_spread_is_400_on_both(self):
+        x = 100 + np.sin(np.arange(300) / 10.0)
+        frames = {'yyy': self.bars(2 * x + 1), 'xxx': self.bars(x)}
+        sync, async_ = self.get_both('pair_analytics', frames)
+        self.assertEqual(sync.status_code, 400)
+        self.assertSame(sync, async_)
+
+    def test_nan_is_written_as_null(self):
+        from api import async_views
+        x = 100 + np.cumsum(np.random.default_rng(7).normal(0, 0.1, 300))
+        frames = {'yyy': self.bars(2 * x + np.random.default_rng(8).normal(0, 0.1, 300)), 'xxx': self.bars(x)}
+        with mock.patch.object(async_views, 'pair_analytics_from_bars', lambda *a: {'last_z': float('nan')}):
+            _, async_ = self.get_both('pair_analytics', frames)
+        self.assertEqual(json.loads(async_.content), {'last_z': None})
+
+
+class CointParityTests(SimpleTestCase):
+    """analytics.coint against statsmodels adfuller / coint on random AR(1) spreads."""
+    CASES = 25
+    TOL = 1e-8
+
+    @staticmethod
+    def ar_pair(rng, n):
+        x = np.cumsum(rng.normal(size=n)) + 100
+        phi = rng.uniform(0.5, 1.0)
+        noise = rng.normal(size=n)
+        e = np.zeros(n)
+        for i in range(1, n):
+            e[i] = phi * e[i - 1] + noise[i]
+        return 1.3 * x + e + 5, x, e
+
+    def test_matches_statsmodels(self):
+        import warnings
+        import statsmodels.tsa.stattools as ts
+        from analytics.coint import adf, engle_granger
+        rng = np.random.default_rng(0)
+        with warnings.catch_warnings():
+            warnings.simplefilter('ignore')
+            for case in range(self.CASES):
+                n = int(rng.integers(40, 3000))
+                y, x, e = self.ar_pair(rng, n)
+                for reg in ('n', 'c', 'ct'):
+                    for autolag, maxlag in (('aic', None), ('bic', None), ('aic', 2), (None, int(rng.integers(0, 5)))):
+                        with self.subTest(case=case, n=n, regression=reg, autolag=autolag, maxlag=maxlag):
+                            ref = ts.adfuller(e, regression=reg, autolag=autolag, maxlag=maxlag, result_object=False)
+                            got = adf(e, regression=reg, autolag=autolag, maxlag=maxlag)
+                            self.assertEqual(got['usedlag'], ref[2])
+                            self.assertEqual(got['nobs'], ref[3])
+                            self.assertAlmostEqual(got['adf'], ref[0], delta=self.TOL)
+                            self.assertAlmostEqual(got['pvalue'], ref[1], delta=self.TOL)
+                            for k, v in ref[4].items():
+                                self.assertAlmostEqual(got['crit_vals'][k], v, delta=self.TOL)
+                with self.subTest(case=case, n=n, test='coint'):
+                    ref = ts.coint(y, x)
+                    got = engle_granger(y, x)
+                    self.assertAlmostEqual(got['t_stat'], ref[0], delta=self.TOL)
+                    self.assertAlmostEqual(got['pvalue'], ref[1], delta=self.TOL)
+                    np.testing.assert_allclose(got['crit_vals'], ref[2], rtol=0, atol=self.TOL)
+
+
+class HedgeTests(SimpleTestCase):
+    def setUp(self):
+        rng = np.random.default_rng(9)
+        self.x = 100 + np.cumsum(rng.normal(0, 0.5, 1000))
+        self.y = 4.0 + 1.7 * self.x + rng.normal(0, 0.2, 1000)
+
+    def test_rolling_ols_matches_statsmodels(self):
+        import statsmodels.api as sm
+        from statsmodels.regression.rolling import RollingOLS
+        from analytics.hedge import rolling_ols
+        # the O(n) cumulative sums lose a few digits to cancellation; alpha more, at price level ~100
+        for window in (20, 60, 240):
+            with self.subTest(window=window):
+                beta, alpha = rolling_ols(self.y, self.x, window)
+                ref = RollingOLS(self.y, sm.add_constant(self.x), window=window).fit().params
+                np.testing.assert_allclose(beta, ref[:, 1], rtol=1e-6, equal_nan=True)
+                np.testing.assert_allclose(alpha, ref[:, 0], rtol=1e-6, atol=1e-5, equal_nan=True)
+
+    def test_kalman_recovers_a_constant_beta(self):
+        from analytics.hedge import kalman_hedge, ols_beta
+        k = kalman_hedge(self.y, self.x)
+        self.assertAlmostEqual(k['beta'][-1], 1.7, delta=0.01)
+        # forecast errors after the warm-up are on the noise scale
+        self.assertLess(np.std(k['error'][k['warmup']:]), 0.25)
+        self.assertTrue(np.isnan(k['std'][:k['warmup']]).all())
+        # with no state noise the filter is recursive least squares: the full-sample OLS fit
+        k = kalman_hedge(self.y, self.x, delta=1e-12)
+        beta, alpha = ols_beta(self.y, self.x)
+        self.assertAlmostEqual(k['beta'][-1], beta, delta=1e-6)
+        self.assertAlmostEqual(k['alpha'][-1], alpha, delta=1e-3)
+
+    def test_kalman_zscore_starts_after_warmup(self):
+        import pandas as pd
+        from analytics.analytics import spread_and_zscore
+        from analytics.hedge import KALMAN_WARMUP
+        idx = pd.date_range('2025-01-01', periods=len(self.x), freq='1min')
+        window = 50
+        out = spread_and_zscore(pd.Series(self.y, index=idx), pd.Series(self.x, index=idx), window, 'kalman')
+        z = out['zscore']
+        self.assertTrue(z.index.equals(out['spread'].index))
+        first = KALMAN_WARMUP + window - 1
+        self.assertTrue(z.iloc[:first].isna().all())
+        self.assertFalse(z.iloc[first:].isna().any())
+
+
+class RawTickDecodeTests(SimpleTestCase):
+    """The fixed-layout raw BSON decoder (analytics/ticks.py) and its decode_all fallback."""
+
+    def setUp(self):
+        from datetime import datetime, timezone
+        rng = np.random.default_rng(10)
+        base = int(datetime(2025, 1, 1, tzinfo=timezone.utc).timestamp() * 1000)
+        self.ts = base + np.cumsum(rng.integers(1, 1000, 50))
+        self.price = np.round(100 + np.cumsum(rng.normal(0, 0.1, 50)), 4)
+        self.qty = rng.uniform(0.001, 2, 50)
+
+    def batch(self, make):
+        import bson
+        return b''.join(bson.encode(make(int(t), float(p), float(q)))
+                        for t, p, q in zip(self.ts, self.price, self.qty))
+
+    def assertTicks(self, out, price=None):
+        np.testing.assert_array_equal(out['ts'], self.ts)
+        np.testing.assert_array_equal(out['price'], self.price if price is None else price)
+        np.testing.assert_array_equal(out['qty'], self.qty)
+        self.assertEqual(out['ts'].dtype, np.int64)
+        self.assertEqual(out['price'].dtype, np.float64)
+
+    def test_fixed_layout_is_viewed_directly(self):
+        from bson.datetime_ms import DatetimeMS
+        from analytics.ticks import _decode_fixed, _decode_generic
+        buf = self.batch(lambda t, p, q: {'ts': DatetimeMS(t), 'price': p, 'qty': q})
+        out = _decode_fixed(buf)
+        self.assertIsNotNone(out)
+        self.assertTicks(out)
+        self.assertTicks(_decode_generic(buf))
+
+    def test_other_layouts_fall_back(self):
+        from bson.datetime_ms import DatetimeMS
+        from bson.int64 import Int64
+        from analytics.ticks import _decode_fixed, _decode_generic
+        layouts = {
+            # same document size, different type byte
+            'int64 price': (lambda t, p, q: {'ts': DatetimeMS(t), 'price': Int64(round(p)), 'qty': q},
+                            np.round(self.price)),
+            'int32 price': (lambda t, p, q: {'ts': DatetimeMS(t), 'price': int(round(p)), 'qty': q},
+                            np.round(self.price)),
+            'reordered': (lambda t, p, q: {'price': p, 'ts': DatetimeMS(t), 'qty': q}, None),
+        }
+        for name, (make, price) in layouts.items():
+            with self.subTest(name):
+                buf = self.batch(make)
+                self.assertIsNone(_decode_fixed(buf))
+                self.assertTicks(_decode_generic(buf), price)
+
+    def test_one_odd_document_sends_the_batch_to_the_fallback(self):
+        import bson
+        from bson.datetime_ms import DatetimeMS
+        from analytics.ticks import _decode_fixed
+        buf = self.batch(lambda t, p, q: {'ts': DatetimeMS(t), 'price': p, 'qty': q})
+        odd = bson.encode({'ts': DatetimeMS(int(self.ts[0])), 'price': 1, 'qty': 1.0})
+        self.assertIsNone(_decode_fixed(buf + odd))
+
+    def test_empty_batch(self):
+        from analytics.ticks import _concat, _decode_fixed, _decode_generic
+        for out in (_decode_fixed(b''), _decode_generic(b''), _concat([])):
+            self.assertEqual({k: (len(v), v.dtype) for k, v in out.items()},
+                             {'ts': (0, np.int64), 'price': (0, np.float64), 'qty': (0, np.float64)})
+
+
+class FakeTickCollection:
+    """Blocking insert_many stand-in for ExecutorTickStore: records batches and peak concurrency."""
+
+    def __init__(self, latency=0.0, fail=None):
+        import threading
+        self.latency = latency
+        self.fail = fail  # (batch number, documents inserted before the BulkWriteError)
+        self.batches = []
+        self.active = self.max_active = 0
+        self._lock = threading.Lock()
+
+    def insert_many(self, docs, ordered=True):
+        import time
+        from pymongo.errors import BulkWriteError
+        assert not ordered
+        with self._lock:
+            self.active += 1
+            self.max_active = max(self.max_active, self.active)
+            n = len(self.batches)
+            self.batches.append(docs)
+        try:
+            time.sleep(self.latency)
+            if self.fail and self.fail[0] == n:
+                raise BulkWriteError({'nInserted': self.fail[1], 'writeErrors': []})
+        finally:
+            with self._lock:
+                self.active -= 1
+
+
+class TickWriterTests(SimpleTestCase):
+    day = 1_735_689_600_000
+
+    def records(self, n):
+        return [('btcusdt', self.day + i, 100.0 + i, 1.0) for i in range(n)]
+
+    def test_full_queue_drops_and_counts(self):
+        from collector.storage import MemoryTickStore
+        from collector.writer import TickWriter
+        writer = TickWriter(MemoryTickStore(), max_queue=3)
+        self.assertEqual([writer.put(r) for r in self.records(5)], [True, True, True, False, False])
+        snap = writer.snapshot()
+        self.assertEqual((snap['queue_depth'], snap['max_depth'], snap['enqueued'], snap['dropped']), (3, 3, 3, 2))
+
+    def test_stop_writes_out_queue_and_inflight_batches(self):
+        import asyncio
+        from collector.storage import ExecutorTickStore
+        from collector.writer import TickWriter
+        coll = FakeTickCollection(latency=0.02)
+
+        async def go():
+            store = ExecutorTickStore(coll, workers=4)
+            writer = TickWriter(store, batch_size=10, flush_interval=60, max_inflight=2)
+            flusher = asyncio.create_task(writer.run())
+            for rec in self.records(95):
+                writer.put(rec)
+            await asyncio.sleep(0.005)
+            self.assertGreater(writer.snapshot()['inflight'], 0)
+            writer.stop()
+            await flusher
+            await store.close()
+            return writer.snapshot()
+
+        snap = asyncio.run(go())
+        docs = sorted((d for b in coll.batches for d in b), key=lambda d: d['price'])
+        self.assertEqual([d['price'] for d in docs], [r[2] for r in self.records(95)])
+        self.assertTrue(all(len(b) <= 10 for b in coll.batches))
+        self.assertLessEqual(coll.max_active, 2)
+        self.assertEqual((snap['written'], snap['failed'], snap['flushes'], snap['queue_depth'], snap['inflight']),
+                         (95, 0, len(coll.batches), 0, 0))
+
+    def test_bulk_write_error_counts_the_inserted_part(self):
+        import asyncio
+        from collector.storage import ExecutorTickStore
+        from collector.writer import TickWriter
+        coll = FakeTickCollection(fail=(0, 3))
+
+        async def go():
+            store = ExecutorTickStore(coll, workers=1)
+            writer = TickWriter(store, batch_size=5, max_inflight=1)
+            for rec in self.records(10):
+                writer.put(rec)
+            with mock.patch('builtins.print'):
+                await writer.close()
+            await store.close()
+            return writer.snapshot()
+
+        snap = asyncio.run(go())
+        self.assertEqual((snap['written'], snap['failed'], snap['flushes']), (8, 2, 1))
+
+
+class PushHubTests(SimpleTestCase):
+    def test_full_mailbox_coalesces(self):
+        import asyncio
+        from api.push import BarTopic, PairTopic, Subscriber
+
+        async def run():
+            bars = Subscriber(BarTopic('btcusdt', '1s'), max_pending=2)
+            for k in range(10):
+                bars.offer('bars', {'bars': [{'ts': k}]})
+            self.assertEqual((len(bars.pending), bars.coalesced), (2, 8))
+            self.assertEqual([b['ts'] for b in bars.pending[1][1]['bars']], list(range(1, 10)))
+            pair = Subscriber(PairTopic('ethusdt', 'btcusdt', '1s'), max_pending=1)
+            pair.offer('snapshot', {'z': 0.0})
+            for k in range(5):
+                pair.offer('pair', {'z': float(k)})
+            # a pending snapshot stays a snapshot, with the latest values
+            self.assertEqual(await pair.get(), ('snapshot', {'z': 4.0, 'coalesced': 5}))
+            self.assertIsNone(await pair.get(timeout=0.01))
+
+        asyncio.run(run())
+
+    def test_pair_topic_aligns_closed_bars(self):
+        import pandas as pd
+        from api.push import PairTopic
+        rng = np.random.default_rng(4)
+        start = pd.Timestamp('2025-01-01')
+        x = 100 + np.cumsum(rng.normal(0, 1, 102))
+        y = 2 * x + rng.normal(0, 0.1, 102)
+
+        def frame(values, n, missing):
+            keep = [i for i in range(n) if i not in missing]
+            idx = pd.DatetimeIndex([start + pd.Timedelta(minutes=i) for i in keep], name='ts')
+            return pd.DataFrame({'close': values[keep]}, index=idx)
+
+        bars = {}
+        topic = PairTopic('ethusdt', 'btcusdt', '1m', window=20)
+        with mock.patch('api.push.get_bars', lambda symbol, *a, **k: bars[symbol]):
+            bars.update(ethusdt=frame(y, 100, {10, 20}), btcusdt=frame(x, 100, {30}))
+            idx, yv, xv = topic._aligned(60)
+            expected = [i for i in range(99) if i not in (10, 20, 30)]  # bar 99 may still be open
+            self.assertEqual(list(idx), [start + pd.Timedelta(minutes=i) for i in expected])
+            np.testing.assert_array_equal(yv, y[expected])
+            np.testing.assert_array_equal(xv, x[expected])
+            self.assertEqual(topic.start()['ts'], idx[-1].isoformat())
+            bars.update(ethusdt=frame(y, 102, {10, 20}), btcusdt=frame(x, 102, {30}))
+            updates, latest = topic.poll()
+        self.assertEqual([u['ts'] for u in updates],
+                         [(start + pd.Timedelta(minutes=i)).isoformat() for i in (99, 100)])
+        self.assertIs(latest, updates[-1])
+        self.assertAlmostEqual(latest['beta'], 2.0, delta=0.05)
+
+    def test_topic_runs_once_for_all_subscribers_and_is_reaped(self):
+        import asyncio
+        from api import push
+
+        class CountingTopic(push.Topic):
+            bar_seconds = 1
+            starts = 0
+
+            def __init__(self):
+                super().__init__(('counting',))
+                self.n = 0
+
+            def start(self):
+                CountingTopic.starts += 1
+                return {'n': 0}
+
+            def poll(self):
+                self.n += 1
+                return [{'n': self.n}], {'n': self.n}
+
+        async def run():
+            hub = push.Hub(interval=0.01)
+            a, b = hub.subscribe(CountingTopic()), hub.subscribe(CountingTopic())
+            topic = a.topic
+            self.assertIs(b.topic, topic)
+            self.assertEqual(list(hub.topics), [('counting',)])
+            for sub in (a, b):
+                self.assertEqual(await sub.get(timeout=1), ('snapshot', {'n': 0}))
+                self.assertEqual(await sub.get(timeout=1), ('update', {'n': 1}))
+            # a late subscriber starts from the current snapshot, then gets only newer updates
+            c = hub.subscribe(CountingTopic())
+            event, snap = await c.get(timeout=1)
+            self.assertEqual(event, 'snapshot')
+            self.assertEqual(await c.get(timeout=1), ('update', {'n': snap['n'] + 1}))
+            self.assertEqual(CountingTopic.starts, 1)
+
+            for sub in (a, b, c):
+                hub.unsubscribe(sub)
+            d = hub.subscribe(CountingTopic())  # back within the linger time: the topic survives
+            await asyncio.sleep(0.05)
+            self.assertIs(hub.topics[('counting',)], topic)
+            self.assertFalse(topic.task.done())
+            hub.unsubscribe(d)
+            await asyncio.sleep(0.05)
+            self.assertEqual(hub.topics, {})
+            self.assertTrue(topic.task.cancelled())
+            self.assertEqual(CountingTopic.starts, 1)
+
+        with mock.patch.object(push, 'PUSH_LINGER', 0.02):
+            asyncio.run(run())
+
+
+class SeriesFormatTests(SimpleTestCase):
+    """?format= / Accept negotiation with layout, since and limit on /api/ohlc and its async twin."""
+    PREFIXES = ('', 'async/')
+
+    def setUp(self):
+        import pandas as pd
+        close = 100 + np.arange(100.0)
+        idx = pd.date_range('2025-01-01', periods=100, freq='1min', name='ts')
+        self.df = pd.DataFrame({'open': close, 'high': close + 1, 'low': close - 1, 'close': close,
+                                'volume': np.ones(100)}, index=idx)
+        self.ts_ms = idx.asi8 // 1_000_000
+
+    def get(self, prefix, accept=None, **params):
+        from api import async_views, views
+        get_bars = lambda *a, **k: self.df
+        headers = {'HTTP_ACCEPT': accept} if accept else {}
+        with mock.patch.object(views, 'get_bars', get_bars), mock.patch.object(async_views, 'get_bars', get_bars):
+            return self.client.get(f'/api/{prefix}ohlc', {'symbol': 'btcusdt', **params}, **headers)
+
+    def test_json_layouts_since_and_limit(self):
+        for prefix in self.PREFIXES:
+            with self.subTest(prefix=prefix):
+                r = self.get(prefix)
+                self.assertEqual(r['Content-Type'], 'application/json')
+                rows = json.loads(r.content)
+                self.assertEqual(len(rows), 100)
+                self.assertEqual(rows[0]['close'], 100.0)
+                cols = json.loads(self.get(prefix, layout='columns', limit=10).content)
+                self.assertEqual(cols['ts'], self.ts_ms[-10:].tolist())
+                self.assertEqual(cols['close'], self.df['close'].iloc[-10:].tolist())
+                # strictly after `since`, as epoch ms or ISO, then the latest `limit`
+                for since in (str(self.ts_ms[89]), '2025-01-01T01:29:00Z'):
+                    cols = json.loads(self.get(prefix, layout='columns', since=since).content)
+                    self.assertEqual(cols['ts'], self.ts_ms[90:].tolist())
+                cols = json.loads(self.get(prefix, layout='columns', since=str(self.ts_ms[49]), limit=5).content)
+                self.assertEqual(cols['ts'], self.ts_ms[95:].tolist())
+
+    def test_binary_formats_are_columnar(self):
+        import msgspec
+        import pyarrow as pa
+        for prefix in self.PREFIXES:
+            for how in ('query', 'accept'):
+                with self.subTest(prefix=prefix, how=how):
+                    r = (self.get(prefix, format='msgpack', limit=20) if how == 'query' else
+                         self.get(prefix, accept='application/x-msgpack', limit=20))
+                    self.assertEqual(r['Content-Type'], 'application/x-msgpack')
+                    cols = msgspec.msgpack.decode(r.content)
+                    self.assertEqual(cols['ts'], self.ts_ms[-20:].tolist())
+
+                    r = (self.get(prefix, format='arrow', since=str(self.ts_ms[79])) if how == 'query' else
+                         self.get(prefix, accept='application/vnd.apache.arrow.stream', since=str(self.ts_ms[79])))
+                    self.assertEqual(r['Content-Type'], 'application/vnd.apache.arrow.stream')
+                    table = pa.ipc.open_stream(r.content).read_all()
+                    self.assertEqual(table.schema.field('ts').type, pa.timestamp('ms'))
+                    self.assertEqual(table.column('ts').cast(pa.int64()).to_pylist(), self.ts_ms[80:].tolist())
+                    np.testing.assert_array_equal(table.column('high').to_numpy(), self.df['high'].iloc[80:])
+
+    def test_bad_parameters(self):
+        for prefix in self.PREFIXES:
+            with self.subTest(prefix=prefix):
+                self.assertEqual(self.get(prefix, layout='rows').status_code, 400)
+                self.assertEqual(self.get(prefix, limit=0).status_code, 400)
+                self.assertEqual(self.get(prefix, format='xml').status_code, 406)
+                # an Accept type that is not offered falls back to JSON on the async route, 406 under DRF
+                self.assertEqual(self.get(prefix, accept='text/csv').status_code, 200 if prefix else 406)
+
+    def test_format_without_its_library_is_406(self):
+        from api import renderers
+        with mock.patch.dict(renderers.FORMAT_LIBRARIES, arrow='not_installed_arrow'):
+            self.assertFalse(renderers.format_available('arrow'))
+            r = self.get('async/', format='arrow')
+            self.assertEqual(r.status_code, 406)
+            # an Accept list skips it
+            r = self.get('async/', accept='application/vnd.apache.arrow.stream, application/x-msgpack')
+            self.assertEqual(r['Content-Type'], 'application/x-msgpack')
+
+
+class SeriesCacheTests(SimpleTestCase):
+    """SeriesCache hits, tail refreshes and LRU eviction against a stub loader that counts calls."""
+
+    def setUp(self):
+        from datetime import datetime
+        import pandas as pd
+        from analytics import cache
+        self.now = datetime(2025, 1, 1, 12, 0, 30)
+        self.clock = 1000.0
+        self.idx = pd.date_range('2025-01-01 10:00', '2025-01-01 12:10', freq='1min', name='ts')
+        self.close = pd.Series(np.arange(len(self.idx), dtype=float), index=self.idx)
+        self.calls = []
+        clock = mock.Mock(monotonic=lambda: self.clock)
+        utc = mock.Mock(utcnow=lambda: self.now)
+        for p in (mock.patch.object(cache, 'time', clock), mock.patch.object(cache, 'datetime', utc)):
+            p.start()
+            self.addCleanup(p.stop)
+
+    def load(self, since):
+        """Bars from the one containing `since` up to the open bar at self.now."""
+        import pandas as pd
+        self.calls.append(since)
+        bars = self.close[(self.close.index > pd.Timestamp(since) - pd.Timedelta(minutes=1))
+                          & (self.close.index <= pd.Timestamp(self.now))]
+        return bars.to_frame('close')
+
+    def get(self, cache, key='btcusdt'):
+        from datetime import timedelta
+        return cache.get((key, '1m', 30, 'stub'), 60, timedelta(minutes=30), self.load)
+
+    def test_hit_within_ttl(self):
+        from analytics.cache import SeriesCache
+        cache = SeriesCache()
+        first = self.get(cache)
+        self.clock += 59
+        self.assertIs(self.get(cache), first)
+        self.assertEqual(len(self.calls), 1)
+        self.assertEqual(first.index[-1], self.idx[self.idx <= self.now][-1])
+        self.assertEqual(len(first), 31)  # the partial bar at the window start, 29 full ones, the open one
+        self.assertEqual({k: cache.stats()[k] for k in ('hits', 'misses', 'refreshes')},
+                         {'hits': 1, 'misses': 1, 'refreshes': 0})
+
+    def test_refresh_loads_only_the_tail(self):
+        import pandas as pd
+        from analytics.cache import SeriesCache
+        cache = SeriesCache()
+        first = self.get(cache)
+        open_bar = first.index[-1]
+        # the open bar moves on, two more bars arrive, and the TTL (one bar) runs out
+        self.close[open_bar] = -1.0
+        self.now += pd.Timedelta(minutes=2)
+        self.clock += 60
+        second = self.get(cache)
+        self.assertEqual(self.calls[-1], open_bar.to_pydatetime())
+        # same frame as a cold load of the whole window
+        pd.testing.assert_frame_equal(second, self.get(SeriesCache()))
+        self.assertEqual(second.loc[open_bar, 'close'], -1.0)
+        self.assertEqual(second.index[0], first.index[2])  # trimmed from the left
+        self.assertEqual(cache.stats()['refreshes'], 1)
+
+    def test_ttl_is_capped_by_max_ttl(self):
+        from datetime import timedelta
+        from analytics.cache import SeriesCache
+        cache = SeriesCache(max_ttl=5)
+        key = ('btcusdt', '1h', 30, 'stub')
+        cache.get(key, 3600, timedelta(hours=2), self.load)
+        self.clock += 4
+        cache.get(key, 3600, timedelta(hours=2), self.load)
+        self.clock += 2
+        cache.get(key, 3600, timedelta(hours=2), self.load)
+        self.assertEqual(len(self.calls), 2)
+        self.assertEqual(cache.stats()['refreshes'], 1)
+
+    def test_least_recently_used_entry_is_evicted(self):
+        from analytics.cache import SeriesCache
+        cache = SeriesCache(max_entries=2)
+        self.get(cache, 'a')
+        self.get(cache, 'b')
+        self.get(cache, 'a')  # hit, so 'b' is now the oldest
+        self.get(cache, 'c')
+        self.assertEqual(len(self.calls), 3)
+        self.get(cache, 'a')
+        self.assertEqual(len(self.calls), 3)
+        self.get(cache, 'b')
+        self.assertEqual(len(self.calls), 4)
+        stats = cache.stats()
+        self.assertEqual((stats['entries'], stats['evictions'], stats['misses'], stats['hits']), (2, 2, 4, 2))
+
+
+@skipUnless(os.getenv("METRICS", "1") == "1", "metrics are disabled (METRICS=0)")
+class MetricsExpositionTests(SimpleTestCase):
+    """MetricsMiddleware observations as scraped from GET /api/metrics in the Prometheus text format."""
+
+    def scrape(self):
+        import re
+        r = self.client.get('/api/metrics')
+        self.assertEqual(r.status_code, 200)
+        self.assertEqual(r['Content-Type'], 'text/plain; version=0.0.4; charset=utf-8')
+        samples, types = {}, {}
+        for line in r.content.decode().splitlines():
+            if line.startswith('# TYPE '):
+                _, _, name, kind = line.split(' ')
+                types[name] = kind
+            elif line and not line.startswith('#'):
+                m = re.fullmatch(r'([a-zA-Z_:][a-zA-Z0-9_:]*(?:\{.*\})?) (\S+)', line)
+                self.assertIsNotNone(m, line)
+                samples[m.group(1)] = float(m.group(2))
+        return samples, types
+
+    def test_request_is_counted_in_the_route_histogram(self):
+        name = 'gemscap_http_request_duration_seconds'
+        labels = 'route="api/ohlc",method="GET",status="400"'
+        before, _ = self.scrape()
+        for _ in range(2):
+            self.assertEqual(self.client.get('/api/ohlc').status_code, 400)
+        self.assertEqual(self.client.get('/no/such/path').status_code, 404)
+        after, types = self.scrape()
+        self.assertEqual(types[name], 'histogram')
+        self.assertEqual(after[f'{name}_count{{{labels}}}'] - before.get(f'{name}_count{{{labels}}}', 0), 2)
+        self.assertGreater(after[f'{name}_sum{{{labels}}}'], before.get(f'{name}_sum{{{labels}}}', 0))
+        buckets = [v for k, v in after.items() if k.startswith(f'{name}_bucket{{{labels},le=')]
+        self.assertEqual(buckets, sorted(buckets))
+        self.assertEqual(after[f'{name}_bucket{{{labels},le="+Inf"}}'], after[f'{name}_count{{{labels}}}'])
+        self.assertIn(f'{name}_count{{route="unmatched",method="GET",status="404"}}', after)
+
+    def test_timed_call_histogram_and_rows_counter(self):
+        from analytics.metrics import observe_call
+        observe_call('exposition_test', 0.003, rows=7)
+        observe_call('exposition_test', 0.2, rows=5)
+        samples, types = self.scrape()
+        self.assertEqual(types['gemscap_call_rows_total'], 'counter')
+        self.assertEqual(samples['gemscap_call_rows_total{fn="exposition_test"}'], 12)
+        hist = 'gemscap_call_duration_seconds'
+        self.assertEqual([samples[f'{hist}_bucket{{fn="exposition_test",le="{le}"}}'] for le in
+                          ('0.0025', '0.005', '0.1', '0.25', '+Inf')], [0, 1, 1, 2, 2])
+        self.assertAlmostEqual(samples[f'{hist}_sum{{fn="exposition_test"}}'], 0.203)
+        self.assertEqual(samples[f'{hist}_count{{fn="exposition_test"}}'], 2)
+
+
+class CombinedStreamTests(SimpleTestCase):
+    """Symbol grouping, sharding and reconnect backoff of the collector's combined streams."""
+
+    def test_groups_shards_and_urls(self):
+        from collector.streams import MAX_STREAMS_PER_CONN, combined_url, group_symbols, shard_groups
+        symbols = [f"s{i}usdt" for i in range(450)]
+        self.assertEqual([len(g) for g in group_symbols(symbols, 100)], [100] * 4 + [50])
+        self.assertEqual([len(g) for g in group_symbols(symbols, 1000)], [MAX_STREAMS_PER_CONN] * 2 + [50])
+        groups = group_symbols(symbols, 100)
+        shards = shard_groups(groups, 2)
+        self.assertEqual(shards, [groups[0::2], groups[1::2]])
+        self.assertEqual(len(shard_groups(groups[:1], 4)), 1)
+        self.assertEqual(combined_url(['btcusdt', 'ethusdt'], 'ws://host/'),
+                         'ws://host/stream?streams=btcusdt@trade/ethusdt@trade')
+
+    def test_backoff_delay_is_jittered_below_the_capped_exponential(self):
+        import random
+        from collector.streams import backoff_delay
+        random.seed(3)
+        for attempt in range(12):
+            ceiling = min(30, 0.5 * 2 ** attempt)
+            delays = [backoff_delay(attempt, base=0.5, cap=30) for _ in range(200)]
+            self.assertTrue(all(0 <= d <= ceiling for d in delays), attempt)
+            # full jitter: spread over the whole range, not bunched at the ceiling
+            self.assertLess(min(delays), 0.1 * ceiling)
+            self.assertGreater(max(delays), 0.9 * ceiling)
+
+    def test_reconnects_back_off_and_reset_after_a_session(self):
+        import asyncio
+        from collector import collector
+        from collector.storage import MemoryTickStore
+        from collector.writer import TickWriter
+        trade = b'{"stream":"btcusdt@trade","data":{"e":"trade","E":2,"T":1,"s":"BTCUSDT","p":"100.5","q":"0.1"}}'
+        # connect fails twice, delivers one message, fails once more, then the test stops the loop
+        script = [OSError("refused"), OSError("refused"), [trade], OSError("refused")]
+        sleeps, urls = [], []
+
+        class Session:
+            def __init__(self, messages):
+                self.messages = messages
+
+            async def __aenter__(self):
+                return self
+
+            async def __aexit__(self, *exc):
+                return False
+
+            def __aiter__(self):
+                return self._iter()
+
+            async def _iter(self):
+                for m in self.messages:
+                    yield m
+
+        def connect(url, **kw):
+            urls.append(url)
+            step = script.pop(0)
+            if isinstance(step, Exception):
+                raise step
+            return Session(step)
+
+        async def sleep(delay):
+            sleeps.append(delay)
+            if not script:
+                raise asyncio.CancelledError
+
+        async def run():
+            writer = TickWriter(MemoryTickStore())
+            stats = {}
+            with self.assertRaises(asyncio.CancelledError):
+                await collector.handle_group(['btcusdt'], writer, stats, url='ws://test')
+            return writer, stats
+
+        with mock.patch.object(collector.websockets, 'connect', connect), \
+                mock.patch.object(collector.asyncio, 'sleep', sleep), \
+                mock.patch.object(collector, 'backoff_delay', side_effect=lambda attempt: 0.5 * 2 ** attempt), \
+                mock.patch('builtins.print'):
+            writer, stats = asyncio.run(run())
+        # attempts 0, 1, then the successful session resets the count
+        self.assertEqual(sleeps, [0.5, 1.0, 0.5, 1.0])
+        self.assertEqual(urls, ['ws://test'] * 4)
+        self.assertEqual(stats, {'btcusdt..btcusdt(1)': {'messages': 1, 'errors': 0, 'reconnects': 4}})
+        self.assertEqual(list(writer._queue), [('btcusdt', 1, 100.5, 0.1)])
+
+
+class TradeDecodeTests(SimpleTestCase):
+    """collector/decode.py: every JSON backend decodes the same records, which round-trip to documents."""
+    MESSAGES = [
+        b'{"stream":"btcusdt@trade","data":{"e":"trade","E":1735689600123,"T":1735689600120,'
+        b'"s":"BTCUSDT","t":1,"p":"93512.40","q":"0.004","X":"MARKET","m":true}}',
+        # a single-stream payload without the combined-stream envelope
+        b'{"e":"trade","E":1735689600200,"T":1735689600199,"s":"ETHUSDT","p":"3350.1","q":"1.25"}',
+        # no T: the event time is used
+        b'{"e":"trade","E":1735689600300,"s":"ETHUSDT","p":"3350.2","q":"0.5"}',
+        b'{"stream":"btcusdt@aggTrade","data":{"e":"aggTrade","E":1,"s":"BTCUSDT","p":"1","q":"1"}}',
+    ]
+    EXPECTED = [('btcusdt', 1735689600120, 93512.40, 0.004), ('ethusdt', 1735689600199, 3350.1, 1.25),
+                ('ethusdt', 1735689600300, 3350.2, 0.5), None]
+
+    def test_backends_agree(self):
+        from collector.decode import make_decoder
+        for backend in ('msgspec', 'orjson', 'json'):
+            with self.subTest(backend=backend):
+                name, decode = make_decoder(backend)
+                self.assertEqual(name, backend)
+                self.assertEqual([decode(m) for m in self.MESSAGES], self.EXPECTED)
+                self.assertEqual(decode(self.MESSAGES[1].decode()), self.EXPECTED[1])
+        with self.assertRaises(ValueError):
+            make_decoder('yaml')
+
+    def test_documents_round_trip_through_bson(self):
+        import bson
+        from bson.codec_options import CodecOptions, DatetimeConversion
+        from collector.decode import to_documents
+        recs = [r for r in self.EXPECTED if r is not None]
+        docs = to_documents(recs + [{'symbol': 'raw', 'ts': 1}])
+        self.assertEqual(docs[-1], {'symbol': 'raw', 'ts': 1})
+        options = CodecOptions(datetime_conversion=DatetimeConversion.DATETIME_MS)
+        back = [bson.decode(bson.encode(d), options) for d in docs[:-1]]
+        self.assertEqual([(d['symbol'], int(d['ts']), d['price'], d['qty']) for d in back], recs)
+
+    def test_naive_utc_datetimes_without_datetime_ms(self):
+        from datetime import datetime
+        from collector import decode
+        with mock.patch.object(decode, 'DatetimeMS', None):
+            doc = decode.to_documents([self.EXPECTED[0]])[0]
+        self.assertEqual(doc['ts'], datetime(2025, 1, 1, 0, 0, 0, 120000))
+
+    def test_decode_batch_columns(self):
+        from collector.decode import decode_batch
+        cols = decode_batch(self.MESSAGES)
+        self.assertEqual(len(cols), 3)
+        arrays = cols.to_arrays()
+        self.assertEqual(list(arrays['symbol']), ['btcusdt', 'ethusdt', 'ethusdt'])
+        np.testing.assert_array_equal(arrays['ts_ms'], [r[1] for r in self.EXPECTED[:3]])
+        self.assertEqual((arrays['ts_ms'].dtype, arrays['price'].dtype), (np.int64, np.float64))
+
+
+class MongoClientTests(SimpleTestCase):
+    """analytics.db keeps one client per process and never reuses one inherited across fork()."""
+
+    def setUp(self):
+        from analytics import db
+        self.created = []
+        created = self.created
+
+        class FakeClient:
+            def __init__(self, uri, **kw):
+                self.kw = kw
+                self.closed = False
+                created.append(self)
+
+            def close(self):
+                self.closed = True
+
+        for p in (mock.patch.object(db, '_client', None), mock.patch.object(db, '_client_pid', None),
+                  mock.patch.object(db.pymongo, 'MongoClient', FakeClient)):
+            p.start()
+            self.addCleanup(p.stop)
+
+    def test_one_pooled_client_per_process(self):
+        from analytics import db
+        client = db.get_client()
+        self.assertIs(db.get_client(), client)
+        self.assertEqual(client.kw['maxPoolSize'], db.MAX_POOL_SIZE)
+        # a client recorded for another pid (inherited without the fork hook) is replaced, not reused
+        db._client_pid = -1
+        fresh = db.get_client()
+        self.assertIsNot(fresh, client)
+        self.assertFalse(client.closed)
+        db.close_client()
+        self.assertTrue(fresh.closed)
+        self.assertIsNone(db._client)
+
+    @skipUnless(hasattr(os, 'fork'), "needs fork()")
+    def test_forked_child_builds_its_own_client(self):
+        from analytics import db
+        parent = db.get_client()
+        r, w = os.pipe()
+        pid = os.fork()
+        if pid == 0:  # child: report and leave without running any test machinery
+            try:
+                inherited = db._client is None and db._client_pid is None
+                child = db.get_client()
+                ok = inherited and child is not parent and db._client_pid == os.getpid() and not parent.closed
+                os.write(w, b'1' if ok else b'0')
+            finally:
+                os._exit(0)
+        os.close(w)
+        with os.fdopen(r, 'rb') as f:
+            self.assertEqual(f.read(), b'1')
+        os.waitpid(pid, 0)
+        self.assertIs(db.get_client(), parent)
@@ -1,10 +1,24 @@
 from django.urls import path
-from . import views
+from . import async_views, views
 
 urlpatterns = [
     path('pair_analytics', views.pair_analytics, name='pair_analytics'),
     path('ohlc', views.get_ohlc, name='ohlc'),
     path('pair_cointegration', views.pair_cointegration, name='pair_cointegration'),
     path('corr_heatmap', views.correlation_heatmap, name='corr_heatmap'),
+    path('pair_scan', views.pair_scan, name='pair_scan'),
+    path('backtest', views.backtest, name='backtest'),
+    path('cache_stats', views.cache_stats, name='cache_stats'),
+    path('cache_invalidate', views.cache_invalidate, name='cache_invalidate'),
+    path('metrics', views.metrics, name='metrics'),
+    # async variants for ASGI servers
+    path('async/pair_analytics', async_views.pair_analytics, name='async_pair_analytics'),
+    path('async/ohlc', async_views.get_ohlc, name='async_ohlc'),
+    path('async/pair_cointegration', async_views.pair_cointegration, name='async_pair_cointegration'),
+    path('async/corr_heatmap', async_views.correlation_heatmap, name='async_corr_heatmap'),
+    # server-sent event streams (ASGI only)
+    path('stream/bars', async_views.stream_bars, name='stream_bars'),
+    path('stream/pair', async_views.stream_pair, name='stream_pair'),
+    path('stream/stats', async_views.stream_stats, name='stream_stats'),
 
 ]
@@ -1,68 +1,165 @@
-from rest_framework.decorators import api_view
+from django.http import HttpResponse
+from rest_framework.decorators import api_view, content_negotiation_class, renderer_classes
+from rest_framework.renderers import BrowsableAPIRenderer
 from rest_framework.response import Response
-from analytics.analytics import engle_granger_test, half_life, spread_and_zscore, correlation_matrix
-from analytics.analytics import compute_pair_analytics, resample_ohlc, fetch_ticks
+from analytics.analytics import correlation_matrix
+from analytics.analytics import compute_pair_analytics, correlation_top, pair_cointegration_from_bars
+from analytics.bars import get_bars, BAR_SOURCE
+from analytics.cache import pair_cache, series_cache
+from analytics.hedge import HEDGE_METHODS
+from analytics.metrics import CONTENT_TYPE, REGISTRY
+from analytics.scanner import scan_pairs, RANK_KEYS
+from analytics import backtest as bt
+from .renderers import (ArrowRenderer, FastJSONRenderer, MsgpackRenderer, SeriesNegotiation, corr_params,
+                        format_available, frame_payload, series_params, since_minutes, trim)
+
+# bar/series endpoints: JSON (records or columns), msgpack or Arrow IPC; see api/renderers.py
+SERIES_RENDERERS = [r for r in (FastJSONRenderer, MsgpackRenderer, ArrowRenderer, BrowsableAPIRenderer)
+                    if format_available(r.format)]
 
 @api_view(['GET'])
 def pair_analytics(request):
     sy = request.GET.get('y')
     sx = request.GET.get('x')
     tf = request.GET.get('tf', '1m')
-    window = int(request.GET.get('window', 60))
+    source = request.GET.get('source', BAR_SOURCE)
+    hedge = request.GET.get('hedge', 'static')
     if not sy or not sx:
         return Response({"error": "provide y and x symbol params"}, status=400)
-    res = compute_pair_analytics(sy, sx, timeframe=tf, window=window)
+    if hedge not in HEDGE_METHODS:
+        return Response({"error": f"hedge must be one of {', '.join(HEDGE_METHODS)}"}, status=400)
+    try:
+        window = int(request.GET.get('window', 60))
+        res = compute_pair_analytics(sy, sx, timeframe=tf, window=window, source=source, hedge=hedge)
+    except ValueError as e:
+        return Response({"error": str(e)}, status=400)
     return Response(res)
 
 @api_view(['GET'])
+@renderer_classes(SERIES_RENDERERS)
+@content_negotiation_class(SeriesNegotiation)
 def get_ohlc(request):
+    # optional: layout=records|columns, since=<epoch ms or ISO ts> (bars strictly after), limit (default 500)
     s = request.GET.get('symbol')
     tf = request.GET.get('tf', '1m')
+    source = request.GET.get('source', BAR_SOURCE)
     if not s:
         return Response({"error": "symbol missing"}, status=400)
-    df = resample_ohlc(fetch_ticks(s, since_minutes=6*60), timeframe=tf)
-    df = df.reset_index()
-    out = df.tail(500).to_dict(orient='records')
-    return Response(out)
+    try:
+        columns, since, limit = series_params(request.GET, request.accepted_renderer.format)
+        df = get_bars(s, timeframe=tf, since_minutes=since_minutes(since, 6*60), source=source)
+    except ValueError as e:
+        return Response({"error": str(e)}, status=400)
+    return Response(frame_payload(trim(df, since, limit), columns))
 
 @api_view(['GET'])
+@renderer_classes(SERIES_RENDERERS)
+@content_negotiation_class(SeriesNegotiation)
 def pair_cointegration(request):
     x = request.GET.get('x')
     y = request.GET.get('y')
     tf = request.GET.get('tf', '1m')
+    source = request.GET.get('source', BAR_SOURCE)
+    hedge = request.GET.get('hedge', 'static')
     if not x or not y:
         return Response({"error": "provide x and y"}, status=400)
-    # fetch resampled close series
-    df_x = resample_ohlc(fetch_ticks(x, since_minutes=24*60), timeframe=tf)
-    df_y = resample_ohlc(fetch_ticks(y, since_minutes=24*60), timeframe=tf)
-    common = df_x.index.intersection(df_y.index)
-    if len(common) < 20:
-        return Response({"error": "not enough overlapping data"}, status=400)
-    series_x = df_x.loc[common]['close']
-    series_y = df_y.loc[common]['close']
-    coint = engle_granger_test(series_y, series_x)
-    # compute spread and z-score
-    sp = spread_and_zscore(series_y, series_x, window=int(request.GET.get('window',60)))
-    halfl = half_life(sp['spread'])
-    # prepare small serializable sample of zscore and spread
-    z_sample = sp['zscore'].dropna().tail(500).astype(float).to_list()
-    spread_sample = sp['spread'].dropna().tail(500).astype(float).to_list()
-    return Response({
-        'cointegration': coint,
-        'beta': sp['beta'],
-        'alpha': sp['alpha'],
-        'half_life': halfl,
-        'zscore_series': z_sample,
-        'spread_series': spread_sample
-    })
+    if hedge not in HEDGE_METHODS:
+        return Response({"error": f"hedge must be one of {', '.join(HEDGE_METHODS)}"}, status=400)
+    try:
+        columns, since, limit = series_params(request.GET, request.accepted_renderer.format)
+        window = int(request.GET.get('window', 60))
+        # fetch resampled close series
+        df_x = get_bars(x, timeframe=tf, since_minutes=24*60, source=source)
+        df_y = get_bars(y, timeframe=tf, since_minutes=24*60, source=source)
+    except ValueError as e:
+        return Response({"error": str(e)}, status=400)
+    out = pair_cointegration_from_bars(df_y, df_x, window=window, hedge=hedge, limit=limit, since=since,
+                                       columns=columns, cache_key=pair_cache.key(y, x, tf, window, hedge, source))
+    if 'error' in out:
+        return Response(out, status=400)
+    return Response(out)
 
 @api_view(['POST'])
 def correlation_heatmap(request):
     # expects JSON body { "symbols": ["btcusdt","ethusdt"], "tf":"1m" }
+    # optional: "mode": "rolling"|"ewm", "halflife": bars, "top": k, "symbol": s, "matrix": false
+    try:
+        symbols, kwargs, top, symbol = corr_params(request.data)
+        out = {}
+        if request.data.get('matrix', True):
+            out['corr'] = correlation_matrix(symbols, **kwargs)
+        if top:
+            out['top'] = correlation_top(symbols, k=top, symbol=symbol, **kwargs)
+    except ValueError as e:
+        return Response({"error": str(e)}, status=400)
+    return Response(out)
+
+@api_view(['POST'])
+def pair_scan(request):
+    # expects JSON body { "symbols": [...], "tf": "1m", "since_minutes": 1440, "rank": "pvalue", "top": 50 }
     body = request.data
     symbols = body.get('symbols', [])
-    tf = body.get('tf', '1m')
-    if not symbols:
-        return Response({"error":"symbols required"}, status=400)
-    corr = correlation_matrix(symbols, timeframe=tf)
-    return Response({'corr': corr})
+    rank = body.get('rank', 'pvalue')
+    if len(symbols) < 2:
+        return Response({"error": "at least two symbols required"}, status=400)
+    if rank not in RANK_KEYS:
+        return Response({"error": f"rank must be one of {', '.join(RANK_KEYS)}"}, status=400)
+    try:
+        res = scan_pairs(symbols, timeframe=body.get('tf', '1m'),
+                         since_minutes=int(body.get('since_minutes', 24*60)),
+                         source=body.get('source', BAR_SOURCE), min_corr=float(body.get('min_corr', 0.0)),
+                         rank_by=rank, top=int(body.get('top', 50)))
+    except ValueError as e:
+        return Response({"error": str(e)}, status=400)
+    return Response(res)
+
+@api_view(['POST'])
+def backtest(request):
+    # expects JSON body { "y": "ethusdt", "x": "btcusdt", "tf": "1m", "since_minutes": 1440,
+    #   "windows": [30, 60], "entries": [1.5, 2], "exits": [0, 0.5], "hedge": "rolling", "fee_bps": 1,
+    #   "delay": 1, "rank": "sharpe", "top": 20 }
+    body = request.data
+    y, x = body.get('y'), body.get('x')
+    hedge = body.get('hedge', 'rolling')
+    rank = body.get('rank', 'sharpe')
+    if not y or not x:
+        return Response({"error": "provide y and x"}, status=400)
+    if hedge not in bt.BACKTEST_HEDGES:
+        return Response({"error": f"hedge must be one of {', '.join(bt.BACKTEST_HEDGES)}"}, status=400)
+    if rank not in bt.RANK_KEYS:
+        return Response({"error": f"rank must be one of {', '.join(bt.RANK_KEYS)}"}, status=400)
+    try:
+        windows = [int(w) for w in body.get('windows', [60])]
+        entries = [float(v) for v in body.get('entries', [2.0])]
+        exits = [float(v) for v in body.get('exits', [0.0])]
+        if not windows or min(windows) < 2:
+            raise ValueError("windows must be integers >= 2")
+        res = bt.backtest_pair(y, x, timeframe=body.get('tf', '1m'),
+                               since_minutes=int(body.get('since_minutes', 24*60)),
+                               source=body.get('source', BAR_SOURCE), windows=windows, entries=entries, exits=exits,
+                               hedge=hedge, fee_bps=float(body.get('fee_bps', 1.0)), delay=int(body.get('delay', 1)),
+                               rank_by=rank, top=int(body.get('top', 20)))
+    except (TypeError, ValueError) as e:
+        return Response({"error": str(e)}, status=400)
+    return Response(res, status=400 if 'error' in res else 200)
+
+@api_view(['GET'])
+def cache_stats(request):
+    return Response({'series': series_cache.stats(), 'pair': pair_cache.stats()})
+
+@api_view(['POST'])
+def cache_invalidate(request):
+    # expects JSON body { "symbol": "btcusdt" (optional, default all), "cache": "series"|"pair"|"all" }
+    symbol = request.data.get('symbol')
+    which = request.data.get('cache', 'all')
+    if which not in ('series', 'pair', 'all'):
+        return Response({"error": "cache must be one of series, pair, all"}, status=400)
+    if which in ('series', 'all'):
+        series_cache.invalidate(symbol)
+    if which in ('pair', 'all'):
+        pair_cache.invalidate(symbol)
+    return Response({'invalidated': which, 'symbol': symbol})
+
+def metrics(request):
+    # Prometheus text format; plain Django view so no renderer negotiation is involved
+    return HttpResponse(REGISTRY.render(), content_type=CONTENT_TYPE)
@@ -0,0 +1,162 @@
+# benchmarks/bench_api.py
+"""
+Load test: the sync DRF views (/api/<endpoint>) versus their async
+counterparts (/api/async/<endpoint>) on the same ASGI server.
+
+Each run keeps --concurrency keep-alive connections busy for --seconds and
+reports requests/s and p50/p99 latency per endpoint and variant. Point
+--url at a running server, or pass --serve to start uvicorn here. With
+--seed the server reads synthetic bars from freshly written shared bar
+rings (source=shared), so no MongoDB is needed.
+
+    python -m benchmarks.bench_api --serve --seed --concurrency 32 --seconds 10
+"""
+import argparse
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from urllib.parse import urlsplit
+
+import numpy as np
+
+ENDPOINTS = {
+    'ohlc': ('GET', 'ohlc?symbol=btcusdt&tf=1m', None),
+    'pair_analytics': ('GET', 'pair_analytics?y=ethusdt&x=btcusdt&tf=1m&window=60', None),
+    'pair_cointegration': ('GET', 'pair_cointegration?y=ethusdt&x=btcusdt&tf=1m&window=60', None),
+    'corr_heatmap': ('POST', 'corr_heatmap', {'symbols': ['btcusdt', 'ethusdt', 'solusdt'], 'tf': '1m'}),
+}
+
+
+def seed_rings(root, symbols=('btcusdt', 'ethusdt', 'solusdt'), bars=2000):
+    from analytics.shared_bars import SharedBarWriter
+    writer = SharedBarWriter(capacity=bars, root=root)
+    rng = np.random.default_rng(0)
+    now = int(time.time() * 1000)
+    start = now - now % 60000 - (bars - 1) * 60000
+    base = np.cumsum(rng.normal(0, 1, bars)) + 1000
+    for k, s in enumerate(symbols):
+        close = base * (1 + 0.5 * k) + np.cumsum(rng.normal(0, 0.5, bars))
+        for i in range(bars):
+            c = float(close[i])
+            writer.write(60, s, (start + i * 60000, c, c + 1, c - 1, c, 1.0, 10))
+    writer.close()
+
+
+async def _read_response(reader):
+    status = int((await reader.readline()).split()[1])
+    headers = {}
+    while True:
+        line = await reader.readline()
+        if line in (b'\r\n', b''):
+            break
+        k, v = line.decode('latin-1').split(':', 1)
+        headers[k.strip().lower()] = v.strip()
+    if 'content-length' in headers:
+        await reader.readexactly(int(headers['content-length']))
+    elif headers.get('transfer-encoding') == 'chunked':
+        while True:
+            size = int((await reader.readline()).strip(), 16)
+            await reader.readexactly(size + 2)
+            if size == 0:
+                break
+    return status
+
+
+async def _worker(host, port, method, path, body, deadline, latencies, errors):
+    reader, writer = await asyncio.open_connection(host, port)
+    payload = json.dumps(body).encode() if body is not None else b''
+    head = f"{method} {path} HTTP/1.1\r\nHost: {host}\r\nConnection: keep-alive\r\n"
+    if body is not None:
+        head += f"Content-Type: application/json\r\nContent-Length: {len(payload)}\r\n"
+    request = (head + "\r\n").encode() + payload
+    try:
+        while time.perf_counter() < deadline:
+            t0 = time.perf_counter()
+            writer.write(request)
+            await writer.drain()
+            status = await _read_response(reader)
+            latencies.append(time.perf_counter() - t0)
+            if status != 200:
+                errors.append(status)
+    finally:
+        writer.close()
+
+
+async def run_load(url, method, body, concurrency, seconds):
+    parts = urlsplit(url)
+    path = parts.path + (f"?{parts.query}" if parts.query else '')
+    latencies, errors = [], []
+    deadline = time.perf_counter() + seconds
+    t0 = time.perf_counter()
+    await asyncio.gather(*(_worker(parts.hostname, parts.port or 80, method, path, body, deadline, latencies, errors)
+                           for _ in range(concurrency)))
+    elapsed = time.perf_counter() - t0
+    lat = np.array(latencies) * 1000.0
+    return {
+        'requests': len(lat),
+        'errors': len(errors),
+        'rps': len(lat) / elapsed,
+        'p50_ms': float(np.percentile(lat, 50)) if len(lat) else None,
+        'p99_ms': float(np.percentile(lat, 99)) if len(lat) else None,
+    }
+
+
+def wait_ready(host, port, timeout=30.0):
+    import socket
+    t_end = time.time() + timeout
+    while time.time() < t_end:
+        try:
+            socket.create_connection((host, port), timeout=1).close()
+            return
+        except OSError:
+            time.sleep(0.2)
+    raise RuntimeError(f"server on {host}:{port} did not come up")
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser()
+    ap.add_argument('--url', default='http://127.0.0.1:8765/api/')
+    ap.add_argument('--endpoints', default=','.join(ENDPOINTS))
+    ap.add_argument('--concurrency', type=int, default=32)
+    ap.add_argument('--seconds', type=float, default=10.0)
+    ap.add_argument('--serve', action='store_true', help='start uvicorn on --url host:port for the run')
+    ap.add_argument('--workers', type=int, default=1, help='uvicorn worker processes with --serve')
+    ap.add_argument('--seed', action='store_true', help='serve synthetic bars from shared rings (source=shared)')
+    args = ap.parse_args()
+
+    base = args.url.rstrip('/') + '/'
+    server = None
+    extra = ''
+    if args.serve:
+        env = dict(os.environ)
+        if args.seed:
+            root = tempfile.mkdtemp(prefix='bench_api_')
+            seed_rings(root)
+            env.update(SHARED_BARS_DIR=root, SHARED_BARS_CAPACITY='2000', BAR_SOURCE='shared',
+                       BAR_TIMEFRAMES='1m')
+            extra = '&source=shared'
+        u = urlsplit(base)
+        server = subprocess.Popen([sys.executable, '-m', 'uvicorn', 'backend_django.asgi:application',
+                                   '--host', u.hostname, '--port', str(u.port), '--workers', str(args.workers),
+                                   '--log-level', 'warning', '--no-access-log'], env=env)
+        wait_ready(u.hostname, u.port)
+    try:
+        print(f"{'endpoint':>20} {'variant':>6} {'req/s':>9} {'p50 ms':>9} {'p99 ms':>9} {'errors':>7}")
+        for name in args.endpoints.split(','):
+            method, path, body = ENDPOINTS[name]
+            if extra and method == 'GET':
+                path += extra
+            if body is not None and extra:
+                body = dict(body, source='shared')
+            for variant, prefix in (('sync', ''), ('async', 'async/')):
+                r = asyncio.run(run_load(base + prefix + path, method, body, args.concurrency, args.seconds))
+                print(f"{name:>20} {variant:>6} {r['rps']:>9.1f} {r['p50_ms'] or 0:>9.2f} {r['p99_ms'] or 0:>9.2f} "
+                      f"{r['errors']:>7}")
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait()
@@ -0,0 +1,117 @@
+# benchmarks/bench_backtest.py
+"""
+Vectorised pair backtests (analytics/backtest.py) against a bar-by-bar loop.
+
+A synthetic cointegrated pair is generated. One parameter set is first
+replayed by a plain Python loop (rolling OLS and z-score per bar, the
+zscore_signals state machine, delayed fills, fees), and its equity curve
+must match backtest() to 1e-9. Then a (window, entry, exit) grid is timed
+four ways: the loop per combination, vectorised in-process, vectorised on
+the process pool, and re-run from the disk cache.
+
+    python -m benchmarks.bench_backtest --bars 20000 --workers 4
+"""
+import argparse
+import shutil
+import tempfile
+import time
+
+import numpy as np
+
+from analytics.backtest import backtest, grid_search
+
+WINDOWS = [30, 60, 90, 120, 180, 240]
+ENTRIES = [1.5, 2.0, 2.5, 3.0]
+EXITS = [0.0, 0.5, 1.0]
+
+
+def make_pair(n, seed=0):
+    rng = np.random.default_rng(seed)
+    x = 100 + np.cumsum(rng.normal(0, 0.5, n))
+    noise = np.zeros(n)
+    for t in range(1, n):
+        noise[t] = 0.97 * noise[t - 1] + rng.normal(0, 0.3)
+    y = 5 + 1.5 * x + noise
+    return np.arange(n, dtype=np.int64) * 60000, y, x
+
+
+def loop_backtest(y, x, window, entry, exit, fee_bps=1.0, delay=1):
+    """Reference: every quantity computed bar by bar from the trailing data only."""
+    n = len(y)
+    spreads, beta_at, pos_at = [], [], []
+    position = 0
+    for t in range(n):
+        if t + 1 < window:
+            spreads.append(np.nan)
+            beta_at.append(0.0)
+            pos_at.append(0)
+            continue
+        ys, xs = y[t + 1 - window:t + 1], x[t + 1 - window:t + 1]
+        b = np.cov(xs, ys, bias=True)[0, 1] / xs.var()
+        a = ys.mean() - b * xs.mean()
+        spreads.append(y[t] - b * x[t] - a)
+        beta_at.append(b)
+        recent = np.array(spreads[max(0, t + 1 - window):t + 1])
+        z = np.nan if len(recent) < window or np.isnan(recent).any() else \
+            (recent[-1] - recent.mean()) / (recent.std() + 1e-12)
+        if not np.isnan(z):
+            if position == 0:
+                position = -1 if z > entry else (1 if z < -entry else 0)
+            elif position == 1 and z >= -exit:
+                position = 0
+            elif position == -1 and z <= exit:
+                position = 0
+        pos_at.append(position)
+    equity = np.zeros(n)
+    hy = hx = 0.0
+    total = 0.0
+    for t in range(n):
+        if t > 0:
+            total += hy * (y[t] - y[t - 1]) + hx * (x[t] - x[t - 1])
+        ny, nx = (pos_at[t - delay], -pos_at[t - delay] * beta_at[t - delay]) if t >= delay else (0.0, 0.0)
+        total -= (abs(ny - hy) * y[t] + abs(nx - hx) * x[t]) * fee_bps / 1e4
+        hy, hx = ny, nx
+        equity[t] = total
+    return equity
+
+
+def timed(fn):
+    t0 = time.perf_counter()
+    out = fn()
+    return time.perf_counter() - t0, out
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser()
+    ap.add_argument('--bars', type=int, default=20000)
+    ap.add_argument('--workers', type=int, default=4)
+    ap.add_argument('--loop-combos', type=int, default=3, help='combinations timed with the loop (extrapolated)')
+    args = ap.parse_args()
+
+    ts, y, x = make_pair(3000, seed=1)
+    for window, entry, exit in ((60, 2.0, 0.0), (30, 1.5, 0.5)):
+        ref = loop_backtest(y, x, window, entry, exit)
+        got = backtest(y, x, ts, window, entry, exit)['equity']
+        assert np.allclose(ref, got, rtol=0, atol=1e-9), f"equity differs for {(window, entry, exit)}"
+    print("parity ok")
+
+    ts, y, x = make_pair(args.bars)
+    combos = [(w, en, ex) for w in WINDOWS for en in ENTRIES for ex in EXITS if en > ex]
+    t_loop = sum(timed(lambda c=c: loop_backtest(y, x, *c))[0] for c in combos[:args.loop_combos])
+    t_loop *= len(combos) / args.loop_combos
+    cache_dir = tempfile.mkdtemp(prefix='bench_backtest_')
+    try:
+        t_serial, (rows, _) = timed(lambda: grid_search(y, x, ts, WINDOWS, ENTRIES, EXITS, workers=1, cache=False))
+        t_pool, (rows_pool, st) = timed(lambda: grid_search(y, x, ts, WINDOWS, ENTRIES, EXITS, workers=args.workers,
+                                                            cache_dir=cache_dir))
+        t_cached, (rows_cached, st_cached) = timed(lambda: grid_search(y, x, ts, WINDOWS, ENTRIES, EXITS,
+                                                                       workers=args.workers, cache_dir=cache_dir))
+    finally:
+        shutil.rmtree(cache_dir, ignore_errors=True)
+    assert rows == rows_pool == rows_cached
+    assert st_cached['computed'] == 0 and st_cached['cached'] == len(combos)
+    print(f"{len(combos)} combinations x {args.bars} bars")
+    print(f"  bar loop (extrapolated) {t_loop * 1e3:10.1f} ms")
+    print(f"  vectorised, 1 process   {t_serial * 1e3:10.1f} ms  {t_loop / t_serial:7.1f}x")
+    print(f"  vectorised, {st['workers']} workers   {t_pool * 1e3:10.1f} ms  {t_loop / t_pool:7.1f}x")
+    print(f"  from disk cache         {t_cached * 1e3:10.1f} ms  {t_loop / t_cached:7.1f}x")
@@ -0,0 +1,89 @@
+# benchmarks/bench_bars.py
+"""
+Parity and timing of the two bar sources: pandas resample_ohlc over raw ticks
+versus the server-side $group pipeline (analytics.bars.aggregate_ohlc).
+
+    python -m benchmarks.bench_bars --n 500000          # against MONGO_URI / MONGO_DB (default gemscap_bench)
+    python -m benchmarks.bench_bars --offline           # bucket semantics only, no server
+
+Every timeframe must give identical open/high/low/close and bar timestamps;
+volume is compared with a relative tolerance because the server sums doubles
+in a different order.
+"""
+import argparse
+import os
+import time
+from datetime import datetime
+
+os.environ.setdefault("MONGO_DB", "gemscap_bench")
+
+import numpy as np
+import pandas as pd
+
+from analytics.analytics import resample_ohlc, fetch_ticks
+from analytics.bars import aggregate_ohlc, timeframe_seconds, BAR_COLUMNS
+from analytics.db import get_collection
+from benchmarks.bench_fetch import make_docs, SYMBOL
+
+TIMEFRAMES = ['1s', '5s', '1m', '5m', '15m', '1h']
+
+
+def assert_parity(expected, got, tf):
+    assert list(expected.index) == list(got.index), f"{tf}: bar timestamps differ"
+    for col in ('open', 'high', 'low', 'close'):
+        assert np.array_equal(expected[col].to_numpy(), got[col].to_numpy()), f"{tf}: {col} differs"
+    assert np.allclose(expected['volume'].to_numpy(), got['volume'].to_numpy(), rtol=1e-12, atol=1e-9), \
+        f"{tf}: volume differs"
+
+
+def emulate_pipeline(ticks, tf):
+    """What the $group stage does: epoch-floored buckets, first/max/min/last/sum in ts order."""
+    ms = timeframe_seconds(tf) * 1000
+    ts = ticks.index.values.astype('datetime64[ms]').astype(np.int64)
+    bucket = ts - ts % ms
+    g = pd.DataFrame({'b': bucket, 'price': ticks['price'].to_numpy(), 'qty': ticks['qty'].to_numpy()}).groupby('b')
+    out = pd.DataFrame({'open': g['price'].first(), 'high': g['price'].max(), 'low': g['price'].min(),
+                        'close': g['price'].last(), 'volume': g['qty'].sum()})
+    out.index = pd.DatetimeIndex(pd.to_datetime(out.index, unit='ms'), name='ts')
+    return out[BAR_COLUMNS]
+
+
+def offline(n):
+    docs = make_docs(n, end=datetime(2025, 1, 1, 13, 7, 11))
+    ticks = pd.DataFrame({'price': [d['price'] for d in docs], 'qty': [d['qty'] for d in docs]},
+                         index=pd.DatetimeIndex(pd.to_datetime([int(d['ts']) for d in docs], unit='ms'), name='ts'))
+    for tf in TIMEFRAMES:
+        assert_parity(resample_ohlc(ticks, tf), emulate_pipeline(ticks, tf), tf)
+        print(f"{tf:4s} parity ok")
+
+
+def live(n, repeat):
+    coll = get_collection()
+    coll.delete_many({"symbol": SYMBOL})
+    docs = make_docs(n)
+    for i in range(0, n, 50000):
+        coll.insert_many(docs[i:i + 50000], ordered=False)
+    minutes = n * 10 / 60000 + 1
+    try:
+        for tf in TIMEFRAMES:
+            t0 = time.perf_counter()
+            for _ in range(repeat):
+                expected = resample_ohlc(fetch_ticks(SYMBOL, since_minutes=minutes), tf)
+            t_pandas = (time.perf_counter() - t0) / repeat
+            t0 = time.perf_counter()
+            for _ in range(repeat):
+                got = aggregate_ohlc(SYMBOL, tf, since_minutes=minutes)
+            t_mongo = (time.perf_counter() - t0) / repeat
+            assert_parity(expected, got, tf)
+            print(f"{tf:4s} bars={len(got):7d} pandas={t_pandas:.3f}s mongo={t_mongo:.3f}s parity ok")
+    finally:
+        coll.delete_many({"symbol": SYMBOL})
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser()
+    ap.add_argument('--n', type=int, default=500000)
+    ap.add_argument('--repeat', type=int, default=3)
+    ap.add_argument('--offline', action='store_true')
+    args = ap.parse_args()
+    offline(args.n) if args.offline else live(args.n, args.repeat)
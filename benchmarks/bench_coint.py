@@ -0,0 +1,55 @@
+# benchmarks/bench_coint.py
+"""
+statsmodels adfuller / coint versus analytics/coint.py.
+
+Timing per series length for autolag AIC, a capped search (--maxlag) and a
+fixed lag. Parity with statsmodels is tested in api/tests.py.
+
+    python -m benchmarks.bench_coint --lengths 250,1000,5000,20000
+"""
+import argparse
+import time
+import warnings
+
+import numpy as np
+import statsmodels.tsa.stattools as ts
+
+from analytics.coint import adf, engle_granger
+
+
+def ar_pair(rng, n):
+    x = np.cumsum(rng.normal(size=n)) + 100
+    phi = rng.uniform(0.5, 1.0)
+    e = np.zeros(n)
+    noise = rng.normal(size=n)
+    for i in range(1, n):
+        e[i] = phi * e[i - 1] + noise[i]
+    return 1.3 * x + e + 5, x, e
+
+
+def bench(fn, reps):
+    t0 = time.perf_counter()
+    for _ in range(reps):
+        fn()
+    return (time.perf_counter() - t0) / reps * 1000.0
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser()
+    ap.add_argument('--lengths', default='250,1000,5000,20000')
+    ap.add_argument('--maxlag', type=int, default=4, help='cap for the capped search and lag for fixed mode')
+    ap.add_argument('--reps', type=int, default=5)
+    args = ap.parse_args()
+    warnings.simplefilter('ignore')
+    rng = np.random.default_rng(0)
+    print(f"{'n':>7} {'mode':>10} {'sm adf':>9} {'np adf':>9} {'x':>6} {'sm coint':>9} {'np coint':>9} {'x':>6}  (ms)")
+    for n in [int(v) for v in args.lengths.split(',')]:
+        y, x, e = ar_pair(rng, n)
+        for mode, autolag, maxlag in (('aic', 'aic', None), ('aic capped', 'aic', args.maxlag),
+                                      ('fixed', None, args.maxlag)):
+            sm_adf = bench(lambda: ts.adfuller(e, autolag=autolag, maxlag=maxlag, result_object=False), args.reps)
+            np_adf = bench(lambda: adf(e, autolag=autolag, maxlag=maxlag), args.reps)
+            sm_eg = bench(lambda: ts.coint(y, x, autolag=autolag, maxlag=maxlag), args.reps)
+            np_eg = bench(lambda: engle_granger(y, x, autolag=autolag, maxlag=maxlag), args.reps)
+            print(f"{n:>7} {mode:>10} {sm_adf:>9.2f} {np_adf:>9.2f} {sm_adf / np_adf:>6.1f} "
+                  f"{sm_eg:>9.2f} {np_eg:>9.2f} {sm_eg / np_eg:>6.1f}")
@@ -0,0 +1,61 @@
+# benchmarks/bench_collector.py
+"""
+Offline collector throughput: replays trades from a local fake websocket
+server through combined-stream connections into an in-memory store.
+
+    python -m benchmarks.bench_collector --symbols 200 --trades 200000
+"""
+import argparse
+import asyncio
+import time
+
+from websockets.asyncio.server import serve
+
+from collector.collector import handle_group
+from collector.replay_server import make_handler, synthetic_trades, load_recording
+from collector.storage import MemoryTickStore
+from collector.streams import group_symbols, combined_url
+from collector.writer import TickWriter
+
+
+async def run(symbols, trades, per_conn, port):
+    store = MemoryTickStore()
+    writer = TickWriter(store)
+    groups = group_symbols(symbols, per_conn)
+    expected = sum(len([t for t in trades if t['s'].lower() in set(g)]) or len(trades) for g in groups)
+    conn_stats = {}
+    async with serve(make_handler(trades, loops=1), '127.0.0.1', port, max_size=None):
+        base = f"ws://127.0.0.1:{port}"
+        flusher = asyncio.create_task(writer.run())
+        t0 = time.perf_counter()
+        readers = [asyncio.create_task(handle_group(g, writer, conn_stats, url=combined_url(g, base)))
+                   for g in groups]
+        while writer.stats.enqueued + writer.stats.dropped < expected:
+            await asyncio.sleep(0.01)
+        elapsed = time.perf_counter() - t0
+        for r in readers:
+            r.cancel()
+        writer.stop()
+        await flusher
+    return {
+        'symbols': len(symbols),
+        'connections': len(groups),
+        'messages': expected,
+        'seconds': round(elapsed, 3),
+        'msgs_per_sec': round(expected / elapsed),
+        'stored': store.count(),
+        'writer': writer.snapshot(),
+    }
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser()
+    ap.add_argument('--symbols', type=int, default=200)
+    ap.add_argument('--trades', type=int, default=200000)
+    ap.add_argument('--file', help='recorded trades (JSON lines) instead of synthetic ones')
+    ap.add_argument('--per-conn', type=int, default=100)
+    ap.add_argument('--port', type=int, default=8766)
+    args = ap.parse_args()
+    syms = [f"sym{i:03d}usdt" for i in range(args.symbols)]
+    data = load_recording(args.file) if args.file else synthetic_trades(syms, args.trades)
+    print(asyncio.run(run(syms, data, args.per_conn, args.port)))
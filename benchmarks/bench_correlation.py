@@ -0,0 +1,73 @@
+# benchmarks/bench_correlation.py
+"""
+Incremental correlation state (analytics/correlation.py) versus recomputing
+DataFrame.corr() / ewm().corr() on every request.
+
+Checks both states against pandas on a random walk matrix, then times one
+new bar per "request" for a universe of --symbols series.
+
+    python -m benchmarks.bench_correlation --symbols 100 --window 360 --steps 200
+"""
+import argparse
+import time
+
+import numpy as np
+import pandas as pd
+
+from analytics.correlation import EWCorrelation, RollingCorrelation, top_pairs
+
+
+def check(rng, n=30, window=200, halflife=40):
+    m = np.cumsum(rng.normal(size=(1500, n)), axis=0) + 1000
+    df = pd.DataFrame(m)
+    rc = RollingCorrelation(n, window)
+    rc.extend(m[:700])
+    for row in m[700:]:
+        rc.push(row)
+    d_roll = np.abs(rc.corr() - df.iloc[-window:].corr().to_numpy()).max()
+    ew = EWCorrelation(n, halflife)
+    ew.extend(m)
+    d_ew = np.abs(ew.corr() - df.ewm(halflife=halflife, adjust=False).corr().iloc[-n:].to_numpy()).max()
+    assert d_roll < 1e-9 and d_ew < 1e-9, (d_roll, d_ew)
+    print(f"parity vs pandas: rolling {d_roll:.1e}, ewm {d_ew:.1e}")
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser()
+    ap.add_argument('--symbols', type=int, default=100)
+    ap.add_argument('--window', type=int, default=360)
+    ap.add_argument('--steps', type=int, default=200)
+    args = ap.parse_args()
+    rng = np.random.default_rng(0)
+    check(rng)
+    n, w = args.symbols, args.window
+    m = np.cumsum(rng.normal(size=(w + args.steps, n)), axis=0) + 1000
+    names = [f"s{i}" for i in range(n)]
+
+    t0 = time.perf_counter()
+    for k in range(args.steps):
+        pd.DataFrame(m[k:k + w]).corr()
+    t_full = (time.perf_counter() - t0) / args.steps * 1000.0
+
+    rc = RollingCorrelation(n, w)
+    rc.extend(m[:w])
+    t0 = time.perf_counter()
+    for k in range(args.steps):
+        rc.push(m[w + k])
+        c = rc.corr()
+    t_roll = (time.perf_counter() - t0) / args.steps * 1000.0
+
+    ew = EWCorrelation(n, 60)
+    ew.extend(m[:w])
+    t0 = time.perf_counter()
+    for k in range(args.steps):
+        ew.push(m[w + k])
+        ew.corr()
+    t_ew = (time.perf_counter() - t0) / args.steps * 1000.0
+
+    t0 = time.perf_counter()
+    top = top_pairs(c, names, 10)
+    t_top = (time.perf_counter() - t0) * 1000.0
+    print(f"{n} symbols, window {w}: recompute {t_full:.2f} ms/request, rolling update {t_roll:.2f} ms, "
+          f"ewm update {t_ew:.2f} ms (x{t_full / t_roll:.1f})")
+    print(f"top-10 of {n * (n - 1) // 2} pairs: {t_top:.2f} ms, best {top[0]}")
@@ -0,0 +1,63 @@
+# benchmarks/bench_decode.py
+"""
+Trade decode micro-benchmark: messages per second on one core for the
+original json.loads + datetime + dict path and each available decoder.
+
+    python -m benchmarks.bench_decode [--file trades.jsonl] [--n 200000]
+"""
+import argparse
+import json
+import time
+from datetime import datetime
+
+from collector.decode import make_decoder, decode_batch
+from collector.replay_server import synthetic_trades
+
+
+def legacy_decode(msg):
+    j = json.loads(msg)
+    j = j.get("data", j)
+    if j.get("e") == "trade":
+        return {
+            "symbol": j.get("s").lower(),
+            "ts": datetime.utcfromtimestamp(j.get("T", j.get("E")) / 1000.0),
+            "price": float(j.get("p")),
+            "qty": float(j.get("q")),
+        }
+
+
+def load_messages(path, n):
+    if path:
+        with open(path, 'rb') as f:
+            return [line.strip() for line in f if line.strip()]
+    trades = synthetic_trades(['btcusdt', 'ethusdt', 'solusdt'], n)
+    return [json.dumps({"stream": f"{t['s'].lower()}@trade", "data": t}).encode() for t in trades]
+
+
+def timeit(fn, msgs, repeat=3):
+    best = float('inf')
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn(msgs)
+        best = min(best, time.perf_counter() - t0)
+    return best
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser()
+    ap.add_argument('--file', help='recorded messages, one JSON message per line')
+    ap.add_argument('--n', type=int, default=200000)
+    args = ap.parse_args()
+    msgs = load_messages(args.file, args.n)
+    results = {'legacy': timeit(lambda ms: [legacy_decode(m) for m in ms], msgs)}
+    for name in ('json', 'orjson', 'msgspec'):
+        try:
+            _, dec = make_decoder(name)
+        except ValueError:
+            continue
+        results[name] = timeit(lambda ms: [dec(m) for m in ms], msgs)
+        results[f'{name}+columnar'] = timeit(lambda ms: decode_batch(ms, dec), msgs)
+    base = results['legacy']
+    print(f"{len(msgs)} messages")
+    for name, secs in results.items():
+        print(f"{name:18s} {len(msgs) / secs:12,.0f} msg/s/core  x{base / secs:.2f}")
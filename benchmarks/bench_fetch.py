@@ -0,0 +1,104 @@
+# benchmarks/bench_fetch.py
+"""
+Tick read paths at 1M ticks: the original unprojected find() + list(cursor)
+into a DataFrame versus the projected, index-backed columnar reads.
+
+    python -m benchmarks.bench_fetch --offline      # decode only, no server
+    python -m benchmarks.bench_fetch --n 1000000    # against MONGO_URI, db MONGO_DB (default gemscap_bench)
+"""
+import argparse
+import os
+import time
+from datetime import datetime, timedelta, timezone
+
+os.environ.setdefault("MONGO_DB", "gemscap_bench")
+
+import bson
+import numpy as np
+import pandas as pd
+from bson import DatetimeMS
+
+from analytics import ticks
+from analytics.db import get_collection
+
+SYMBOL = "benchusdt"
+BATCH_BYTES = 16 * 1024 * 1024
+
+
+def make_docs(n, end=None):
+    end_ms = int((end or datetime.utcnow()).replace(tzinfo=timezone.utc).timestamp() * 1000)
+    start = end_ms - n * 10
+    rng = np.random.default_rng(1)
+    price = 100 + np.cumsum(rng.normal(0, 0.01, n))
+    qty = rng.uniform(0.001, 2, n)
+    return [{"symbol": SYMBOL, "ts": DatetimeMS(int(start + 10 * i)), "price": float(price[i]), "qty": float(qty[i])}
+            for i in range(n)]
+
+
+def legacy_frame(docs):
+    df = pd.DataFrame(docs)
+    df['ts'] = pd.to_datetime(df['ts'])
+    return df.set_index('ts').sort_index()
+
+
+def best_of(fn, repeat):
+    best, out = float('inf'), None
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        out = fn()
+        best = min(best, time.perf_counter() - t0)
+    return best, out
+
+
+def offline(n, repeat):
+    docs = make_docs(n)
+    full = [bson.encode(d) for d in docs]
+    projected = [bson.encode({"ts": d["ts"], "price": d["price"], "qty": d["qty"]}) for d in docs]
+    per_batch = BATCH_BYTES // len(full[0])
+
+    def batches(enc):
+        return [b''.join(enc[i:i + per_batch]) for i in range(0, len(enc), per_batch)]
+
+    raw_full, raw_proj = batches(full), batches(projected)
+    t_legacy, df_legacy = best_of(lambda: legacy_frame([d for b in raw_full for d in bson.decode_all(b)]), repeat)
+    t_raw, arrs = best_of(lambda: ticks._concat([ticks._decode_fixed(b) for b in raw_proj]), repeat)
+    t_frame, df_new = best_of(lambda: ticks.arrays_to_frame(arrs), repeat)
+    assert np.allclose(df_legacy['price'].to_numpy(), df_new['price'].to_numpy())
+    assert (df_legacy.index.values.astype('datetime64[ms]') == df_new.index.values.astype('datetime64[ms]')).all()
+    return {'n': n, 'legacy_decode_s': t_legacy, 'columnar_decode_s': t_raw, 'columnar_to_frame_s': t_frame,
+            'speedup': t_legacy / (t_raw + t_frame)}
+
+
+def live(n, repeat):
+    coll = get_collection()
+    coll.delete_many({"symbol": SYMBOL})
+    docs = make_docs(n)
+    for i in range(0, n, 50000):
+        coll.insert_many(docs[i:i + 50000], ordered=False)
+    minutes = n * 10 / 60000 + 1
+    since = datetime.utcnow() - timedelta(minutes=minutes)
+    ticks.ensure_tick_indexes(coll)
+
+    def legacy():
+        return legacy_frame(list(coll.find({"symbol": SYMBOL, "ts": {"$gte": since}})))
+
+    out = {'n': n, 'legacy_s': best_of(legacy, repeat)[0]}
+    for path in ('cursor', 'raw', 'arrow'):
+        try:
+            out[f'{path}_s'] = best_of(
+                lambda: ticks.arrays_to_frame(ticks.fetch_tick_arrays(SYMBOL, since=since, read_path=path)), repeat)[0]
+        except ImportError:
+            pass
+    coll.delete_many({"symbol": SYMBOL})
+    return out
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser()
+    ap.add_argument('--n', type=int, default=1_000_000)
+    ap.add_argument('--repeat', type=int, default=3)
+    ap.add_argument('--offline', action='store_true')
+    args = ap.parse_args()
+    res = offline(args.n, args.repeat) if args.offline else live(args.n, args.repeat)
+    for k, v in res.items():
+        print(f"{k:22s} {v:.3f}" if isinstance(v, float) else f"{k:22s} {v}")
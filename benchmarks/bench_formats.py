@@ -0,0 +1,93 @@
+# benchmarks/bench_formats.py
+"""
+Encode and decode cost of the /api/ohlc response formats (api/renderers.py).
+
+For --bars synthetic 1m bars, times the server side (payload build and
+encode) and the client side (bytes to a ts-indexed DataFrame) for:
+    drf       the original row-wise JSON via DRF's JSONRenderer
+    records   the same rows via the orjson renderer
+    columns   columnar JSON
+    msgpack   columnar msgpack
+    arrow     Arrow IPC stream
+Every variant is first checked to decode to the same frame.
+
+    python -m benchmarks.bench_formats --bars 500,5000,50000
+"""
+import argparse
+import json
+import os
+import time
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'backend_django.settings')
+
+import django
+
+django.setup()
+
+import numpy as np
+import pandas as pd
+from rest_framework.renderers import JSONRenderer
+
+from api.renderers import dumps_arrow, dumps_json, dumps_msgpack, frame_payload
+
+
+def make_bars(n, seed=0):
+    rng = np.random.default_rng(seed)
+    close = 1000 + np.cumsum(rng.normal(0, 1, n))
+    idx = pd.date_range('2024-01-01', periods=n, freq='1min', name='ts')
+    return pd.DataFrame({'open': close + rng.normal(0, 0.1, n), 'high': close + 1, 'low': close - 1,
+                         'close': close, 'volume': rng.exponential(1, n)}, index=idx)
+
+
+def from_records(body):
+    df = pd.DataFrame(json.loads(body))
+    return df.set_index(pd.DatetimeIndex(pd.to_datetime(df.pop('ts')), name='ts'))
+
+
+def from_columns(cols):
+    df = pd.DataFrame(cols)
+    return df.set_index(pd.DatetimeIndex(pd.to_datetime(df.pop('ts'), unit='ms'), name='ts'))
+
+
+def from_arrow(body):
+    import pyarrow as pa
+    df = pa.ipc.open_stream(body).read_pandas()
+    return df.set_index(pd.DatetimeIndex(df.pop('ts').astype('datetime64[ns]'), name='ts'))
+
+
+def from_msgpack(body):
+    import msgspec
+    return from_columns(msgspec.msgpack.decode(body))
+
+
+VARIANTS = {
+    'drf': (lambda df: JSONRenderer().render(frame_payload(df)), from_records),
+    'records': (lambda df: dumps_json(frame_payload(df)), from_records),
+    'columns': (lambda df: dumps_json(frame_payload(df, columns=True)), lambda b: from_columns(json.loads(b))),
+    'msgpack': (lambda df: dumps_msgpack(frame_payload(df, columns=True)), from_msgpack),
+    'arrow': (lambda df: dumps_arrow(frame_payload(df, columns=True)), from_arrow),
+}
+
+
+def best(fn, repeat):
+    times = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        out = fn()
+        times.append(time.perf_counter() - t0)
+    return min(times), out
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser()
+    ap.add_argument('--bars', default='500,5000,50000')
+    ap.add_argument('--repeat', type=int, default=5)
+    args = ap.parse_args()
+    print(f"{'bars':>7} {'format':>8} {'bytes':>10} {'encode ms':>10} {'decode ms':>10}")
+    for n in [int(v) for v in args.bars.split(',')]:
+        df = make_bars(n)
+        for name, (enc, dec) in VARIANTS.items():
+            t_enc, body = best(lambda: enc(df), args.repeat)
+            t_dec, back = best(lambda: dec(body), args.repeat)
+            pd.testing.assert_frame_equal(back, df, check_freq=False)
+            print(f"{n:>7} {name:>8} {len(body):>10} {t_enc * 1e3:>10.2f} {t_dec * 1e3:>10.2f}")
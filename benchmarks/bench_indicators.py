@@ -0,0 +1,55 @@
+# benchmarks/bench_indicators.py
+"""
+Streaming indicators (analytics/streaming.py) against the batch functions in
+analytics/indicators.py: one bar update across many symbols versus a full
+batch recompute. Streaming/batch equivalence is tested in api/tests.py.
+
+    python -m benchmarks.bench_indicators --symbols 500
+"""
+import argparse
+import time
+
+import numpy as np
+import pandas as pd
+
+from analytics import indicators as ind
+from analytics import streaming as st
+
+
+def random_bars(rng, n):
+    close = np.abs(rng.choice([1.0, 100.0, 60000.0]) * np.exp(np.cumsum(rng.normal(0, 0.002, n))))
+    spread = np.abs(rng.normal(0, 0.001, n)) * close
+    return pd.DataFrame({'high': close + spread, 'low': close - spread, 'close': close,
+                         'volume': rng.uniform(0, 5, n)})
+
+
+def bench(symbols, history, rng):
+    sets = [st.IndicatorSet() for _ in range(symbols)]
+    bars = [random_bars(rng, history) for _ in range(symbols)]
+    for s, df in zip(sets, bars):
+        for r in df.itertuples(index=False):
+            s.update(r.high, r.low, r.close, r.volume)
+    last = [df.iloc[-1] for df in bars]
+    t0 = time.perf_counter()
+    for s, r in zip(sets, last):
+        s.update(r.high, r.low, r.close, r.volume)
+    t_stream = time.perf_counter() - t0
+    t0 = time.perf_counter()
+    for df in bars:
+        c = df['close']
+        ind.sma_ema_bundle(df), ind.rsi(c), ind.macd(c), ind.bollinger_bands(c)
+        ind.atr(df), ind.vwap(df), ind.rolling_zscore(c, 60)
+    t_batch = time.perf_counter() - t0
+    return t_stream, t_batch
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser()
+    ap.add_argument('--symbols', type=int, default=500)
+    ap.add_argument('--history', type=int, default=1440)
+    ap.add_argument('--seed', type=int, default=0)
+    args = ap.parse_args()
+    rng = np.random.default_rng(args.seed)
+    t_stream, t_batch = bench(args.symbols, args.history, rng)
+    print(f"{args.symbols} symbols x {args.history} bars: one streaming update {t_stream * 1000:.2f} ms, "
+          f"batch recompute {t_batch * 1000:.1f} ms (x{t_batch / t_stream:.0f})")
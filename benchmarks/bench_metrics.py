@@ -0,0 +1,70 @@
+# benchmarks/bench_metrics.py
+"""
+Cost of the in-process metrics (analytics/metrics.py) on the hot paths.
+
+First the exposition is checked: bucket counts are cumulative, and
+_sum/_count match what was observed. Then the per-call cost of each
+instrumented operation is timed: a counter increment, a histogram observe
+(the collector's websocket lag, the API middleware) and the @timed wrapper
+(the analytics calls). Scraping a registry filled the way a busy collector
+shard would be is timed as well.
+
+    python -m benchmarks.bench_metrics --n 200000
+"""
+import argparse
+import time
+
+from analytics.db import timed
+from analytics.metrics import Counter, Histogram, Registry
+
+
+def per_call(fn, n):
+    t0 = time.perf_counter()
+    for _ in range(n):
+        fn()
+    return (time.perf_counter() - t0) / n * 1e9
+
+
+def check():
+    reg = Registry()
+    h = Histogram("t_seconds", "test", ("k",), buckets=(0.1, 1.0), registry=reg)
+    for v in (0.05, 0.5, 0.5, 5.0):
+        h.labels("a").observe(v)
+    text = reg.render()
+    for line in ('t_seconds_bucket{k="a",le="0.1"} 1', 't_seconds_bucket{k="a",le="1"} 3',
+                 't_seconds_bucket{k="a",le="+Inf"} 4', 't_seconds_sum{k="a"} 6.05', 't_seconds_count{k="a"} 4'):
+        assert line in text, f"missing {line!r} in\n{text}"
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser()
+    ap.add_argument('--n', type=int, default=200000)
+    args = ap.parse_args()
+    check()
+    print("exposition ok")
+
+    reg = Registry()
+    counter = Counter("c_total", "bench", ("conn",), registry=reg).labels("btcusdt..ethusdt(100)")
+    hist = Histogram("h_seconds", "bench", ("conn",), registry=reg).labels("btcusdt..ethusdt(100)")
+
+    def noop():
+        return None
+
+    wrapped = timed(noop)
+    now = time.time
+    print(f"{'operation':<28} {'ns/call':>9}")
+    print(f"{'baseline (empty call)':<28} {per_call(noop, args.n):>9.0f}")
+    print(f"{'counter.inc()':<28} {per_call(counter.inc, args.n):>9.0f}")
+    print(f"{'histogram.observe(lag)':<28} {per_call(lambda: hist.observe(now() - 1.7e9), args.n):>9.0f}")
+    print(f"{'@timed call':<28} {per_call(wrapped, args.n):>9.0f}")
+
+    # scrape of a shard with 50 connections and the writer counters
+    big = Registry()
+    lag = Histogram("lag_seconds", "bench", ("conn",), registry=big)
+    for i in range(50):
+        for j in range(100):
+            lag.labels(f"conn{i}").observe(j / 100)
+    t0 = time.perf_counter()
+    for _ in range(100):
+        body = big.render()
+    print(f"scrape of {len(body.splitlines())} lines: {(time.perf_counter() - t0) / 100 * 1e3:.2f} ms")
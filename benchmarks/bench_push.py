@@ -0,0 +1,138 @@
+# benchmarks/bench_push.py
+"""
+Fan-out of the SSE streams (/api/stream/bars, /api/stream/pair).
+
+Starts uvicorn on synthetic 1s bars kept in shared rings. This process
+writes a new bar per symbol every second, and --clients connections split
+across one bar stream and one pair stream. Reports, per stream, the events
+each client got, the delay from bar close to delivery (p50/p99), and the
+hub's own counters, which show one poll loop per topic however many clients
+there are. Mailbox coalescing and topic lifecycle are covered by
+api/tests.py.
+
+    python -m benchmarks.bench_push --clients 200 --seconds 20
+"""
+import argparse
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.request
+from datetime import datetime, timezone
+
+import numpy as np
+
+from benchmarks.bench_api import wait_ready
+
+SYMBOLS = ('btcusdt', 'ethusdt')
+
+
+class Feed(threading.Thread):
+    """Writes one 1s bar per symbol per second; the ring's newest bar stays open until the next one."""
+
+    def __init__(self, root, history=1200):
+        super().__init__(daemon=True)
+        from analytics.shared_bars import SharedBarWriter
+        self.writer = SharedBarWriter(capacity=history + 600, root=root)
+        self.rng = np.random.default_rng(0)
+        self.price = {s: 1000.0 * (k + 1) for k, s in enumerate(SYMBOLS)}
+        self.stop = threading.Event()
+        now = int(time.time()) * 1000
+        for ts in range(now - history * 1000, now + 1000, 1000):
+            self.step(ts)
+
+    def step(self, ts):
+        common = self.rng.normal(0, 1)
+        for k, s in enumerate(SYMBOLS):
+            self.price[s] += common * (k + 1) + self.rng.normal(0, 0.3)
+            p = self.price[s]
+            self.writer.write(1, s, (ts, p, p + 1, p - 1, p, 1.0, 1))
+
+    def run(self):
+        while not self.stop.is_set():
+            now = time.time()
+            self.stop.wait(1 - now % 1)
+            self.step(int(time.time()) * 1000)
+
+
+async def client(host, port, path, deadline, out):
+    reader, writer = await asyncio.open_connection(host, port)
+    writer.write(f"GET {path} HTTP/1.1\r\nHost: {host}\r\nAccept: text/event-stream\r\n\r\n".encode())
+    await writer.drain()
+    events, delays = {}, []
+    event = None
+    try:
+        while True:
+            line = await asyncio.wait_for(reader.readline(), max(deadline - time.time(), 0.01))
+            if line.startswith(b'event:'):
+                event = line[6:].strip().decode()
+            elif line.startswith(b'data:') and event:
+                events[event] = events.get(event, 0) + 1
+                data = json.loads(line[5:])
+                if event != 'snapshot':
+                    # a 1s bar closes when the next one starts
+                    ts = data['bars'][-1]['ts'] if 'bars' in data else data['ts']
+                    delays.append(time.time() - datetime.fromisoformat(ts).replace(tzinfo=timezone.utc).timestamp() - 1)
+    except (asyncio.TimeoutError, ConnectionError):
+        pass
+    finally:
+        writer.close()
+    out.append((events, delays))
+
+
+async def run_clients(host, port, n, seconds):
+    paths = {'bars': '/api/stream/bars?symbol=btcusdt&tf=1s&source=shared',
+             'pair': '/api/stream/pair?y=ethusdt&x=btcusdt&tf=1s&window=30&source=shared'}
+    deadline = time.time() + seconds
+    results = {k: [] for k in paths}
+    await asyncio.gather(*(client(host, port, paths[k], deadline, results[k])
+                           for i in range(n) for k in [('bars', 'pair')[i % 2]]))
+    return results
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser()
+    ap.add_argument('--clients', type=int, default=200)
+    ap.add_argument('--seconds', type=float, default=20.0)
+    ap.add_argument('--port', type=int, default=8766)
+    args = ap.parse_args()
+
+    root = tempfile.mkdtemp(prefix='bench_push_')
+    feed = Feed(root)
+    env = dict(os.environ, SHARED_BARS_DIR=root, BAR_SOURCE='shared', BAR_TIMEFRAMES='1s',
+               PUSH_POLL_INTERVAL='0.1', SERIES_CACHE='0')
+    server = subprocess.Popen([sys.executable, '-m', 'uvicorn', 'backend_django.asgi:application',
+                               '--host', '127.0.0.1', '--port', str(args.port), '--log-level', 'warning',
+                               '--no-access-log', '--timeout-graceful-shutdown', '1'], env=env)
+    try:
+        wait_ready('127.0.0.1', args.port)
+        feed.start()
+        stats = {}
+
+        async def main():
+            run = asyncio.create_task(run_clients('127.0.0.1', args.port, args.clients, args.seconds))
+            await asyncio.sleep(args.seconds - 1)
+            url = f"http://127.0.0.1:{args.port}/api/stream/stats"
+            stats.update(json.loads(await asyncio.to_thread(lambda: urllib.request.urlopen(url).read())))
+            return await run
+
+        results = asyncio.run(main())
+    finally:
+        feed.stop.set()
+        server.terminate()
+        server.wait()
+
+    print(f"{args.clients} clients, {args.seconds:.0f}s")
+    print(f"{'stream':>6} {'clients':>8} {'events/client':>14} {'p50 ms':>8} {'p99 ms':>8}")
+    for k, rs in results.items():
+        per = [sum(e.values()) for e, _ in rs]
+        d = np.concatenate([np.asarray(x, dtype=float) for _, x in rs]) * 1000 if rs else np.empty(0)
+        print(f"{k:>6} {len(rs):>8} {np.mean(per) if per else 0:>14.1f} "
+              f"{np.percentile(d, 50) if len(d) else 0:>8.1f} {np.percentile(d, 99) if len(d) else 0:>8.1f}")
+    for name, t in stats.get('topics', {}).items():
+        print(f"  {name}: {t['subscribers']} subscribers, {t['polls']} polls, {t['published']} published, "
+              f"{t['coalesced']} coalesced, {t['errors']} errors")
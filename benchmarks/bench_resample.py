@@ -0,0 +1,100 @@
+# benchmarks/bench_resample.py
+"""
+Batched multi-symbol resampling (analytics.bars.bars_from_arrays_many) versus
+the per-symbol path it replaces: one arrays_to_frame + resample_ohlc per
+symbol, then pd.concat(join='inner') to align them.
+
+Synthetic ticks are generated per symbol with irregular gaps, so the
+symbols do not trade in every bucket and the inner join actually drops
+rows. Both paths must give the same timestamps and bar values; the batched
+one is also checked against the integer-timestamp align_arrays used for
+the other bar sources.
+
+    python -m benchmarks.bench_resample --symbols 10,100 --ticks 20000 --tf 1s,1m
+"""
+import argparse
+import time
+
+import numpy as np
+import pandas as pd
+
+from analytics.analytics import resample_ohlc
+from analytics.bars import BAR_COLUMNS, align_arrays, bars_from_arrays_many, timeframe_seconds
+from analytics.ticks import arrays_to_frame
+
+
+def make_ticks(n_symbols, ticks_per_symbol, seed=0, start_ms=1_735_689_600_000, span_s=3600):
+    """Concatenated ticks {'ts','price','qty','offsets'} for n_symbols, each sorted by ts."""
+    rng = np.random.default_rng(seed)
+    parts = []
+    for k in range(n_symbols):
+        ts = np.sort(rng.integers(start_ms, start_ms + span_s * 1000, ticks_per_symbol))
+        price = 100 * (k + 1) + np.cumsum(rng.normal(0, 0.05, ticks_per_symbol))
+        parts.append((ts, price, rng.exponential(1.0, ticks_per_symbol)))
+    return {'ts': np.concatenate([p[0] for p in parts]), 'price': np.concatenate([p[1] for p in parts]),
+            'qty': np.concatenate([p[2] for p in parts]),
+            'offsets': np.arange(n_symbols + 1, dtype=np.int64) * ticks_per_symbol}
+
+
+def per_symbol(ticks, tf):
+    """The old path: one DataFrame per symbol, resampled, then inner-joined."""
+    frames = []
+    o = ticks['offsets']
+    for i in range(len(o) - 1):
+        sl = slice(o[i], o[i + 1])
+        bars = resample_ohlc(arrays_to_frame({k: ticks[k][sl] for k in ('ts', 'price', 'qty')}), tf)
+        frames.append(bars[BAR_COLUMNS])
+    joined = pd.concat(frames, axis=1, keys=range(len(frames)), join='inner')
+    return joined.index.asi8 // 1_000_000, joined.to_numpy().reshape(len(joined), len(frames), len(BAR_COLUMNS))
+
+
+def batched(ticks, tf):
+    cube = bars_from_arrays_many(ticks['ts'], ticks['price'], ticks['qty'], ticks['offsets'], timeframe_seconds(tf))
+    return cube['ts'], cube['bars']
+
+
+def check(ticks, tf):
+    ts_old, old = per_symbol(ticks, tf)
+    ts_new, new = batched(ticks, tf)
+    assert np.array_equal(ts_old, ts_new), f"{tf}: bar timestamps differ"
+    assert np.array_equal(old[..., :4], new[..., :4]), f"{tf}: open/high/low/close differ"
+    assert np.allclose(old[..., 4], new[..., 4], rtol=1e-12), f"{tf}: volume differs"
+    # the same cube from per-symbol bars aligned on integer timestamps (non-tick sources)
+    o = ticks['offsets']
+    singles = [bars_from_arrays_many(ticks['ts'][o[i]:o[i + 1]], ticks['price'][o[i]:o[i + 1]],
+                                     ticks['qty'][o[i]:o[i + 1]], [0, o[i + 1] - o[i]], timeframe_seconds(tf))
+               for i in range(len(o) - 1)]
+    grid, cube = align_arrays([b['ts'] for b in singles], [b['bars'][:, 0] for b in singles])
+    assert np.array_equal(grid, ts_new) and np.array_equal(cube, new), f"{tf}: align_arrays differs"
+
+
+def best(fn, repeat):
+    times = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - t0)
+    return min(times)
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser()
+    ap.add_argument('--symbols', default='10,100')
+    ap.add_argument('--ticks', type=int, default=20000, help='ticks per symbol')
+    ap.add_argument('--tf', default='1s,1m')
+    ap.add_argument('--repeat', type=int, default=3)
+    args = ap.parse_args()
+    tfs = args.tf.split(',')
+    check(make_ticks(5, 2000, seed=1), '1s')
+    for tf in tfs:
+        check(make_ticks(5, 2000, seed=2), tf)
+    print("parity ok")
+    print(f"{'symbols':>8} {'ticks':>10} {'tf':>4} {'bars':>7} {'per-symbol ms':>14} {'batched ms':>11} {'speed-up':>9}")
+    for n in [int(v) for v in args.symbols.split(',')]:
+        ticks = make_ticks(n, args.ticks)
+        for tf in tfs:
+            t_old = best(lambda: per_symbol(ticks, tf), args.repeat)
+            t_new = best(lambda: batched(ticks, tf), args.repeat)
+            rows = len(batched(ticks, tf)[0])
+            print(f"{n:>8} {len(ticks['ts']):>10} {tf:>4} {rows:>7} {t_old * 1e3:>14.1f} {t_new * 1e3:>11.1f} "
+                  f"{t_old / t_new:>8.1f}x")
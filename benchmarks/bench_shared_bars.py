@@ -0,0 +1,78 @@
+# benchmarks/bench_shared_bars.py
+"""
+Read latency of the mapped bar rings (analytics/shared_bars.py).
+
+A writer fills one ring per symbol and keeps updating the open bar while
+--readers processes repeatedly read the last --n bars as views, consistent
+snapshots and DataFrames. Readers check that every snapshot is internally
+consistent (ts strictly increasing, high >= low).
+
+    python -m benchmarks.bench_shared_bars --symbols 50 --n 500 --readers 4
+"""
+import argparse
+import multiprocessing
+import os
+import tempfile
+import time
+
+import numpy as np
+
+from analytics.shared_bars import SharedBarWriter, open_ring
+
+
+def reader(root, symbols, n, seconds):
+    counts = {'view': 0, 'snapshot': 0, 'frame': 0}
+    rings = [open_ring(s, 60, root) for s in symbols]
+    t_end = time.perf_counter() + seconds
+    timings = {k: 0.0 for k in counts}
+    while time.perf_counter() < t_end:
+        for ring in rings:
+            t0 = time.perf_counter()
+            ring.view(n)
+            t1 = time.perf_counter()
+            snap = ring.snapshot(n)
+            t2 = time.perf_counter()
+            ring.frame(n)
+            t3 = time.perf_counter()
+            assert (np.diff(snap['ts']) > 0).all() and (snap['high'] >= snap['low']).all()
+            for k, dt in (('view', t1 - t0), ('snapshot', t2 - t1), ('frame', t3 - t2)):
+                timings[k] += dt
+                counts[k] += 1
+    return {k: timings[k] / counts[k] * 1e6 for k in counts}
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser()
+    ap.add_argument('--symbols', type=int, default=50)
+    ap.add_argument('--n', type=int, default=500)
+    ap.add_argument('--capacity', type=int, default=1440)
+    ap.add_argument('--readers', type=int, default=4)
+    ap.add_argument('--seconds', type=float, default=3.0)
+    args = ap.parse_args()
+    root = tempfile.mkdtemp(prefix='bench_bars_')
+    symbols = [f"sym{i}" for i in range(args.symbols)]
+    writer = SharedBarWriter(args.capacity, root)
+    rng = np.random.default_rng(0)
+    start = 1_700_000_000_000
+    for s in symbols:
+        for k in range(args.capacity + 100):
+            p = 100 + rng.normal()
+            writer.write(60, s, (start + k * 60000, p, p + 1, p - 1, p, 1.0, 1))
+    ctx = multiprocessing.get_context('spawn')
+    with ctx.Pool(args.readers) as pool:
+        jobs = [pool.apply_async(reader, (root, symbols, args.n, args.seconds)) for _ in range(args.readers)]
+        # keep the writer busy on the open bars meanwhile
+        t_end = time.perf_counter() + args.seconds
+        last = start + (args.capacity + 99) * 60000
+        writes = 0
+        while time.perf_counter() < t_end:
+            for s in symbols:
+                p = 100 + rng.normal()
+                writer.write(60, s, (last, p, p + 1, p - 1, p, 1.0, 1))
+                writes += 1
+        results = [j.get() for j in jobs]
+    size = sum(os.path.getsize(os.path.join(root, '60s', f)) for f in os.listdir(os.path.join(root, '60s')))
+    print(f"{args.symbols} rings x {args.capacity} bars ({size / 1e6:.1f} MB shared), "
+          f"{args.readers} readers, {writes / args.seconds:.0f} writes/s")
+    for k in ('view', 'snapshot', 'frame'):
+        print(f"  last {args.n} bars as {k:>8}: {np.mean([r[k] for r in results]):8.1f} us")
@@ -0,0 +1,88 @@
+# benchmarks/bench_signals.py
+"""
+zscore_signals: the original per-row loop versus analytics/signals.py.
+
+Timing on a day of 1s bars and a 2D parameter sweep, after a warm-up call
+that compiles the Numba kernel; the fast paths report their best of
+--repeat runs. Every timed result is asserted equal to the loop's. The
+engines' equivalence on edge cases is tested in api/tests.py.
+
+    python -m benchmarks.bench_signals
+    SIGNALS_ENGINE=numpy python -m benchmarks.bench_signals
+"""
+import argparse
+import time
+
+import numpy as np
+import pandas as pd
+
+from analytics.analytics import zscore_signals
+from analytics.signals import ENGINE, signal_positions_batch
+
+
+def legacy_zscore_signals(zseries, entry=2.0, exit=0.0):
+    s = zseries.dropna()
+    sig = pd.Series(0, index=s.index)
+    position = 0
+    for i in range(len(s)):
+        z = s.iloc[i]
+        if position == 0:
+            if z > entry:
+                position = -1
+            elif z < -entry:
+                position = 1
+        elif position == 1:
+            if z >= -exit:
+                position = 0
+        elif position == -1:
+            if z <= exit:
+                position = 0
+        sig.iloc[i] = position
+    return sig
+
+
+def random_z(rng, n):
+    z = np.cumsum(rng.normal(0, rng.uniform(0.1, 1.0), n))
+    z = (z - z.mean()) / (z.std() + 1e-12) * rng.uniform(0.5, 3)
+    z[rng.random(n) < 0.02] = np.nan
+    return pd.Series(z, index=pd.date_range('2025-01-01', periods=n, freq='1s'))
+
+
+def best_of(fn, repeat):
+    times = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        out = fn()
+        times.append(time.perf_counter() - t0)
+    return out, min(times)
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser()
+    ap.add_argument('--n', type=int, default=86400, help='bars per series (a day of 1s bars)')
+    ap.add_argument('--repeat', type=int, default=5, help='best of this many runs for the fast paths')
+    args = ap.parse_args()
+    rng = np.random.default_rng(0)
+    z = random_z(rng, args.n)
+    # compile (numba) and touch every code path before anything is timed
+    zscore_signals(z.iloc[:1000])
+    signal_positions_batch(z.to_numpy()[:1000], [1.0, 2.0], [0.0, 0.5])
+
+    t0 = time.perf_counter()
+    legacy = legacy_zscore_signals(z)
+    t_legacy = time.perf_counter() - t0
+    new, t_new = best_of(lambda: zscore_signals(z), args.repeat)
+    assert new.equals(legacy), "vectorised positions differ from the loop"
+    print(f"engine: {ENGINE} (SIGNALS_ENGINE)")
+    print(f"{args.n} bars: loop {t_legacy:.3f}s, vectorised {t_new * 1000:.2f} ms (x{t_legacy / t_new:.0f})")
+
+    zz = np.column_stack([random_z(rng, args.n).to_numpy() for _ in range(20)])
+    entries = np.repeat([1.0, 1.5, 2.0, 2.5, 3.0], 3)
+    exits = np.tile([0.0, 0.25, 0.5], 5)
+    out, t_sweep = best_of(lambda: signal_positions_batch(zz, entries, exits), args.repeat)
+    # a position is held through NaN bars, which the loop drops
+    for p, k in ((0, 0), (len(entries) - 1, zz.shape[1] - 1)):
+        col = pd.Series(zz[:, k]).dropna()
+        assert np.array_equal(out[p, col.index, k], legacy_zscore_signals(col, entries[p], exits[p]).to_numpy()), \
+            f"sweep positions differ from the loop for entry={entries[p]} exit={exits[p]}"
+    print(f"sweep {out.shape} (params, bars, series): {t_sweep:.3f}s")
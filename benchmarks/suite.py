@@ -0,0 +1,337 @@
+# benchmarks/suite.py
+"""
+Reproducible benchmark suite: every analytics stage and API endpoint at
+several data sizes, on seeded synthetic ticks (benchmarks/synthetic.py),
+written as JSON that can be compared between runs.
+
+Sizes are ticks per symbol of the benchmarked pair, for example
+10k,100k,1m,10m. Multi-symbol cases spread the same number of ticks over
+--universe symbols. Ticks arrive at --rate per second per symbol and end
+now. The pair is cointegrated (see --kind).
+
+Groups:
+  fetch    tick reads from the store
+  compute  resampling, pair fits, cointegration, indicators, on arrays
+           prepared outside the timed call
+  api      the DRF endpoints through Django's test client, in-process
+
+Stores:
+  archive  (default, no server) the ticks are written to Arrow day files
+           in a temporary TICK_ARCHIVE_DIR, and reads stop at the
+           watermark. The API group reads bars from shared rings seeded
+           with 25h of synthetic 1m bars, so its size is in bars.
+  mongo    the ticks are inserted into MONGO_URI / MONGO_DB (default
+           gemscap_bench; the ticks collection is dropped first, so the
+           name must end in _bench). This adds fetch_ticks,
+           compute_pair_analytics and the API on source=pandas at every
+           size.
+
+The series and pair result caches are off (SERIES_CACHE=0, PAIR_CACHE=off),
+so every timed call does the full work. The pair_cache_hit cases time a
+pair_cointegration lookup at an unchanged watermark: from the in-process
+copy, and from the shared file as another worker would read it.
+
+    python -m benchmarks.suite --sizes 10k,100k,1m --out base.json
+    python -m benchmarks.suite --sizes 10k,100k,1m --compare base.json --out new.json
+    python -m benchmarks.suite --against new.json --compare base.json     # compare two files, no run
+"""
+import argparse
+import json
+import os
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+# before any analytics import: module-level settings read these
+_TMP = tempfile.mkdtemp(prefix='gemscap_suite_')
+os.environ['TICK_ARCHIVE_DIR'] = os.path.join(_TMP, 'archive')
+os.environ['SHARED_BARS_DIR'] = os.path.join(_TMP, 'bars')
+os.environ['SERIES_CACHE'] = '0'
+os.environ['PAIR_CACHE'] = 'off'
+os.environ['PAIR_CACHE_DIR'] = os.path.join(_TMP, 'pair_cache')
+os.environ.setdefault('MONGO_DB', 'gemscap_bench')
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'backend_django.settings')
+
+import numpy as np
+import pandas as pd
+
+from benchmarks.synthetic import KINDS, make_universe, symbol_arrays
+
+GROUPS = ('fetch', 'compute', 'api')
+RING_MINUTES = 25 * 60
+
+
+def parse_size(value):
+    value = value.strip().lower()
+    scale = {'k': 1_000, 'm': 1_000_000}.get(value[-1:], 1)
+    return int(float(value.rstrip('km')) * scale)
+
+
+def measure(fn, repeat):
+    """(best ms, median ms, last result) over `repeat` calls after one warm-up call."""
+    out = fn()
+    times = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        out = fn()
+        times.append((time.perf_counter() - t0) * 1e3)
+    return min(times), statistics.median(times), out
+
+
+def count_rows(out):
+    if isinstance(out, dict) and 'ts' in out:
+        return len(out['ts'])
+    if hasattr(out, 'status_code'):
+        return None
+    if isinstance(out, dict) or not hasattr(out, '__len__'):
+        return None
+    return len(out)
+
+
+# --- stores ---
+
+def load_archive(universe):
+    from analytics.archive import day_range, set_watermark, write_day
+    for i, symbol in enumerate(universe['symbols']):
+        arrs = symbol_arrays(universe, i)
+        ts = arrs['ts']
+        for day, lo, hi in day_range(int(ts[0]), int(ts[-1]) + 1):
+            a, b = np.searchsorted(ts, [lo, hi])
+            write_day(symbol, day, {k: v[a:b] for k, v in arrs.items()})
+        set_watermark(symbol, int(ts[-1]) + 1)
+
+
+def load_mongo(universe, chunk=50_000):
+    from analytics.db import TICKS_COLL, get_collection
+    from analytics.ticks import ensure_tick_indexes
+    from collector.decode import to_documents
+    coll = get_collection(TICKS_COLL)
+    ensure_tick_indexes(coll)
+    for i, symbol in enumerate(universe['symbols']):
+        arrs = symbol_arrays(universe, i)
+        for a in range(0, len(arrs['ts']), chunk):
+            recs = zip([symbol] * chunk, arrs['ts'][a:a + chunk].tolist(), arrs['price'][a:a + chunk].tolist(),
+                       arrs['qty'][a:a + chunk].tolist())
+            coll.insert_many(to_documents(recs), ordered=False)
+
+
+def reset_mongo():
+    from analytics.db import DB_NAME, TICKS_COLL, get_collection
+    if not DB_NAME.endswith('_bench'):
+        sys.exit(f"refusing to drop {DB_NAME}.{TICKS_COLL}: set MONGO_DB to a name ending in _bench")
+    coll = get_collection(TICKS_COLL)
+    coll.database.client.admin.command('ping')
+    coll.drop()
+
+
+def seed_rings(args):
+    """Shared 1m bar rings for a cointegrated pair over the last RING_MINUTES, for the api group."""
+    from analytics.bars import bars_from_arrays
+    from analytics.shared_bars import SharedBarWriter
+    u = make_universe(2, RING_MINUTES * 60, rate=1.0, kind=args.kind, seed=args.seed, prefix='ring')
+    writer = SharedBarWriter(capacity=RING_MINUTES + 10)
+    for i, symbol in enumerate(u['symbols']):
+        arrs = symbol_arrays(u, i)
+        bars = bars_from_arrays(arrs['ts'], arrs['price'], arrs['qty'], 60)
+        for row in zip(*(bars[k].tolist() for k in ('ts', 'open', 'high', 'low', 'close', 'volume', 'trades'))):
+            writer.write(60, symbol, row)
+    writer.close()
+    return u['symbols']
+
+
+# --- cases ---
+
+def fetch_cases(ctx, args):
+    from analytics.ticks import fetch_tick_arrays, fetch_tick_arrays_many
+    y, _ = ctx['pair']
+    yield 'fetch_tick_arrays', lambda: fetch_tick_arrays(y, since=ctx['since'], until=ctx['until'])
+    yield f"fetch_tick_arrays_many[{args.universe}]", \
+        lambda: fetch_tick_arrays_many(ctx['universe'], since=ctx['since'], until=ctx['until'])
+    if args.store == 'mongo':
+        from analytics.analytics import compute_pair_analytics, fetch_ticks
+        minutes = ctx['span_minutes']
+        yield 'fetch_ticks', lambda: fetch_ticks(y, since_minutes=minutes)
+        yield f"compute_pair_analytics[{args.tf}]", \
+            lambda: compute_pair_analytics(y, ctx['pair'][1], timeframe=args.tf, window=args.window, source='pandas')
+
+
+def compute_cases(ctx, args):
+    from analytics import indicators as ind
+    from analytics.analytics import (engle_granger_test, half_life, pair_analytics_from_bars,
+                                     pair_cointegration_from_bars, pair_cointegration_stats, resample_ohlc,
+                                     spread_and_zscore)
+    from analytics.cache import PairResultCache, bars_watermark
+    from analytics.bars import align_closes, bars_from_arrays_many
+    from analytics.hedge import ols_beta
+    from analytics.ticks import arrays_to_frame
+
+    frames = [arrays_to_frame(symbol_arrays(ctx['pair_data'], i)) for i in range(2)]
+    for tf in ('1s', '1m'):
+        yield f"resample_ohlc[{tf}]", lambda tf=tf: resample_ohlc(frames[0], tf)
+    multi = ctx['multi_data']
+    yield f"bars_from_arrays_many[{args.universe},1m]", \
+        lambda: bars_from_arrays_many(multi['ts'], multi['price'], multi['qty'], multi['offsets'], 60)
+    if ctx['bars'] is None:
+        dfy, dfx = (resample_ohlc(f, args.tf) for f in frames)
+        index, closes = align_closes([dfy, dfx])
+        ctx['bars'] = dfy, dfx, pd.Series(closes[:, 0], index), pd.Series(closes[:, 1], index)
+    dfy, dfx, sy, sx = ctx['bars']
+    if len(sy) <= 2 * args.window:
+        return
+    for hedge in ('static', 'rolling', 'kalman'):
+        yield f"pair_analytics_from_bars[{hedge}]", lambda h=hedge: pair_analytics_from_bars(dfy, dfx, args.window, h)
+    yield 'pair_cointegration_from_bars', lambda: pair_cointegration_from_bars(dfy, dfx, args.window)
+    cache = PairResultCache('file', os.environ['PAIR_CACHE_DIR'])
+    key, mark = cache.key(*ctx['pair'], args.tf, args.window, 'static', 'bench'), bars_watermark(dfy, dfx)
+    cache.put(key, mark, pair_cointegration_stats(dfy, dfx, args.window))
+    yield 'pair_cache_hit[local]', lambda: cache.get(key, mark)
+    # as another worker process sees it: decoded from the shared file
+    yield 'pair_cache_hit[file]', lambda: (cache._local.clear(), cache.get(key, mark))[1]
+    yield 'engle_granger_test', lambda: engle_granger_test(sy, sx)
+    yield 'spread_and_zscore[rolling]', lambda: spread_and_zscore(sy, sx, args.window, 'rolling')
+    spread = sy - ols_beta(sy.to_numpy(), sx.to_numpy())[0] * sx
+    yield 'half_life', lambda: half_life(spread)
+    yield 'sma_ema_bundle', lambda: ind.sma_ema_bundle(dfy)
+    yield 'rsi', lambda: ind.rsi(dfy['close'])
+    yield 'macd', lambda: ind.macd(dfy['close'])
+    yield 'bollinger_bands', lambda: ind.bollinger_bands(dfy['close'])
+    yield 'atr', lambda: ind.atr(dfy)
+    yield 'rolling_zscore', lambda: ind.rolling_zscore(dfy['close'], args.window)
+
+
+def api_cases(ctx, args, client, source):
+    y, x = ctx['pair'] if source != 'shared' else ctx['ring']
+    tf = args.tf if source != 'shared' else '1m'
+    yield 'GET /api/ohlc', lambda: client.get(f'/api/ohlc?symbol={y}&tf={tf}&source={source}')
+    yield 'GET /api/ohlc?layout=columns', \
+        lambda: client.get(f'/api/ohlc?symbol={y}&tf={tf}&source={source}&layout=columns&limit=100000')
+    yield 'GET /api/pair_analytics', \
+        lambda: client.get(f'/api/pair_analytics?y={y}&x={x}&tf={tf}&window={args.window}&source={source}')
+    yield 'GET /api/pair_cointegration', \
+        lambda: client.get(f'/api/pair_cointegration?y={y}&x={x}&tf={tf}&window={args.window}&source={source}')
+
+
+def run_cases(results, group, size, unit, cases, args):
+    for name, fn in cases:
+        best, median, out = measure(fn, args.repeat)
+        row = {'group': group, 'case': name, 'size': size, 'unit': unit, 'best_ms': round(best, 3),
+               'median_ms': round(median, 3), 'rows': count_rows(out)}
+        if hasattr(out, 'status_code'):
+            row['status'] = out.status_code
+        results.append(row)
+        print(f"{group:<8} {name:<40} {size:>10} {unit:<5} {best:>10.2f} {median:>10.2f}", flush=True)
+
+
+def run(args):
+    from analytics.archive import from_ms
+    groups = args.groups.split(',')
+    sizes = [parse_size(s) for s in args.sizes.split(',')]
+    results = []
+    client = None
+    if 'api' in groups:
+        import django
+        django.setup()
+        from django.test import Client
+        client = Client()
+    if args.store == 'mongo':
+        reset_mongo()
+    print(f"{'group':<8} {'case':<40} {'size':>10} {'unit':<5} {'best ms':>10} {'median ms':>10}")
+    if 'api' in groups:
+        ring = seed_rings(args)
+        ctx = {'ring': ring}
+        run_cases(results, 'api', RING_MINUTES, 'bars', api_cases(ctx, args, client, 'shared'), args)
+    for size in sizes:
+        t0 = time.perf_counter()
+        pair = make_universe(2, size, rate=args.rate, kind=args.kind, seed=args.seed, prefix=f"s{size}p")
+        end_ms = int(pair['ts'].max())
+        multi = make_universe(args.universe, max(size // args.universe, 1), rate=args.rate / args.universe,
+                              kind=args.kind, seed=args.seed + 1, end_ms=end_ms, prefix=f"s{size}u")
+        start_ms = int(min(pair['ts'].min(), multi['ts'].min()))
+        ctx = {'pair': pair['symbols'], 'universe': multi['symbols'], 'pair_data': pair, 'multi_data': multi,
+               'since': from_ms(start_ms), 'until': from_ms(end_ms + 1),
+               'span_minutes': (end_ms - start_ms) // 60000 + 2, 'bars': None}
+        if 'fetch' in groups or args.store == 'mongo':
+            (load_mongo if args.store == 'mongo' else load_archive)(pair)
+            (load_mongo if args.store == 'mongo' else load_archive)(multi)
+        print(f"-- {size} ticks/symbol, {ctx['span_minutes']} min, loaded in {time.perf_counter() - t0:.1f}s")
+        if 'fetch' in groups:
+            run_cases(results, 'fetch', size, 'ticks', fetch_cases(ctx, args), args)
+        if 'compute' in groups:
+            run_cases(results, 'compute', size, 'ticks', compute_cases(ctx, args), args)
+        if 'api' in groups and args.store == 'mongo':
+            run_cases(results, 'api', size, 'ticks', api_cases(ctx, args, client, 'pandas'), args)
+    return results
+
+
+def meta(args):
+    try:
+        rev = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True).stdout.strip()
+    except OSError:
+        rev = None
+    return {'git': rev or None, 'started': datetime.utcnow().isoformat(timespec='seconds') + 'Z',
+            'python': platform.python_version(), 'numpy': np.__version__, 'pandas': pd.__version__,
+            'platform': platform.platform(), 'cpus': os.cpu_count(),
+            'args': {k: v for k, v in vars(args).items() if k not in ('out', 'compare', 'against')}}
+
+
+def compare(base, new, threshold):
+    """Print new/base median ratios per case; returns the number of cases slower than `threshold`."""
+    key = lambda r: (r['group'], r['case'], r['size'])
+    old = {key(r): r for r in base['results']}
+    slower = 0
+    print(f"\n{'group':<8} {'case':<40} {'size':>10} {'base ms':>10} {'new ms':>10} {'ratio':>7}")
+    for r in new['results']:
+        b = old.get(key(r))
+        if b is None or not b['median_ms']:
+            continue
+        ratio = r['median_ms'] / b['median_ms']
+        flag = ' slower' if ratio > threshold else (' faster' if ratio < 1 / threshold else '')
+        slower += ratio > threshold
+        print(f"{r['group']:<8} {r['case']:<40} {r['size']:>10} {b['median_ms']:>10.2f} {r['median_ms']:>10.2f} "
+              f"{ratio:>6.2f}x{flag}")
+    if base.get('meta', {}).get('args') != new.get('meta', {}).get('args'):
+        print("note: the two runs used different arguments")
+    return slower
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser()
+    ap.add_argument('--sizes', default='10k,100k,1m', help='ticks per symbol, e.g. 10k,100k,1m,10m')
+    ap.add_argument('--groups', default=','.join(GROUPS))
+    ap.add_argument('--store', choices=('archive', 'mongo'), default='archive')
+    ap.add_argument('--kind', choices=KINDS, default='cointegrated')
+    ap.add_argument('--rate', type=float, default=50.0, help='ticks per second per symbol')
+    ap.add_argument('--universe', type=int, default=10, help='symbols in the multi-symbol cases')
+    ap.add_argument('--tf', default='1s', help='bar timeframe of the pair fits')
+    ap.add_argument('--window', type=int, default=60)
+    ap.add_argument('--seed', type=int, default=0)
+    ap.add_argument('--repeat', type=int, default=3)
+    ap.add_argument('--out', help='write the results as JSON here')
+    ap.add_argument('--compare', help='baseline JSON to compare against')
+    ap.add_argument('--against', help='with --compare: compare this JSON file instead of running')
+    ap.add_argument('--threshold', type=float, default=1.10, help='ratio above which a case counts as slower')
+    ap.add_argument('--strict', action='store_true', help='exit 1 when any case is slower than --threshold')
+    args = ap.parse_args()
+
+    try:
+        if args.against:
+            with open(args.against) as f:
+                report = json.load(f)
+        else:
+            report = {'meta': meta(args), 'results': run(args)}
+            if args.out:
+                with open(args.out, 'w') as f:
+                    json.dump(report, f, indent=1)
+                print(f"wrote {len(report['results'])} results to {args.out}")
+        slower = 0
+        if args.compare:
+            with open(args.compare) as f:
+                slower = compare(json.load(f), report, args.threshold)
+    finally:
+        shutil.rmtree(_TMP, ignore_errors=True)
+    sys.exit(1 if args.strict and slower else 0)
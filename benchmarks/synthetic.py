@@ -0,0 +1,73 @@
+# benchmarks/synthetic.py
+"""
+Seeded synthetic ticks for benchmarks.
+
+A universe of symbols is driven by one latent log-price factor (a random
+walk on a fine time grid). With kind='correlated' each symbol follows the
+factor with loading `corr` plus its own random walk. Log returns are then
+correlated by about corr, but no pair is cointegrated. With
+kind='cointegrated', symbol 0 is the factor and every other symbol is
+a + beta * x + an AR(1) spread with coefficient `phi` per grid step. That
+spread is mean-reverting, so every (k, 0) pair is cointegrated.
+
+Tick times are Poisson arrivals at `rate` ticks per second per symbol,
+ending at `end_ms`. Each tick reads the latent path at its grid step, so
+the same seed always gives the same ticks. The output has the layout of
+analytics.ticks.fetch_tick_arrays_many:
+
+    {'symbols', 'ts', 'price', 'qty', 'offsets'}, symbol i at offsets[i]:offsets[i + 1]
+"""
+import time
+
+import numpy as np
+from scipy.signal import lfilter
+
+KINDS = ('cointegrated', 'correlated')
+GRID_MS = 100
+
+
+def tick_times(rng, n, rate, end_ms):
+    """n sorted Poisson arrival times (epoch ms) at `rate` per second, the last one at end_ms."""
+    gaps = rng.exponential(1000.0 / rate, n)
+    t = np.cumsum(gaps[::-1])[::-1] - gaps[-1]
+    return np.sort(end_ms - t.astype(np.int64))
+
+
+def make_universe(n_symbols=2, ticks=100_000, rate=50.0, kind='cointegrated', seed=0, end_ms=None, corr=0.8,
+                  beta=1.5, phi=0.999, vol=2e-4, prefix='syn'):
+    """`ticks` per symbol for n_symbols synthetic symbols; see the module docstring."""
+    if kind not in KINDS:
+        raise ValueError(f"kind must be one of {', '.join(KINDS)}")
+    rng = np.random.default_rng(seed)
+    end_ms = int(time.time() * 1000) if end_ms is None else int(end_ms)
+    stamps = [tick_times(rng, ticks, rate, end_ms) for _ in range(n_symbols)]
+    start_ms = min(int(s[0]) for s in stamps)
+    steps = (end_ms - start_ms) // GRID_MS + 1
+    factor = np.cumsum(rng.normal(0, vol, steps))
+    log_x = np.log(100.0) + factor
+    prices = []
+    for k, ts in enumerate(stamps):
+        idx = (ts - start_ms) // GRID_MS
+        if k == 0:
+            path = np.exp(log_x[idx])
+        elif kind == 'correlated':
+            own = np.cumsum(rng.normal(0, vol * np.sqrt(max(1.0 - corr ** 2, 0.0)), steps))
+            path = 100.0 * (k + 1) * np.exp(corr * factor[idx] + own[idx])
+        else:
+            spread = lfilter([1.0], [1.0, -phi], rng.normal(0, 500.0 * vol, steps))
+            path = 10.0 * k + beta * np.exp(log_x[idx]) + spread[idx]
+        prices.append(np.round(path, 4))
+    qty = [np.round(rng.exponential(1.0, ticks), 6) for _ in range(n_symbols)]
+    return {
+        'symbols': [f"{prefix}{k}usdt" for k in range(n_symbols)],
+        'ts': np.concatenate(stamps),
+        'price': np.concatenate(prices),
+        'qty': np.concatenate(qty),
+        'offsets': np.arange(n_symbols + 1, dtype=np.int64) * ticks,
+    }
+
+
+def symbol_arrays(universe, i):
+    """{'ts', 'price', 'qty'} of the i-th symbol of make_universe()."""
+    lo, hi = universe['offsets'][i], universe['offsets'][i + 1]
+    return {k: universe[k][lo:hi] for k in ('ts', 'price', 'qty')}
@@ -0,0 +1,83 @@
+# collector/archive.py
+"""
+Move aged ticks from Mongo into the Arrow archive (analytics/archive.py).
+
+For every symbol, ticks from its current watermark (or its oldest tick) up
+to the cutoff, now - --older-than-hours floored to the hour, are written
+day by day; the watermark is advanced only after all day files are on disk.
+With --delete the archived range is then removed from Mongo, one day at a
+time. Symbols run in parallel across a process pool.
+
+    python -m collector.archive --older-than-hours 48 --delete --workers 4
+"""
+import argparse
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import datetime, timedelta
+
+from analytics.archive import (ARCHIVE_COMPRESSION, ARCHIVE_DIR, HOUR_MS, day_range, from_ms, set_watermark,
+                               to_ms, watermark, write_day)
+from analytics.db import TICKS_COLL, get_collection
+from analytics.ticks import fetch_tick_arrays
+from collector.streams import load_symbols
+
+
+def archive_symbol(symbol, cutoff, delete=False, root=ARCHIVE_DIR, compression=ARCHIVE_COMPRESSION):
+    """Archive one symbol's ticks below `cutoff` (datetime). Returns (symbol, ticks, days, deleted)."""
+    coll = get_collection(TICKS_COLL)
+    hi = to_ms(cutoff)
+    hi -= hi % HOUR_MS
+    wm = watermark(symbol, root)
+    if wm is None:
+        first = coll.find_one({'symbol': symbol}, {'ts': 1}, sort=[('ts', 1)])
+        if first is None:
+            return symbol, 0, 0, 0
+        lo = to_ms(first['ts'])
+    else:
+        lo = wm
+    if lo >= hi:
+        return symbol, 0, 0, 0
+    ticks = days = 0
+    for day, start, end in day_range(lo, hi):
+        arrs = fetch_tick_arrays(symbol, since=from_ms(start), until=from_ms(end), archive=False)
+        if len(arrs['ts']) == 0:
+            continue
+        write_day(symbol, day, arrs, keep_below_ms=wm, root=root, compression=compression)
+        ticks += len(arrs['ts'])
+        days += 1
+    set_watermark(symbol, hi, root)
+    deleted = 0
+    if delete:
+        for _, start, end in day_range(lo, hi):
+            res = coll.delete_many({'symbol': symbol, 'ts': {'$gte': from_ms(start), '$lt': from_ms(end)}})
+            deleted += res.deleted_count
+    return symbol, ticks, days, deleted
+
+
+def archive(symbols, cutoff, delete=False, workers=4, root=ARCHIVE_DIR, compression=ARCHIVE_COMPRESSION):
+    t0 = time.perf_counter()
+    out = {'symbols': 0, 'ticks': 0, 'day_files': 0, 'deleted': 0}
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = [pool.submit(archive_symbol, s, cutoff, delete, root, compression) for s in symbols]
+        for f in as_completed(futures):
+            _, ticks, days, deleted = f.result()
+            out['symbols'] += 1
+            out['ticks'] += ticks
+            out['day_files'] += days
+            out['deleted'] += deleted
+    out['seconds'] = round(time.perf_counter() - t0, 3)
+    return out
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="Compact aged ticks into the Arrow archive")
+    ap.add_argument('--symbols', help='comma separated; defaults to the collector universe')
+    ap.add_argument('--older-than-hours', type=float, default=24.0)
+    ap.add_argument('--delete', action='store_true', help='remove archived ticks from Mongo')
+    ap.add_argument('--workers', type=int, default=4)
+    ap.add_argument('--dir', default=ARCHIVE_DIR)
+    ap.add_argument('--compression', default=ARCHIVE_COMPRESSION, choices=['zstd', 'lz4', 'none'])
+    args = ap.parse_args()
+    syms = [s.strip().lower() for s in args.symbols.split(',')] if args.symbols else load_symbols()
+    cutoff = datetime.utcnow() - timedelta(hours=args.older_than_hours)
+    print(archive(syms, cutoff, args.delete, args.workers, args.dir, args.compression))
@@ -0,0 +1,100 @@
+# collector/backfill.py
+"""
+Rebuild the bars_<tf> collections from the raw ticks collection.
+
+The requested range is cut into chunks aligned to the largest bar timeframe,
+so no bar straddles two chunks, and (symbol, chunk) jobs run across a
+process pool. Every job reads its ticks once and upserts bars for all
+timeframes; bars whose bucket has not ended yet are written with final=False.
+
+    python -m collector.backfill --symbols btcusdt,ethusdt --hours 24 --workers 4
+"""
+import argparse
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import datetime, timedelta, timezone
+
+from pymongo import UpdateOne
+
+from analytics.bars import STORED_TIMEFRAMES, bar_collection, bars_from_arrays, timeframe_seconds
+from analytics.cache import pair_cache
+from analytics.db import get_collection
+from analytics.ticks import fetch_tick_arrays
+from collector.decode import ms_to_bson
+from collector.storage import BAR_INDEX
+from collector.streams import load_symbols
+
+
+def _epoch_ms(dt):
+    return int(dt.replace(tzinfo=timezone.utc).timestamp() * 1000)
+
+
+def _from_ms(ms):
+    return datetime.fromtimestamp(ms / 1000.0, tz=timezone.utc).replace(tzinfo=None)
+
+
+def chunk_ranges(start, end, chunk_minutes, timeframes=STORED_TIMEFRAMES):
+    """[start, end) split into chunks whose edges fall on the largest timeframe's buckets."""
+    align = max(timeframe_seconds(tf) for tf in timeframes) * 1000
+    step = max(align, (chunk_minutes * 60000) // align * align)
+    lo = _epoch_ms(start)
+    lo -= lo % align
+    hi = _epoch_ms(end)
+    out = []
+    while lo < hi:
+        out.append((_from_ms(lo), _from_ms(lo + step)))
+        lo += step
+    return out
+
+
+def rebuild_chunk(symbol, since, until, timeframes=STORED_TIMEFRAMES):
+    """Recompute and upsert every stored timeframe for one symbol and time chunk."""
+    arrs = fetch_tick_arrays(symbol, since=since, until=until)
+    now_ms = int(time.time() * 1000)
+    written = 0
+    for tf in timeframes:
+        width = timeframe_seconds(tf) * 1000
+        bars = bars_from_arrays(arrs['ts'], arrs['price'], arrs['qty'], width // 1000)
+        if len(bars['ts']) == 0:
+            continue
+        ops = [UpdateOne({'symbol': symbol, 'ts': ms_to_bson(int(t))},
+                         {'$set': {'symbol': symbol, 'ts': ms_to_bson(int(t)), 'open': float(o), 'high': float(h),
+                                   'low': float(l), 'close': float(c), 'volume': float(v), 'trades': int(n),
+                                   'final': bool(t + width <= now_ms)}}, upsert=True)
+               for t, o, h, l, c, v, n in zip(bars['ts'], bars['open'], bars['high'], bars['low'],
+                                              bars['close'], bars['volume'], bars['trades'])]
+        get_collection(bar_collection(tf)).bulk_write(ops, ordered=False)
+        written += len(ops)
+    return symbol, since, len(arrs['ts']), written
+
+
+def backfill(symbols, start, end, workers=4, chunk_minutes=60, timeframes=STORED_TIMEFRAMES):
+    for tf in timeframes:
+        get_collection(bar_collection(tf)).create_index(BAR_INDEX, unique=True, name="symbol_ts")
+    jobs = [(s, lo, hi) for s in symbols for lo, hi in chunk_ranges(start, end, chunk_minutes, timeframes)]
+    t0 = time.perf_counter()
+    ticks = bars = 0
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = [pool.submit(rebuild_chunk, s, lo, hi, timeframes) for s, lo, hi in jobs]
+        for f in as_completed(futures):
+            sym, lo, n_ticks, n_bars = f.result()
+            ticks += n_ticks
+            bars += n_bars
+    # rebuilt bars keep their timestamps, so cached pair fits would not notice the change
+    for s in symbols:
+        pair_cache.invalidate(s)
+    return {'jobs': len(jobs), 'ticks': ticks, 'bars': bars, 'seconds': round(time.perf_counter() - t0, 3)}
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="Rebuild bar collections from raw ticks")
+    ap.add_argument('--symbols', help='comma separated; defaults to the collector universe')
+    ap.add_argument('--hours', type=float, default=24.0, help='how far back to rebuild')
+    ap.add_argument('--workers', type=int, default=4)
+    ap.add_argument('--chunk-minutes', type=int, default=60)
+    ap.add_argument('--timeframes', default=','.join(STORED_TIMEFRAMES))
+    args = ap.parse_args()
+    syms = [s.strip().lower() for s in args.symbols.split(',')] if args.symbols else load_symbols()
+    tfs = [tf.strip() for tf in args.timeframes.split(',') if tf.strip()]
+    now = datetime.utcnow()
+    print(backfill(syms, now - timedelta(hours=args.hours), now, args.workers, args.chunk_minutes, tfs))
@@ -0,0 +1,104 @@
+# collector/bars.py
+import asyncio
+import os
+import time
+
+from analytics.bars import STORED_TIMEFRAMES, bar_collection, timeframe_seconds
+from collector.decode import ms_to_bson
+
+BAR_FLUSH_INTERVAL = float(os.getenv("BAR_FLUSH_INTERVAL", "1.0"))
+# how long after a bucket ends we keep accepting late trades for it
+BAR_GRACE_MS = int(os.getenv("BAR_GRACE_MS", "1000"))
+# also upsert in-progress bars (final=False) on every flush
+BAR_PARTIAL = os.getenv("BAR_PARTIAL", "1") == "1"
+
+
+def bar_document(symbol, bar, final):
+    start, o, h, l, c, v, n = bar
+    return {'symbol': symbol, 'ts': ms_to_bson(start), 'open': o, 'high': h, 'low': l,
+            'close': c, 'volume': v, 'trades': n, 'final': final}
+
+
+class BarAggregator:
+    """
+    Incremental OHLCV bars per (timeframe, symbol), fed one trade tuple
+    (symbol, ts_ms, price, qty) at a time. A bar is finalised when a trade
+    for a later bucket arrives or, for quiet symbols, once its bucket plus
+    grace_ms has passed on the wall clock. Trades for already finalised
+    buckets are counted as late and left to collector/backfill.py.
+    With a `shared` writer (analytics.shared_bars.SharedBarWriter) every
+    drain() also publishes finalised and open bars to the mapped ring files.
+    """
+
+    def __init__(self, timeframes=STORED_TIMEFRAMES, grace_ms=BAR_GRACE_MS, shared=None):
+        self.widths = {tf: timeframe_seconds(tf) * 1000 for tf in timeframes}
+        self.grace_ms = grace_ms
+        self.shared = shared
+        self._open = {}
+        self._last_closed = {}
+        self._closed = []
+        self.late = 0
+        self.finalized = 0
+
+    def update(self, rec):
+        sym, ts, price, qty = rec
+        for tf, width in self.widths.items():
+            start = ts - ts % width
+            key = (tf, sym)
+            bar = self._open.get(key)
+            if bar is not None and start == bar[0]:
+                if price > bar[2]:
+                    bar[2] = price
+                elif price < bar[3]:
+                    bar[3] = price
+                bar[4] = price
+                bar[5] += qty
+                bar[6] += 1
+            elif bar is not None and start < bar[0] or start <= self._last_closed.get(key, -1):
+                self.late += 1
+            else:
+                if bar is not None:
+                    self._finalize(key, bar)
+                self._open[key] = [start, price, price, price, price, qty, 1]
+
+    def _finalize(self, key, bar):
+        self._closed.append((key, bar))
+        self._last_closed[key] = bar[0]
+        self.finalized += 1
+
+    def close_due(self, now_ms):
+        for key, bar in list(self._open.items()):
+            if bar[0] + self.widths[key[0]] + self.grace_ms <= now_ms:
+                del self._open[key]
+                self._finalize(key, bar)
+
+    def drain(self, now_ms=None, partial=BAR_PARTIAL):
+        """Finalise due bars and return {collection name: [bar documents]} to upsert."""
+        self.close_due(now_ms if now_ms is not None else int(time.time() * 1000))
+        out = {}
+        for (tf, sym), bar in self._closed:
+            out.setdefault(bar_collection(tf), []).append(bar_document(sym, bar, True))
+        if self.shared is not None:
+            for (tf, sym), bar in self._closed:
+                self.shared.write(self.widths[tf] // 1000, sym, bar)
+            for (tf, sym), bar in self._open.items():
+                self.shared.write(self.widths[tf] // 1000, sym, bar)
+        self._closed = []
+        if partial:
+            for (tf, sym), bar in self._open.items():
+                out.setdefault(bar_collection(tf), []).append(bar_document(sym, bar, False))
+        return out
+
+    def snapshot(self):
+        return {'open_bars': len(self._open), 'finalized': self.finalized, 'late': self.late}
+
+
+async def run_bar_flusher(bars, store, interval=BAR_FLUSH_INTERVAL):
+    """Upsert finalised (and in-progress) bars in one batch per collection every interval."""
+    while True:
+        await asyncio.sleep(interval)
+        for coll_name, docs in bars.drain().items():
+            try:
+                await store.upsert_bars(coll_name, docs)
+            except Exception as e:
+                print(f"bar upsert error ({coll_name}): {e}")
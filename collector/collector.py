@@ -1,40 +1,146 @@
 import asyncio
-import json
+import multiprocessing
 import os
-from datetime import datetime
-import pymongo
+import time
 import websockets
 
+from analytics.metrics import METRICS_ENABLED, Callback, Gauge, Histogram, get_or_create, serve
+from analytics.shared_bars import SharedBarWriter
+from collector.bars import BarAggregator, run_bar_flusher
+from collector.decode import decode_trade, DECODER_NAME
+from collector.storage import make_store
+from collector.streams import load_symbols, group_symbols, shard_groups, combined_url, backoff_delay
+from collector.writer import TickWriter
+
 MONGO_URI = os.getenv("MONGO_URI", "mongodb://localhost:27017")
 DB_NAME = os.getenv("MONGO_DB", "gemscap")
 COLLECTION = "ticks"
+STATS_INTERVAL = float(os.getenv("COLLECTOR_STATS_INTERVAL", "30"))
+BARS_ENABLED = os.getenv("COLLECTOR_BARS", "1") == "1"
+SHARED_BARS_ENABLED = os.getenv("SHARED_BARS", "1") == "1"
+METRICS_PORT = int(os.getenv("COLLECTOR_METRICS_PORT", "9108"))  # shard i listens on port + i; 0 disables
+
+# receive time minus the exchange trade time T, per connection
+WS_LAG = get_or_create(Histogram, "gemscap_collector_ws_lag_seconds", "Websocket receive time minus exchange trade time",
+                       ("conn",), buckets=(0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0))
+MESSAGE_RATE = get_or_create(Gauge, "gemscap_collector_messages_per_second",
+                             "Messages per second over the last stats interval")
+
+symbols = load_symbols()
+
+async def handle_group(group, writer, conn_stats, url=None, bars=None):
+    """One combined-stream connection; reconnects on its own with jittered backoff."""
+    url = url or combined_url(group)
+    name = f"{group[0]}..{group[-1]}({len(group)})"
+    stats = conn_stats.setdefault(name, {'messages': 0, 'errors': 0, 'reconnects': 0})
+    lag = WS_LAG.labels(name) if METRICS_ENABLED else None
+    attempt = 0
+    while True:
+        try:
+            async with websockets.connect(url, max_queue=None) as ws:
+                print(f"Connected {name}")
+                attempt = 0
+                async for msg in ws:
+                    stats['messages'] += 1
+                    try:
+                        rec = decode_trade(msg)
+                        if rec is not None:
+                            if lag is not None:
+                                lag.observe(time.time() - rec[1] / 1000.0)
+                            writer.put(rec)
+                            if bars is not None:
+                                bars.update(rec)
+                    except Exception as e:
+                        stats['errors'] += 1
+                        print(f"{name} error: {e}")
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            print(f"{name} disconnected: {e}")
+        stats['reconnects'] += 1
+        delay = backoff_delay(attempt)
+        attempt += 1
+        await asyncio.sleep(delay)
+
+def register_metrics(writer, conn_stats):
+    """Export the counters the shard already keeps; read only when /metrics is scraped."""
+    for key, help in (('messages', 'Websocket messages received'), ('errors', 'Messages that failed to decode'),
+                      ('reconnects', 'Websocket reconnects')):
+        Callback(f"gemscap_collector_{key}_total", help, "counter",
+                 lambda key=key: [((name,), s[key]) for name, s in list(conn_stats.items())], ("conn",))
+    for key, kind in (('enqueued', 'counter'), ('written', 'counter'), ('dropped', 'counter'), ('failed', 'counter'),
+                      ('queue_depth', 'gauge'), ('inflight', 'gauge')):
+        suffix = '_total' if kind == 'counter' else ''
+        Callback(f"gemscap_collector_writer_{key}{suffix}", f"Tick writer {key.replace('_', ' ')}", kind,
+                 lambda key=key: [((), writer.snapshot()[key])])
+
+async def report_stats(writer, conn_stats, shard=0, bars=None):
+    last, t_last = 0, time.monotonic()
+    while True:
+        await asyncio.sleep(STATS_INTERVAL)
+        msgs = sum(s['messages'] for s in conn_stats.values())
+        now = time.monotonic()
+        MESSAGE_RATE.set((msgs - last) / (now - t_last))
+        last, t_last = msgs, now
+        reconnects = sum(s['reconnects'] for s in conn_stats.values())
+        bar_stats = f" bars: {bars.snapshot()}" if bars is not None else ""
+        print(f"[shard {shard}] messages={msgs} reconnects={reconnects} writer stats: {writer.snapshot()}{bar_stats}")
+
+async def run_shard(groups, shard=0):
+    store = make_store(MONGO_URI, DB_NAME, COLLECTION)
+    print(f"[shard {shard}] {len(groups)} connections, tick store: {store.name}, decoder: {DECODER_NAME}")
+    writer = TickWriter(store)
+    shared = SharedBarWriter() if BARS_ENABLED and SHARED_BARS_ENABLED else None
+    bars = BarAggregator(shared=shared) if BARS_ENABLED else None
+    conn_stats = {}
+    server = None
+    if METRICS_ENABLED and METRICS_PORT:
+        register_metrics(writer, conn_stats)
+        server = await serve(METRICS_PORT + shard)
+        print(f"[shard {shard}] metrics on :{METRICS_PORT + shard}/metrics")
+    flusher = asyncio.create_task(writer.run())
+    tasks = [asyncio.create_task(report_stats(writer, conn_stats, shard, bars))]
+    if bars is not None:
+        tasks.append(asyncio.create_task(run_bar_flusher(bars, store)))
+    try:
+        await asyncio.gather(*(handle_group(g, writer, conn_stats, bars=bars) for g in groups))
+    finally:
+        for t in tasks:
+            t.cancel()
+        if server is not None:
+            server.close()
+        # cancelling the flusher could drop a batch it is handing to the store;
+        # let it write out the queue and wait for in-flight batches instead
+        writer.stop()
+        await flusher
+        if bars is not None:
+            for coll_name, docs in bars.drain().items():
+                await store.upsert_bars(coll_name, docs)
+        if shared is not None:
+            shared.close()
+        await store.close()
+
+def shard_main(groups, shard):
+    try:
+        asyncio.run(run_shard(groups, shard))
+    except KeyboardInterrupt:
+        pass
 
-symbols = ["btcusdt", "ethusdt"]
-
-async def handle_symbol(sym, client):
-    url = f"wss://fstream.binance.com/ws/{sym}@trade"
-    async with websockets.connect(url) as ws:
-        print(f"Connected {sym}")
-        async for msg in ws:
-            try:
-                j = json.loads(msg)
-                if j.get("e") == "trade":
-                    rec = {
-                        "symbol": j.get("s").lower(),
-                        "ts": datetime.utcfromtimestamp(j.get("T", j.get("E")) / 1000.0),
-                        "price": float(j.get("p")),
-                        "qty": float(j.get("q")),
-                    }
-                    client[DB_NAME][COLLECTION].insert_one(rec)
-            except Exception as e:
-                print(f"{sym} error: {e}")
-
-async def main():
-    client = pymongo.MongoClient(MONGO_URI)
-    await asyncio.gather(*(handle_symbol(s, client) for s in symbols))
+def main():
+    shards = shard_groups(group_symbols(symbols))
+    print(f"Collector: {len(symbols)} symbols, {sum(len(s) for s in shards)} connections, {len(shards)} shard(s)")
+    if len(shards) == 1:
+        asyncio.run(run_shard(shards[0]))
+        return
+    procs = [multiprocessing.Process(target=shard_main, args=(groups, i), daemon=True)
+             for i, groups in enumerate(shards)]
+    for p in procs:
+        p.start()
+    for p in procs:
+        p.join()
 
 if __name__ == "__main__":
     try:
-        asyncio.run(main())
+        main()
     except KeyboardInterrupt:
         print("Collector stopped.")
@@ -0,0 +1,143 @@
+# collector/decode.py
+"""
+Trade message decoding for the collector hot loop.
+
+Records are fixed-schema tuples (symbol, ts_ms, price, qty) with the exchange
+trade time kept as integer epoch milliseconds; conversion to BSON dates
+happens once per batch in to_documents(). JSON parsing uses msgspec or
+orjson when installed and falls back to the standard library.
+"""
+import json
+import os
+from datetime import datetime, timezone
+
+try:
+    from bson import DatetimeMS
+except ImportError:  # pymongo < 4.3 or no bson at all
+    DatetimeMS = None
+
+DECODER = os.getenv("COLLECTOR_DECODER", "auto")  # auto | msgspec | orjson | json
+
+TRADE_FIELDS = ('symbol', 'ts_ms', 'price', 'qty')
+
+_lower = {}
+
+
+def _symbol(s):
+    sym = _lower.get(s)
+    if sym is None:
+        sym = _lower[s] = s.lower()
+    return sym
+
+
+def _json_decoder(loads):
+    def decode_trade(msg):
+        j = loads(msg)
+        d = j.get("data")
+        if d is None:
+            d = j
+        if d.get("e") != "trade":
+            return None
+        return (_symbol(d["s"]), d.get("T") or d["E"], float(d["p"]), float(d["q"]))
+    return decode_trade
+
+
+def _msgspec_decoder():
+    import msgspec
+
+    class _Trade(msgspec.Struct):
+        e: str = ""
+        s: str = ""
+        p: str = "0"
+        q: str = "0"
+        T: int = 0
+        E: int = 0
+
+    class _Message(_Trade):
+        data: _Trade | None = None
+
+    decode = msgspec.json.Decoder(_Message).decode
+
+    def decode_trade(msg):
+        m = decode(msg)
+        d = m.data or m
+        if d.e != "trade":
+            return None
+        return (_symbol(d.s), d.T or d.E, float(d.p), float(d.q))
+    return decode_trade
+
+
+def make_decoder(backend=DECODER):
+    """Return (name, decode_trade) for the fastest available JSON backend."""
+    order = ['msgspec', 'orjson', 'json'] if backend == 'auto' else [backend]
+    for name in order:
+        try:
+            if name == 'msgspec':
+                return name, _msgspec_decoder()
+            if name == 'orjson':
+                import orjson
+                return name, _json_decoder(orjson.loads)
+            if name == 'json':
+                return name, _json_decoder(json.loads)
+        except ImportError:
+            continue
+    raise ValueError(f"unknown or unavailable decoder: {backend}")
+
+
+DECODER_NAME, decode_trade = make_decoder()
+
+
+def ms_to_bson(ts_ms):
+    if DatetimeMS is not None:
+        return DatetimeMS(ts_ms)
+    return datetime.fromtimestamp(ts_ms / 1000.0, tz=timezone.utc).replace(tzinfo=None)
+
+
+def to_documents(records):
+    """Turn trade tuples into Mongo documents; dict records pass through unchanged."""
+    out = []
+    for r in records:
+        if isinstance(r, dict):
+            out.append(r)
+        else:
+            out.append({"symbol": r[0], "ts": ms_to_bson(r[1]), "price": r[2], "qty": r[3]})
+    return out
+
+
+class TradeColumns:
+    """Columnar batch of trades (parallel lists, NumPy arrays on demand)."""
+
+    def __init__(self):
+        self.symbol = []
+        self.ts_ms = []
+        self.price = []
+        self.qty = []
+
+    def __len__(self):
+        return len(self.ts_ms)
+
+    def append(self, rec):
+        self.symbol.append(rec[0])
+        self.ts_ms.append(rec[1])
+        self.price.append(rec[2])
+        self.qty.append(rec[3])
+
+    def to_arrays(self):
+        import numpy as np
+        return {
+            'symbol': np.asarray(self.symbol, dtype=object),
+            'ts_ms': np.asarray(self.ts_ms, dtype=np.int64),
+            'price': np.asarray(self.price, dtype=np.float64),
+            'qty': np.asarray(self.qty, dtype=np.float64),
+        }
+
+
+def decode_batch(msgs, decoder=None):
+    """Decode an iterable of raw messages straight into a TradeColumns batch."""
+    decoder = decoder or decode_trade
+    cols = TradeColumns()
+    for m in msgs:
+        rec = decoder(m)
+        if rec is not None:
+            cols.append(rec)
+    return cols
@@ -0,0 +1,122 @@
+# collector/replay_server.py
+"""
+Local stand-in for the Binance combined-stream endpoint.
+Replays recorded trade events (JSON lines, raw or combined-envelope form) to
+any client connecting on /stream?streams=a@trade/b@trade, so collector
+throughput can be measured offline:
+
+    python -m collector.replay_server --file trades.jsonl --port 8765
+    COLLECTOR_WS_BASE=ws://127.0.0.1:8765 python -m collector.collector
+"""
+import argparse
+import asyncio
+import json
+import random
+import time
+from urllib.parse import urlparse, parse_qs
+
+from websockets.asyncio.server import serve
+
+
+def synthetic_trades(symbols, n, seed=7, start_ms=None):
+    """Random-walk trade events in Binance futures @trade format."""
+    rng = random.Random(seed)
+    t = start_ms or int(time.time() * 1000)
+    prices = {s: 100.0 + 10 * i for i, s in enumerate(symbols)}
+    out = []
+    for i in range(n):
+        s = symbols[i % len(symbols)]
+        prices[s] *= 1 + rng.gauss(0, 1e-4)
+        t += rng.randint(0, 3)
+        out.append({
+            "e": "trade", "E": t + 1, "T": t, "s": s.upper(), "t": i,
+            "p": f"{prices[s]:.4f}", "q": f"{rng.uniform(0.001, 2):.3f}", "X": "MARKET", "m": bool(i & 1),
+        })
+    return out
+
+
+def write_recording(path, trades):
+    with open(path, 'w') as f:
+        for t in trades:
+            f.write(json.dumps(t) + '\n')
+
+
+def load_recording(path):
+    trades = []
+    with open(path) as f:
+        for line in f:
+            line = line.strip()
+            if line:
+                j = json.loads(line)
+                trades.append(j.get("data", j))
+    return trades
+
+
+def requested_symbols(path):
+    streams = parse_qs(urlparse(path).query).get('streams', [''])[0]
+    return [s.split('@', 1)[0] for s in streams.split('/') if s]
+
+
+def build_payloads(trades, symbols):
+    """
+    Pre-encode combined-envelope frames for the requested symbols. If the
+    recording holds none of them, its trades are re-labelled round-robin so a
+    small recording can drive a large symbol universe.
+    """
+    wanted = set(symbols)
+    picked = [t for t in trades if t["s"].lower() in wanted]
+    if not picked:
+        picked = [dict(t, s=symbols[i % len(symbols)].upper()) for i, t in enumerate(trades)]
+    return [json.dumps({"stream": f"{t['s'].lower()}@trade", "data": t}) for t in picked]
+
+
+def make_handler(trades, rate=0.0, loops=1):
+    async def handler(ws):
+        symbols = requested_symbols(ws.request.path)
+        if not symbols:
+            await ws.close(1008, 'no streams requested')
+            return
+        payloads = build_payloads(trades, symbols)
+        gap = 1.0 / rate if rate else 0.0
+        n = 0
+        while loops <= 0 or n < loops:
+            for i, p in enumerate(payloads):
+                await ws.send(p)
+                if gap:
+                    await asyncio.sleep(gap)
+                elif i % 1000 == 0:
+                    await asyncio.sleep(0)
+            n += 1
+        await ws.close()
+    return handler
+
+
+async def serve_forever(trades, host, port, rate, loops):
+    async with serve(make_handler(trades, rate, loops), host, port, max_size=None):
+        print(f"Replaying {len(trades)} trades on ws://{host}:{port}")
+        await asyncio.Future()
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    ap.add_argument('--file', help='recorded trades (JSON lines); synthetic if omitted')
+    ap.add_argument('--synthetic', type=int, default=100000, help='number of synthetic trades')
+    ap.add_argument('--symbols', default='btcusdt,ethusdt')
+    ap.add_argument('--host', default='127.0.0.1')
+    ap.add_argument('--port', type=int, default=8765)
+    ap.add_argument('--rate', type=float, default=0.0, help='messages/sec per connection, 0 = unthrottled')
+    ap.add_argument('--loops', type=int, default=0, help='replays per connection, 0 = forever')
+    ap.add_argument('--save', help='write the synthetic trades to this file and exit')
+    args = ap.parse_args()
+    if args.file:
+        data = load_recording(args.file)
+    else:
+        data = synthetic_trades(args.symbols.split(','), args.synthetic)
+    if args.save:
+        write_recording(args.save, data)
+        print(f"Wrote {len(data)} trades to {args.save}")
+    else:
+        try:
+            asyncio.run(serve_forever(data, args.host, args.port, args.rate, args.loops))
+        except KeyboardInterrupt:
+            pass
@@ -0,0 +1,144 @@
+# collector/storage.py
+import asyncio
+import os
+from abc import ABC, abstractmethod
+from concurrent.futures import ThreadPoolExecutor
+
+from pymongo import UpdateOne
+
+STORE_BACKEND = os.getenv("COLLECTOR_STORE", "auto")  # auto | async | executor | memory
+EXECUTOR_WORKERS = int(os.getenv("COLLECTOR_STORE_WORKERS", "4"))
+
+
+class TickStore(ABC):
+    """
+    Minimal async storage interface used by the collector.
+    Implementations must never block the event loop thread.
+    """
+
+    name = 'base'
+
+    @abstractmethod
+    async def insert_many(self, docs):
+        """Insert tick documents."""
+
+    @abstractmethod
+    async def upsert_bars(self, coll_name, docs):
+        """Upsert bar documents keyed on (symbol, ts) into coll_name."""
+
+    async def close(self):
+        pass
+
+
+BAR_INDEX = [("symbol", 1), ("ts", 1)]
+
+
+def bar_upserts(docs):
+    return [UpdateOne({'symbol': d['symbol'], 'ts': d['ts']}, {'$set': d}, upsert=True) for d in docs]
+
+
+class AsyncMongoTickStore(TickStore):
+    """Native async driver: PyMongo's AsyncMongoClient, or Motor on older installs."""
+
+    name = 'async'
+
+    def __init__(self, uri, db_name, coll_name):
+        try:
+            from pymongo import AsyncMongoClient
+        except ImportError:
+            from motor.motor_asyncio import AsyncIOMotorClient as AsyncMongoClient
+        self.client = AsyncMongoClient(uri)
+        self.db = self.client[db_name]
+        self.coll = self.db[coll_name]
+        self._bar_colls = set()
+
+    async def insert_many(self, docs):
+        await self.coll.insert_many(docs, ordered=False)
+
+    async def upsert_bars(self, coll_name, docs):
+        coll = self.db[coll_name]
+        if coll_name not in self._bar_colls:
+            await coll.create_index(BAR_INDEX, unique=True, name="symbol_ts")
+            self._bar_colls.add(coll_name)
+        await coll.bulk_write(bar_upserts(docs), ordered=False)
+
+    async def close(self):
+        res = self.client.close()
+        if asyncio.iscoroutine(res):
+            await res
+
+
+class ExecutorTickStore(TickStore):
+    """Blocking pymongo collection driven from a small dedicated thread pool."""
+
+    name = 'executor'
+
+    def __init__(self, collection, workers=EXECUTOR_WORKERS):
+        self.coll = collection
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='tickstore')
+        self._bar_colls = set()
+
+    async def insert_many(self, docs):
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(self._pool, lambda: self.coll.insert_many(docs, ordered=False))
+
+    def _upsert_bars(self, coll_name, docs):
+        coll = self.coll.database[coll_name]
+        if coll_name not in self._bar_colls:
+            coll.create_index(BAR_INDEX, unique=True, name="symbol_ts")
+            self._bar_colls.add(coll_name)
+        coll.bulk_write(bar_upserts(docs), ordered=False)
+
+    async def upsert_bars(self, coll_name, docs):
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(self._pool, self._upsert_bars, coll_name, docs)
+
+    async def close(self):
+        self._pool.shutdown(wait=True)
+
+
+class MemoryTickStore(TickStore):
+    """
+    In-process stand-in for tests and offline benchmarks.
+    `latency` (seconds) simulates a slow server round trip per batch.
+    """
+
+    name = 'memory'
+
+    def __init__(self, latency=0.0):
+        self.docs = []
+        self.bars = {}
+        self.batches = 0
+        self.latency = latency
+
+    async def insert_many(self, docs):
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        self.docs.extend(docs)
+        self.batches += 1
+
+    async def upsert_bars(self, coll_name, docs):
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        coll = self.bars.setdefault(coll_name, {})
+        for d in docs:
+            coll[(d['symbol'], d['ts'])] = d
+
+    def count(self, symbol=None):
+        if symbol is None:
+            return len(self.docs)
+        return sum(1 for d in self.docs if d.get('symbol') == symbol)
+
+
+def make_store(uri, db_name, coll_name, backend=STORE_BACKEND):
+    """Build a TickStore; 'auto' prefers the async driver and falls back to the executor."""
+    if backend == 'memory':
+        return MemoryTickStore()
+    if backend in ('auto', 'async'):
+        try:
+            return AsyncMongoTickStore(uri, db_name, coll_name)
+        except ImportError:
+            if backend == 'async':
+                raise
+    import pymongo
+    return ExecutorTickStore(pymongo.MongoClient(uri)[db_name][coll_name])
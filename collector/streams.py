@@ -0,0 +1,56 @@
+# collector/streams.py
+import os
+import random
+
+WS_BASE = os.getenv("COLLECTOR_WS_BASE", "wss://fstream.binance.com")
+STREAMS_PER_CONN = int(os.getenv("COLLECTOR_STREAMS_PER_CONN", "100"))
+SHARDS = int(os.getenv("COLLECTOR_SHARDS", "1"))
+BACKOFF_BASE = float(os.getenv("COLLECTOR_BACKOFF_BASE", "0.5"))
+BACKOFF_CAP = float(os.getenv("COLLECTOR_BACKOFF_CAP", "30"))
+
+# Binance futures allows up to 200 streams on one combined connection
+MAX_STREAMS_PER_CONN = 200
+
+DEFAULT_SYMBOLS = ["btcusdt", "ethusdt"]
+
+
+def load_symbols():
+    """
+    Symbol universe from COLLECTOR_SYMBOLS_FILE (one symbol per line, '#' comments)
+    or COLLECTOR_SYMBOLS (comma separated). Falls back to DEFAULT_SYMBOLS.
+    """
+    path = os.getenv("COLLECTOR_SYMBOLS_FILE")
+    raw = []
+    if path:
+        with open(path) as f:
+            raw = [line.split('#', 1)[0] for line in f]
+    elif os.getenv("COLLECTOR_SYMBOLS"):
+        raw = os.getenv("COLLECTOR_SYMBOLS").split(',')
+    out = []
+    for s in raw:
+        s = s.strip().lower()
+        if s and s not in out:
+            out.append(s)
+    return out or list(DEFAULT_SYMBOLS)
+
+
+def group_symbols(symbols, per_conn=STREAMS_PER_CONN):
+    per_conn = max(1, min(per_conn, MAX_STREAMS_PER_CONN))
+    return [symbols[i:i + per_conn] for i in range(0, len(symbols), per_conn)]
+
+
+def shard_groups(groups, shards=SHARDS):
+    """Round-robin connection groups over worker processes; empty shards are dropped."""
+    shards = max(1, shards)
+    return [g for g in (groups[i::shards] for i in range(shards)) if g]
+
+
+def combined_url(group, base=WS_BASE):
+    streams = '/'.join(f"{s}@trade" for s in group)
+    return f"{base.rstrip('/')}/stream?streams={streams}"
+
+
+def backoff_delay(attempt, base=BACKOFF_BASE, cap=BACKOFF_CAP):
+    """Full-jitter exponential backoff so shards don't reconnect in lockstep."""
+    return random.uniform(0, min(cap, base * (2 ** attempt)))
+
@@ -0,0 +1,157 @@
+# collector/writer.py
+import asyncio
+import os
+import time
+from collections import deque
+
+from analytics.metrics import METRICS_ENABLED, Histogram, get_or_create
+from collector.decode import to_documents
+
+BATCH_SIZE = int(os.getenv("WRITER_BATCH_SIZE", "1000"))
+FLUSH_INTERVAL = float(os.getenv("WRITER_FLUSH_INTERVAL", "0.5"))
+MAX_QUEUE = int(os.getenv("WRITER_MAX_QUEUE", "100000"))
+MAX_INFLIGHT = int(os.getenv("WRITER_MAX_INFLIGHT", "4"))
+
+WRITE_SECONDS = get_or_create(Histogram, "gemscap_collector_write_seconds", "Tick batch insert latency", ("outcome",))
+
+
+class WriterStats:
+    """Counters for the tick write pipeline."""
+
+    def __init__(self):
+        self.enqueued = 0
+        self.written = 0
+        self.dropped = 0
+        self.failed = 0
+        self.flushes = 0
+        self.max_depth = 0
+        self.last_flush_ms = 0.0
+        self.max_flush_ms = 0.0
+        self.total_flush_ms = 0.0
+
+    def record_flush(self, n, elapsed_ms):
+        self.flushes += 1
+        self.written += n
+        self.last_flush_ms = elapsed_ms
+        self.max_flush_ms = max(self.max_flush_ms, elapsed_ms)
+        self.total_flush_ms += elapsed_ms
+
+    def snapshot(self, depth=0):
+        return {
+            'queue_depth': depth,
+            'max_depth': self.max_depth,
+            'enqueued': self.enqueued,
+            'written': self.written,
+            'dropped': self.dropped,
+            'failed': self.failed,
+            'flushes': self.flushes,
+            'last_flush_ms': round(self.last_flush_ms, 3),
+            'max_flush_ms': round(self.max_flush_ms, 3),
+            'avg_flush_ms': round(self.total_flush_ms / self.flushes, 3) if self.flushes else 0.0,
+        }
+
+
+class TickWriter:
+    """
+    Bounded in-memory queue in front of a TickStore (see collector/storage.py).
+    put() never blocks the event loop; a background flusher drains the queue
+    with insert_many(ordered=False) once batch_size records are waiting or
+    flush_interval seconds have passed, keeping up to max_inflight batches
+    in flight. When the queue is full new records
+    are dropped and counted instead of stalling the websocket readers.
+    """
+
+    def __init__(self, store, batch_size=BATCH_SIZE, flush_interval=FLUSH_INTERVAL, max_queue=MAX_QUEUE,
+                 max_inflight=MAX_INFLIGHT):
+        self.store = store
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_queue = max_queue
+        self.stats = WriterStats()
+        self._queue = deque()
+        self._wakeup = asyncio.Event()
+        self._closed = False
+        self._slots = asyncio.Semaphore(max_inflight)
+        self._inflight = set()
+
+    @property
+    def depth(self):
+        return len(self._queue)
+
+    def put(self, rec):
+        if len(self._queue) >= self.max_queue:
+            self.stats.dropped += 1
+            return False
+        self._queue.append(rec)
+        self.stats.enqueued += 1
+        depth = len(self._queue)
+        if depth > self.stats.max_depth:
+            self.stats.max_depth = depth
+        if depth >= self.batch_size:
+            self._wakeup.set()
+        return True
+
+    def _take_batch(self):
+        n = min(len(self._queue), self.batch_size)
+        return [self._queue.popleft() for _ in range(n)]
+
+    async def _write(self, batch):
+        t0 = time.perf_counter()
+        try:
+            await self.store.insert_many(to_documents(batch))
+        except Exception as e:
+            # BulkWriteError still inserts the valid part of an unordered batch
+            written = (getattr(e, 'details', None) or {}).get('nInserted', 0)
+            self.stats.failed += len(batch) - written
+            self.stats.written += written
+            print(f"writer error: {e}")
+            if METRICS_ENABLED:
+                WRITE_SECONDS.labels('error').observe(time.perf_counter() - t0)
+        else:
+            elapsed = time.perf_counter() - t0
+            self.stats.record_flush(len(batch), elapsed * 1000.0)
+            if METRICS_ENABLED:
+                WRITE_SECONDS.labels('ok').observe(elapsed)
+        finally:
+            self._slots.release()
+
+    async def flush(self):
+        while self._queue:
+            # bounded number of batches in flight so a slow write overlaps
+            # with the next one instead of serialising the whole pipeline
+            await self._slots.acquire()
+            task = asyncio.create_task(self._write(self._take_batch()))
+            self._inflight.add(task)
+            task.add_done_callback(self._inflight.discard)
+            if len(self._queue) < self.batch_size and not self._closed:
+                break
+
+    async def run(self):
+        """Flush loop; after stop() it writes out the queue, waits for in-flight batches and returns."""
+        while not self._closed:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            await self.flush()
+        await self.drain()
+
+    def stop(self):
+        self._closed = True
+        self._wakeup.set()
+
+    async def drain(self):
+        await self.flush()
+        if self._inflight:
+            await asyncio.gather(*self._inflight)
+
+    async def close(self):
+        """stop() and drain() for a writer whose run() task is not running."""
+        self.stop()
+        await self.drain()
+
+    def snapshot(self):
+        snap = self.stats.snapshot(depth=len(self._queue))
+        snap['inflight'] = len(self._inflight)
+        return snap
@@ -16,7 +16,6 @@ if __name__ == "__main__":
     # Paths
     backend_dir = os.getcwd()
     streamlit_dir = os.path.join(os.getcwd(), "streamlit_app")
-    collector_dir = os.path.join(os.getcwd(), "collector")
 
     # Start Django backend
     print("📡 Starting Django backend on http://127.0.0.1:8000 ...")
@@ -25,7 +24,7 @@ if __name__ == "__main__":
 
     # Start collector (optional)
     print("🔁 Starting collector...")
-    collector = run_command("python collector.py", cwd=collector_dir)
+    collector = run_command("python -m collector.collector", cwd=backend_dir)
     time.sleep(2)
 
     # Start Streamlit frontend
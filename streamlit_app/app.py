@@ -7,6 +7,17 @@ import json
 
 API_BASE = "http://127.0.0.1:8000/api"
 
+
+def fetch_ohlc(symbol, tf='1m'):
+    """(response, bars) for /api/ohlc in the columnar layout; bars get a datetime 'time' column."""
+    r = requests.get(f"{API_BASE}/ohlc", params={'symbol': symbol.lower(), 'tf': tf, 'layout': 'columns'})
+    if r.status_code != 200:
+        return r, None
+    df = pd.DataFrame(r.json())
+    df['time'] = pd.to_datetime(df['ts'], unit='ms')
+    return r, df
+
+
 st.set_page_config(layout="wide")
 st.title("GemsCap Quant — Indicators & Pair Tools")
 
@@ -20,22 +31,11 @@ selected_symbol = st.selectbox("Select Symbol", symbols, index=0)
 cols = st.columns([2,1])
 
 if st.button("Fetch OHLC Data"):
-    ohlc_url = f"http://127.0.0.1:8000/api/ohlc?symbol={selected_symbol.lower()}"
-    st.write(f"Fetching data from `{ohlc_url}` ...")
-    r = requests.get(ohlc_url)
+    st.write(f"Fetching data from `{API_BASE}/ohlc?symbol={selected_symbol.lower()}` ...")
+    r, df = fetch_ohlc(selected_symbol)
     if r.status_code == 200:
-        df = pd.DataFrame(r.json())
         if not df.empty:
 
-            time_col = next(
-                (c for c in df.columns if c.lower() in ['time', 'timestamp', 'datetime', 'ts', 'index', 'date']), None)
-
-            if time_col:
-                df["time"] = pd.to_datetime(df[time_col], errors="coerce")
-            else:
-                # if no suitable column found, try to use index
-                df["time"] = pd.to_datetime(df.index, errors="coerce")
-
             fig = go.Figure(data=[go.Candlestick(
                 x=df["time"],
                 open=df["open"],
@@ -101,20 +101,13 @@ with cols[0]:
         # For each symbol, fetch OHLC (tf)
         charts = []
         for s in selected:
-            r = requests.get(f"{API_BASE}/ohlc", params={'symbol':s.lower(), 'tf':tf})
+            r, df = fetch_ohlc(s, tf)
             if r.status_code != 200:
                 st.error(f"{s} failed: {r.status_code}")
                 continue
-            df = pd.DataFrame(r.json())
             if df.empty:
                 st.warning(f"No data for {s}")
                 continue
-            # try to detect time column
-            time_col = next((c for c in df.columns if c.lower() in ['time','timestamp','index','ts','date','datetime']), None)
-            if time_col is None:
-                df['time'] = pd.to_datetime(df.index)
-            else:
-                df['time'] = pd.to_datetime(df[time_col], errors='coerce')
             # compute indicators client-side (or call API)
             df['ema_20'] = df['close'].ewm(span=20, adjust=False).mean()
             fig = go.Figure()